@@ -0,0 +1,77 @@
+"""
+Compare encode time against file size for the supported output formats
+
+Uses a synthetic image with smooth gradients and fine noise, which
+compresses roughly like diffusion output. Pass --image to measure a
+real render instead.
+
+    python benchmarks/bench_encode.py --size 512 --repeat 5
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from image_encoder import ImageEncoder  # noqa: E402
+
+CASES = [
+    ("png", {"compress_level": 6}),
+    ("png", {"compress_level": 1}),
+    ("png", {"compress_level": 0}),
+    ("webp", {"lossless": True, "method": 0}),
+    ("webp", {"lossless": True, "method": 1}),
+    ("webp", {"lossless": True, "method": 4}),
+    ("jpeg", {"quality": 92, "optimize": True}),
+    ("jpeg", {"quality": 92, "optimize": False}),
+]
+
+
+def synthetic_image(size, seed=0):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size] / size
+    base = np.stack([x, y, (x + y) / 2], axis=-1) * 255
+    noise = rng.normal(0, 8, (size, size, 3))
+    return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8))
+
+
+def measure(image, output_format, options, repeat):
+    encoder = ImageEncoder(output_format, options)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = encoder.encode(image)
+        timings.append(time.perf_counter() - start)
+    return {
+        "format": output_format,
+        "options": options,
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "bytes": len(data)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image encode time vs size benchmark")
+    parser.add_argument("--size", type=int, default=512, help="Side of the synthetic image")
+    parser.add_argument("--image", type=str, help="Encode this image instead of a synthetic one")
+    parser.add_argument("--repeat", type=int, default=5, help="Encodes per case")
+    args = parser.parse_args()
+
+    if args.image:
+        with Image.open(args.image) as image:
+            image = image.convert("RGB")
+    else:
+        image = synthetic_image(args.size)
+
+    results = [measure(image, output_format, options, args.repeat) for output_format, options in CASES]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Peak memory of each memory mode of AIArtGenerator
+
+Every mode renders the same batch in a fresh process, so the peak
+resident set size (and CUDA high-water mark) belongs to that mode alone.
+Use it to decide how many workers fit on a host:
+
+    python benchmarks/bench_memory.py --model-path path/to/model --size 768
+    python benchmarks/bench_memory.py --stub   # offline smoke test with the stub model
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+MODES = {
+    "default": {},
+    "bf16": {"dtype": "bf16"},
+    "fp16": {"dtype": "fp16"},
+    "attention_slicing": {"attention_slicing": True},
+    "sequential_offload": {"sequential_offload": True},
+    "vae_tiling": {"vae_tiling": True},
+    "all": {"dtype": "fp16", "attention_slicing": True, "sequential_offload": True, "vae_tiling": True}
+}
+
+
+def render(args, memory_options):
+    """Runs in the child process: load, render one batch, print the stats"""
+    import logging
+    from art_generator import AIArtGenerator
+
+    logging.basicConfig(level=logging.WARNING)
+    model = None
+    if args.stub:
+        try:
+            from benchmarks.stub_servers import StubDiffusion
+        except ImportError:
+            from stub_servers import StubDiffusion
+        model = StubDiffusion()
+    generator = AIArtGenerator(
+        args.model_path,
+        device=args.device,
+        batch_size=args.batch_size,
+        model=model,
+        embedding_cache_size=0,
+        memory_options=memory_options
+    )
+    start = time.perf_counter()
+    generator.generate_batch(
+        "benchmark",
+        list(range(1, args.batch_size + 1)),
+        {'height': args.size, 'width': args.size, 'num_inference_steps': args.steps}
+    )
+    stats = generator.memory_stats()
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    print(json.dumps(stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory per AIArtGenerator memory mode")
+    parser.add_argument("--model-path", default="path/to/model")
+    parser.add_argument("--stub", action="store_true", help="Use the stub diffusion model instead of real weights")
+    parser.add_argument("--device", default=None, help="e.g. cpu or cuda (default: cuda if available)")
+    parser.add_argument("--size", type=int, default=512, help="Image width and height")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated subset of " + ", ".join(MODES))
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        render(args, MODES[args.child])
+        return
+
+    results = {}
+    for mode in args.modes.split(","):
+        command = [
+            sys.executable, __file__, "--child", mode,
+            "--model-path", args.model_path,
+            "--size", str(args.size),
+            "--steps", str(args.steps),
+            "--batch-size", str(args.batch_size)
+        ]
+        if args.stub:
+            command.append("--stub")
+        if args.device:
+            command += ["--device", args.device]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            results[mode] = {"error": completed.stderr.strip().splitlines()[-1:]}
+            continue
+        results[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
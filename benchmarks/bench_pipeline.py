@@ -0,0 +1,125 @@
+"""
+Compare the serial mint loop with the staged pipeline
+
+Runs entirely offline: generation is simulated with a fixed delay per
+batch, and IPFS/RPC traffic goes to the local stub servers.
+
+    python benchmarks/bench_pipeline.py --items 16 --pin-latency 0.1
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from blockchain_interface import BlockchainInterface  # noqa: E402
+from image_encoder import ImageEncoder  # noqa: E402
+from ipfs_handler import IPFSHandler  # noqa: E402
+from main import build_mint_stages, iter_generated_images  # noqa: E402
+from nft_metadata import NFTMetadata  # noqa: E402
+from pipeline import MintPipeline  # noqa: E402
+from utils.config_manager import ConfigManager  # noqa: E402
+
+try:
+    from benchmarks.stub_servers import DEV_ADDRESS, DEV_CONTRACT, DEV_PRIVATE_KEY, StubPinata, StubRPC
+except ImportError:
+    from stub_servers import DEV_ADDRESS, DEV_CONTRACT, DEV_PRIVATE_KEY, StubPinata, StubRPC
+
+
+class FakeArtGenerator:
+    """Stands in for AIArtGenerator with a fixed cost per batch"""
+
+    def __init__(self, batch_size=4, seconds_per_batch=0.2, size=256):
+        self.batch_size = batch_size
+        self.seconds_per_batch = seconds_per_batch
+        self.size = size
+        self.encoder = ImageEncoder("png")
+
+    def generate_batch(self, prompt, seeds, style_params=None):
+        time.sleep(self.seconds_per_batch)
+        return [
+            Image.effect_noise((self.size, self.size), 64 + (seed or 0) % 64).convert("RGB")
+            for seed in seeds
+        ]
+
+    def iter_batch(self, prompt, seeds, style_params=None, previews=None):
+        for start in range(0, len(seeds), self.batch_size):
+            chunk = seeds[start:start + self.batch_size]
+            for offset, image in enumerate(self.generate_batch(prompt, chunk, style_params)):
+                yield start + offset, chunk[offset], image
+
+    def generate_variations(self, prompt, num_variations=4, style_params=None):
+        base = (style_params or {}).get('seed') or 0
+        return self.generate_batch(prompt, [base + i for i in range(1, num_variations + 1)], style_params)
+
+    def save_image(self, image, path):
+        return self.encoder.save(image, path)
+
+
+def run_serial(stages, source):
+    results = []
+    for item in source:
+        for stage in stages:
+            item = stage.func(item)
+            if item is None:
+                break
+        else:
+            results.append(item)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs pipelined mint benchmark")
+    parser.add_argument("--items", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--gen-latency", type=float, default=0.2, help="Seconds per generation batch")
+    parser.add_argument("--pin-latency", type=float, default=0.1)
+    parser.add_argument("--rpc-latency", type=float, default=0.01)
+    parser.add_argument("--block-time", type=float, default=0.2)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    style_params = {'seed': 42, 'height': 256, 'width': 256}
+    abi = ConfigManager().default_blockchain_config["contract_abi"]
+    blockchain_config = {"wallet_address": DEV_ADDRESS, "private_key": DEV_PRIVATE_KEY}
+    results = {}
+
+    with StubPinata(latency=args.pin_latency) as pinata, \
+            StubRPC(latency=args.rpc_latency, block_time=args.block_time) as rpc, \
+            tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        Path("output").mkdir()
+        generator = FakeArtGenerator(args.batch_size, args.gen_latency)
+        ipfs = IPFSHandler("key", "secret", api_url=pinata.url)
+        blockchain = BlockchainInterface(rpc.url, DEV_CONTRACT, abi)
+
+        for mode in ("serial", "pipelined"):
+            stages = build_mint_stages(
+                generator, NFTMetadata(), ipfs, blockchain,
+                blockchain_config, style_params, logging.getLogger("bench")
+            )
+            source = iter_generated_images(generator, "benchmark", args.items, style_params)
+            start = time.perf_counter()
+            if mode == "serial":
+                done = run_serial(stages, source)
+            else:
+                done = MintPipeline(stages).run(source)
+            elapsed = time.perf_counter() - start
+            results[mode] = {
+                "items": len(done),
+                "seconds": round(elapsed, 3),
+                "items_per_second": round(len(done) / elapsed, 2) if elapsed else None
+            }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compare the synchronous and async JSON-RPC backends on a mint run
+
+Both backends mint the same number of tokens against the local stub
+node from a pool of threads, like the pipeline's mint stage does. The
+stub counts HTTP round trips, which is where the async backend's
+batching shows up.
+
+    python benchmarks/bench_rpc.py --mints 64 --rpc-latency 0.05
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from async_blockchain import AsyncBlockchainInterface  # noqa: E402
+from blockchain_interface import BlockchainInterface  # noqa: E402
+from utils.config_manager import ConfigManager  # noqa: E402
+
+try:
+    from benchmarks.stub_servers import DEV_ADDRESS, DEV_CONTRACT, DEV_PRIVATE_KEY, StubRPC
+except ImportError:
+    from stub_servers import DEV_ADDRESS, DEV_CONTRACT, DEV_PRIVATE_KEY, StubRPC
+
+
+def run(backend_class, args):
+    abi = ConfigManager().default_blockchain_config["contract_abi"]
+    with StubRPC(latency=args.rpc_latency, block_time=args.block_time) as rpc:
+        blockchain = backend_class(rpc.url, DEV_CONTRACT, abi, poll_interval=0.05)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            receipts = list(executor.map(
+                lambda i: blockchain.mint_nft(DEV_ADDRESS, f"ipfs://bench/{i}.json", DEV_PRIVATE_KEY),
+                range(args.mints)
+            ))
+        elapsed = time.perf_counter() - start
+        if hasattr(blockchain, "close"):
+            blockchain.close()
+        return {
+            "mints": sum(1 for receipt in receipts if receipt),
+            "seconds": round(elapsed, 3),
+            "mints_per_second": round(args.mints / elapsed, 2),
+            "round_trips": rpc.requests,
+            "calls": dict(sorted(rpc.calls.items()))
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async RPC backend benchmark")
+    parser.add_argument("--mints", type=int, default=64, help="Tokens to mint")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent minting threads")
+    parser.add_argument("--rpc-latency", type=float, default=0.05, help="Stub node latency per request")
+    parser.add_argument("--block-time", type=float, default=0.5, help="Stub node block time")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = {
+        "sync": run(BlockchainInterface, args),
+        "async": run(AsyncBlockchainInterface, args)
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+End-to-end benchmark of the mint pipeline on local stand-ins
+
+The real AIArtGenerator, IPFSHandler, BlockchainInterface and pipeline
+stages run against a tiny stub diffusion model, a fake Pinata server
+with configurable latency and error rate, and an eth-tester dev chain
+with a stand-in NFT contract deployed. Everything runs offline on the
+CPU. Reports items/s and p50/p99 latency per stage and end to end, and
+writes the results as JSON.
+
+    python benchmarks/bench_suite.py --items 32 --pin-error-rate 0.05 --output bench_results.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+import torch  # noqa: E402
+
+from art_generator import AIArtGenerator  # noqa: E402
+from blockchain_interface import BlockchainInterface  # noqa: E402
+from ipfs_handler import IPFSHandler  # noqa: E402
+from main import build_mint_stages, iter_generated_images  # noqa: E402
+from metrics import metrics  # noqa: E402
+from nft_metadata import NFTMetadata  # noqa: E402
+from pipeline import MintPipeline, Stage  # noqa: E402
+from utils.config_manager import ConfigManager  # noqa: E402
+
+try:
+    from benchmarks.stub_servers import DevChain, StubDiffusion, StubPinata
+except ImportError:
+    from stub_servers import DevChain, StubDiffusion, StubPinata
+
+ABI_PATH = Path(__file__).resolve().parents[1] / "config" / "contracts" / "nft_contract_abi.json"
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else None
+
+
+def timed_source(source, started):
+    """Stamp each item with the time its generation began"""
+    iterator = iter(source)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        started[item["index"]] = start
+        yield item
+
+
+def run(args):
+    abi = ConfigManager().load_contract_abi(str(ABI_PATH))
+    style_params = {
+        'seed': args.seed,
+        'height': args.size,
+        'width': args.size,
+        'num_inference_steps': args.steps
+    }
+    random.seed(args.seed)
+    metrics.reset()
+    metrics.enable()
+
+    with StubPinata(latency=args.pin_latency, error_rate=args.pin_error_rate) as pinata, \
+            tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        Path("output").mkdir()
+        chain = DevChain()
+        generator = AIArtGenerator(
+            "stub",
+            device=torch.device("cpu"),
+            batch_size=args.batch_size,
+            model=StubDiffusion(seconds_per_step=args.step_latency),
+            embedding_cache_size=0,
+            output_format=args.output_format
+        )
+        ipfs = IPFSHandler("key", "secret", api_url=pinata.url, backoff_factor=0.01)
+        blockchain = BlockchainInterface("dev", chain.contract_address, abi, poll_interval=0.01, provider=chain.provider)
+        blockchain_config = {"wallet_address": chain.address, "private_key": chain.private_key}
+
+        started, finished = {}, {}
+
+        def done(item):
+            finished[item["index"]] = time.perf_counter()
+            return item
+
+        stages = build_mint_stages(
+            generator, NFTMetadata(), ipfs, blockchain, blockchain_config, style_params,
+            logging.getLogger("bench"), save_local_copy=False
+        )
+        stages.append(Stage("done", done))
+        source = iter_generated_images(generator, "benchmark", args.items, style_params)
+
+        start = time.perf_counter()
+        completed = MintPipeline(stages).run(timed_source(source, started))
+        elapsed = time.perf_counter() - start
+        minted = chain.minted()
+        generator.encoder.close()
+        ipfs.close()
+
+    summary = metrics.summary()
+    stages = {}
+    for name, stats in summary["stages"].items():
+        stages[name] = {
+            "count": stats["count"],
+            # Throughput of one worker doing nothing but this stage
+            "items_per_second": round(stats["count"] / stats["total_seconds"], 2) if stats["total_seconds"] else None,
+            "p50_seconds": stats["p50_seconds"],
+            "p99_seconds": stats["p99_seconds"],
+            "retries": summary.get("retries", {}).get(name, 0),
+            "failures": summary.get("failures", {}).get(name, 0)
+        }
+    latencies = sorted(finished[index] - started[index] for index in finished if index in started)
+    return {
+        "parameters": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count()
+        },
+        "end_to_end": {
+            "items": args.items,
+            "completed": len(completed),
+            "minted": minted,
+            "seconds": round(elapsed, 3),
+            "items_per_second": round(len(completed) / elapsed, 2),
+            "p50_seconds": round(percentile(latencies, 0.50), 6) if latencies else None,
+            "p99_seconds": round(percentile(latencies, 0.99), 6) if latencies else None
+        },
+        "stages": stages,
+        "failures": summary.get("failures", {})
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end mint pipeline benchmark on local stand-ins")
+    parser.add_argument("--items", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--size", type=int, default=256, help="Image width and height")
+    parser.add_argument("--steps", type=int, default=20, help="Denoising steps of the stub model")
+    parser.add_argument("--step-latency", type=float, default=0.005, help="Extra seconds per denoising step")
+    parser.add_argument("--output-format", default="png")
+    parser.add_argument("--pin-latency", type=float, default=0.05)
+    parser.add_argument("--pin-error-rate", type=float, default=0.0, help="Share of Pinata requests that fail")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, help="Write the JSON results to this file")
+    args = parser.parse_args()
+    if args.output:
+        args.output = str(Path(args.output).resolve())
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run(args)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Local stand-ins for Pinata and an Ethereum JSON-RPC node
+
+Both servers run in a background thread on 127.0.0.1 with an ephemeral
+port and can inject latency and errors, so benchmarks run offline.
+DevChain is an in-process eth-tester chain that actually executes the
+mint transactions, and StubDiffusion a tiny model for AIArtGenerator.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rlp
+from eth_account import Account
+from eth_utils import keccak
+from hexbytes import HexBytes
+from web3 import EthereumTesterProvider, Web3
+
+# Well-known development account (anvil/hardhat account #0), never funded on mainnet
+DEV_PRIVATE_KEY = "0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80"
+DEV_ADDRESS = "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+DEV_CONTRACT = "0x5FbDB2315678afecb367f032d93F642f64180aa3"
+
+
+class _StubServer:
+    """Run a ThreadingHTTPServer in a daemon thread"""
+
+    def __init__(self, handler_class):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _PinataHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients can reuse their connections
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_status(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with stub.lock:
+            stub.requests += 1
+            stub.connections.add(self.client_address)
+            scripted = stub.fail_statuses.pop(0) if stub.fail_statuses else None
+        time.sleep(stub.latency)
+        if scripted is not None:
+            self._send_status(scripted)
+            return
+        if stub.error_rate and random.random() < stub.error_rate:
+            self._send_status(random.choice([429, 500, 502, 503]))
+            return
+        if not self.path.startswith("/pinning/"):
+            self._send_status(404)
+            return
+        ipfs_hash = "bafk" + hashlib.sha256(body).hexdigest()[:52]
+        with stub.lock:
+            stub.pinned[ipfs_hash] = body
+        payload = json.dumps({
+            "IpfsHash": ipfs_hash,
+            "PinSize": len(body),
+            "Timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ")
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class StubPinata(_StubServer):
+    """
+    Fake Pinata pinning API with configurable latency and error rate
+
+    fail_statuses scripts the answers to the first requests (e.g. [429,
+    503]); pinned maps every returned hash to the request body, and
+    connections holds the client address of every connection used.
+    """
+
+    def __init__(self, latency=0.05, error_rate=0.0, fail_statuses=()):
+        super().__init__(_PinataHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fail_statuses = list(fail_statuses)
+        self.requests = 0
+        self.pinned = {}
+        self.connections = set()
+        self.lock = threading.Lock()
+
+
+class _RPCHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        with stub.lock:
+            stub.requests += 1
+        time.sleep(stub.latency)
+        if isinstance(body, list):
+            response = [stub.handle(call) for call in body]
+        else:
+            response = stub.handle(body)
+        payload = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class StubRPC(_StubServer):
+    """
+    Minimal Ethereum JSON-RPC node
+
+    Raw transactions are accepted without execution; each one is "mined"
+    block_time seconds after it was sent. Only the calls the project makes
+    are implemented.
+    """
+
+    def __init__(self, latency=0.01, block_time=0.5, chain_id=1337):
+        super().__init__(_RPCHandler)
+        self.latency = latency
+        self.block_time = block_time
+        self.chain_id = chain_id
+        self.requests = 0
+        self.calls = {}
+        self.nonces = {}
+        self.sent = {}
+        self.start = time.time()
+        self.lock = threading.Lock()
+
+    def block_number(self):
+        if not self.block_time:
+            return len(self.sent)
+        return int((time.time() - self.start) / self.block_time)
+
+    def _receipt(self, tx_hash):
+        sent_at = self.sent.get(tx_hash)
+        if sent_at is None or time.time() - sent_at < self.block_time:
+            return None
+        block = hex(max(1, self.block_number()))
+        return {
+            "transactionHash": tx_hash,
+            "transactionIndex": "0x0",
+            "blockHash": "0x" + keccak(text=block).hex().replace("0x", ""),
+            "blockNumber": block,
+            "from": "0x" + "00" * 20,
+            "to": "0x" + "00" * 20,
+            "cumulativeGasUsed": "0x186a0",
+            "gasUsed": "0x186a0",
+            "effectiveGasPrice": hex(10**9),
+            "contractAddress": None,
+            "logs": [],
+            "logsBloom": "0x" + "00" * 256,
+            "status": "0x1",
+            "type": "0x2"
+        }
+
+    def handle(self, call):
+        method = call.get("method")
+        params = call.get("params", [])
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if method == "eth_chainId":
+                result = hex(self.chain_id)
+            elif method == "net_version":
+                result = str(self.chain_id)
+            elif method == "eth_blockNumber":
+                result = hex(self.block_number())
+            elif method == "eth_gasPrice":
+                result = hex(10**9)
+            elif method == "eth_maxPriorityFeePerGas":
+                result = hex(10**8)
+            elif method == "eth_estimateGas":
+                result = hex(100000)
+            elif method == "eth_getTransactionCount":
+                result = hex(self.nonces.get(params[0].lower(), 0))
+            elif method == "eth_sendRawTransaction":
+                from eth_account import Account
+                raw = bytes.fromhex(params[0][2:])
+                tx_hash = "0x" + keccak(raw).hex().replace("0x", "")
+                sender = Account.recover_transaction(raw).lower()
+                self.nonces[sender] = self.nonces.get(sender, 0) + 1
+                self.sent[tx_hash] = time.time()
+                result = tx_hash
+            elif method == "eth_getTransactionReceipt":
+                result = self._receipt(params[0])
+            elif method == "eth_getTransactionByHash":
+                result = {"hash": params[0]} if params[0] in self.sent else None
+            elif method == "eth_feeHistory":
+                count = int(params[0], 16) if isinstance(params[0], str) else params[0]
+                percentiles = params[2] if len(params) > 2 else []
+                result = {
+                    "oldestBlock": hex(max(0, self.block_number() - count + 1)),
+                    "baseFeePerGas": [hex(10**9)] * (count + 1),
+                    "gasUsedRatio": [0.5] * count,
+                    "reward": [[hex(10**8)] * len(percentiles)] * count
+                }
+            elif method == "eth_getBlockByNumber":
+                result = {
+                    "number": hex(self.block_number()),
+                    "hash": "0x" + "11" * 32,
+                    "parentHash": "0x" + "00" * 32,
+                    "timestamp": hex(int(time.time())),
+                    "baseFeePerGas": hex(10**9),
+                    "gasLimit": hex(30000000),
+                    "gasUsed": hex(15000000),
+                    "transactions": []
+                }
+            else:
+                return {
+                    "jsonrpc": "2.0",
+                    "id": call.get("id"),
+                    "error": {"code": -32601, "message": f"Method not found: {method}"}
+                }
+        return {"jsonrpc": "2.0", "id": call.get("id"), "result": result}
+
+
+# Runtime code of a stand-in for the NEXIO contract: any call (mintNFT
+# included) increments a token counter, stores the calldata hash under
+# the new token id, emits Transfer(0, recipient, id) and returns the id.
+_TRANSFER_TOPIC = keccak(text="Transfer(address,address,uint256)").hex().replace("0x", "")
+_STUB_RUNTIME = (
+    "600054600101806000553660006000373660002081558060043560007f"
+    + _TRANSFER_TOPIC
+    + "60006000a460005260206000f3"
+)
+_STUB_INIT = (
+    f"60{len(_STUB_RUNTIME) // 2:02x}600c600039"
+    f"60{len(_STUB_RUNTIME) // 2:02x}6000f3"
+    + _STUB_RUNTIME
+)
+
+
+class _DevChainProvider(EthereumTesterProvider):
+    """
+    Thread-safe eth-tester provider with a minimal mempool
+
+    eth-tester executes each transaction as it arrives and rejects any
+    nonce that is not the next one, while concurrent mint workers can
+    send nonce n + 1 before n. Such transactions are held back and
+    submitted once the gap is filled, like a node's queued pool.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._queued = {}
+
+    @staticmethod
+    def _sender_nonce(raw):
+        # Typed transactions start with their type byte, then [chainId, nonce, ...]
+        fields = rlp.decode(raw[1:]) if raw[0] < 0x7f else rlp.decode(raw)
+        nonce = fields[1] if raw[0] < 0x7f else fields[0]
+        return Account.recover_transaction(raw), int.from_bytes(nonce, "big")
+
+    def _next_nonce(self, sender):
+        return super().make_request("eth_getTransactionCount", [sender, "latest"])["result"]
+
+    def make_request(self, method, params):
+        with self._lock:
+            if method != "eth_sendRawTransaction":
+                return super().make_request(method, params)
+            raw = bytes(HexBytes(params[0]))
+            sender, nonce = self._sender_nonce(raw)
+            if nonce > self._next_nonce(sender):
+                self._queued[(sender, nonce)] = raw
+                return {"jsonrpc": "2.0", "id": 0, "result": "0x" + keccak(raw).hex().replace("0x", "")}
+            response = super().make_request(method, params)
+            # Release transactions that were waiting for this nonce
+            while "error" not in response:
+                queued = self._queued.pop((sender, self._next_nonce(sender)), None)
+                if queued is None:
+                    break
+                super().make_request(method, ["0x" + queued.hex()])
+            return response
+
+
+class DevChain:
+    """
+    Local eth-tester chain with a stand-in NFT contract deployed
+
+    Every transaction is executed by py-evm and mined immediately, so
+    gas estimation, nonces and receipts behave like a real node. Pass
+    ``provider`` to BlockchainInterface(provider=...) and mint from
+    ``address`` with ``private_key``, a funded test account.
+    """
+
+    def __init__(self):
+        self.provider = _DevChainProvider()
+        self.w3 = Web3(self.provider)
+        self.address = self.w3.eth.accounts[0]
+        self.private_key = self.provider.ethereum_tester.backend.account_keys[0].to_hex()
+        tx_hash = self.w3.eth.send_transaction({"from": self.address, "data": "0x" + _STUB_INIT})
+        self.contract_address = self.w3.eth.get_transaction_receipt(tx_hash)["contractAddress"]
+
+    def minted(self):
+        """Number of tokens minted so far"""
+        return int.from_bytes(self.w3.eth.get_storage_at(self.contract_address, 0), "big")
+
+
+class StubDiffusion:
+    """
+    Tiny deterministic stand-in for StableDiffusion, for AIArtGenerator(model=...)
+
+    Each denoising step is a cheap tensor update on the latents, and the
+    result is upsampled to pixel size, so images still depend on the
+    seed. seconds_per_step adds a fixed delay per step to mimic a model.
+    """
+
+    def __init__(self, seconds_per_step=0.0):
+        self.seconds_per_step = seconds_per_step
+        self.dtype = None
+
+    def to(self, device=None, dtype=None):
+        if dtype is not None:
+            self.dtype = dtype
+        return self
+
+    def __call__(self, latents=None, num_inference_steps=50, height=512, width=512, **kwargs):
+        import torch
+        if self.dtype is not None:
+            latents = latents.to(self.dtype)
+        for _ in range(num_inference_steps):
+            latents = latents - 0.02 * torch.tanh(latents)
+            if self.seconds_per_step:
+                time.sleep(self.seconds_per_step)
+        pixels = torch.nn.functional.interpolate(latents[:, :3].float(), size=(height, width), mode="bilinear")
+        pixels = ((pixels.tanh() + 1) * 127.5).clamp(0, 255).byte().permute(0, 2, 3, 1).cpu().numpy()
+        from PIL import Image
+        return [Image.fromarray(array) for array in pixels]
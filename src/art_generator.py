@@ -1,11 +1,27 @@
 from PIL import Image
 import numpy as np
-from stable_diffusion_pytorch import StableDiffusion
 import torch
 import logging
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+from embedding_cache import PromptEmbeddingCache
+from generation_cache import GenerationCache
+from image_encoder import ImageEncoder
+from metrics import metrics
 
 class AIArtGenerator:
-    def __init__(self, model_path, device=None):
+    # Latent space is 8x smaller than pixel space with 4 channels
+    LATENT_CHANNELS = 4
+    LATENT_SCALE = 8
+    # Reduced-precision weights selectable with memory_options["dtype"]
+    DTYPES = {"fp16": torch.float16, "bf16": torch.bfloat16}
+
+    def __init__(self, model_path, device=None, batch_size=1, model=None,
+                 embedding_cache_size=128, embedding_cache_dir=None,
+                 result_cache_dir=None, result_cache_max_bytes=2 * 1024**3,
+                 preview_options=None, output_format="png", encode_options=None, memory_options=None):
         # Setup logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
@@ -18,12 +34,132 @@ class AIArtGenerator:
             
         self.logger.info(f"Using device: {self.device}")
         
+        # Maximum number of latents sent through the model in one call
+        self.batch_size = max(1, int(batch_size or 1))
+        
+        # Memory savers for smaller nodes: half-precision weights, sliced
+        # attention, sequential offload and tiled VAE decoding
+        self.memory_options = memory_options or {}
+        self.dtype = self._resolve_dtype(self.memory_options.get("dtype"))
+        
         try:
-            self.model = StableDiffusion.from_pretrained(model_path)
-            self.model.to(self.device)
+            # A preloaded model (e.g. shared-memory weights from a worker
+            # pool) skips loading from disk
+            with metrics.time("model_load"):
+                if model is None:
+                    from stable_diffusion_pytorch import StableDiffusion
+                    model = StableDiffusion.from_pretrained(model_path)
+                self.model = model
+                self._place_model()
         except Exception as e:
             self.logger.error(f"Error loading model: {str(e)}")
             raise
+        
+        # Text encoder outputs are reused across variations and runs when
+        # the model accepts precomputed embeddings
+        self.embedding_cache = None
+        if embedding_cache_size and self._supports_embeddings():
+            self.embedding_cache = PromptEmbeddingCache(
+                model_path,
+                max_entries=embedding_cache_size,
+                cache_dir=embedding_cache_dir
+            )
+        
+        # Settings for the preview-then-render curation mode
+        self.preview_options = preview_options or {}
+        
+        # Seeded generations are deterministic, so finished images can be
+        # reused across runs
+        self.result_cache = None
+        if result_cache_dir:
+            self.result_cache = GenerationCache(
+                result_cache_dir,
+                model_path,
+                max_bytes=result_cache_max_bytes
+            )
+        
+        # Output encoding; saves can run in the background while the
+        # model renders the next batch
+        self.encoder = ImageEncoder(output_format, encode_options)
+    
+    def _resolve_dtype(self, name):
+        if not name:
+            return None
+        if name not in self.DTYPES:
+            raise ValueError(f"Unsupported dtype: {name} (expected one of {', '.join(self.DTYPES)})")
+        if name == "fp16" and torch.device(self.device).type == 'cpu':
+            # Most CPU kernels have no fp16 implementation
+            self.logger.warning("fp16 is not supported on CPU, using bf16")
+            name = "bf16"
+        return self.DTYPES[name]
+    
+    def _enable(self, method_name, *args):
+        """Call an optional memory-saving hook of the model, if it has one"""
+        method = getattr(self.model, method_name, None)
+        if method is None:
+            self.logger.warning(f"Model has no {method_name}(), ignoring that memory option")
+            return False
+        method(*args)
+        self.logger.info(f"Enabled {method_name}")
+        return True
+    
+    def _place_model(self):
+        """Move the model to its device and dtype and apply memory_options"""
+        # Memory options that actually took effect, for memory_stats()
+        self.memory_modes = {"attention_slicing": False, "sequential_offload": False, "vae_tiling": False}
+        if self.dtype is not None:
+            try:
+                self.model.to(dtype=self.dtype)
+            except TypeError:
+                self.logger.warning(f"Model cannot be cast to {self.dtype}, keeping its own precision")
+                self.dtype = None
+        
+        # Offloaded submodules are moved to the device one at a time while
+        # they run, so the model as a whole stays on the CPU
+        offloaded = False
+        if self.memory_options.get("sequential_offload"):
+            if torch.device(self.device).type == 'cpu':
+                self.logger.warning("Sequential offload only helps on an accelerator, ignoring it on CPU")
+            else:
+                offloaded = self._enable("enable_sequential_cpu_offload")
+        if not offloaded:
+            self.model.to(self.device)
+        self.memory_modes["sequential_offload"] = offloaded
+        
+        slicing = self.memory_options.get("attention_slicing")
+        if slicing:
+            # True lets the model pick the slice size; a number or "max" is passed on
+            if self._enable("enable_attention_slicing", *([] if slicing is True else [slicing])):
+                self.memory_modes["attention_slicing"] = slicing
+        if self.memory_options.get("vae_tiling"):
+            if hasattr(self.model, "enable_vae_tiling"):
+                self.memory_modes["vae_tiling"] = self._enable("enable_vae_tiling")
+            elif hasattr(getattr(self.model, "vae", None), "enable_tiling"):
+                self.model.vae.enable_tiling()
+                self.memory_modes["vae_tiling"] = True
+                self.logger.info("Enabled VAE tiling")
+            else:
+                self.logger.warning("Model has no VAE tiling, ignoring that memory option")
+    
+    def memory_stats(self):
+        """
+        Peak memory used so far, with the memory options in effect
+        
+        peak_device_bytes is the CUDA allocator's high-water mark and
+        peak_rss_bytes the process's peak resident set size (which
+        covers CPU inference and offloaded weights).
+        """
+        stats = {
+            "device": str(self.device),
+            "dtype": str(self.dtype or torch.float32).replace("torch.", ""),
+            **self.memory_modes
+        }
+        if torch.device(self.device).type == 'cuda':
+            stats["peak_device_bytes"] = torch.cuda.max_memory_allocated(self.device)
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux
+            stats["peak_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return stats
     
     def generate_art(self, prompt, style_params=None):
         """
@@ -40,76 +176,331 @@ class AIArtGenerator:
                 negative_prompt (str, optional): Things to avoid in the image
         """
         try:
-            # Set default style parameters if none provided
-            default_params = {
-                'height': 512,
-                'width': 512,
-                'num_inference_steps': 50,
-                'guidance_scale': 7.5,
-                'negative_prompt': None,
-                'seed': None
-            }
-            
-            if style_params is None:
-                style_params = default_params
-            else:
-                # Update defaults with provided parameters
-                for key, value in default_params.items():
-                    if key not in style_params:
-                        style_params[key] = value
-            
-            # Set seed if provided
-            if style_params['seed'] is not None:
-                torch.manual_seed(style_params['seed'])
+            style_params = self._resolve_style_params(style_params)
             
             self.logger.info(f"Generating image with prompt: {prompt}")
             self.logger.info(f"Style parameters: {style_params}")
             
-            # Generate image using Stable Diffusion
-            generation_params = {
-                'prompt': prompt,
-                'height': style_params['height'],
-                'width': style_params['width'],
-                'num_inference_steps': style_params['num_inference_steps'],
-                'guidance_scale': style_params['guidance_scale']
-            }
-            
-            if style_params['negative_prompt']:
-                generation_params['negative_prompt'] = style_params['negative_prompt']
-            
-            image = self.model(**generation_params)
+            images = self.generate_batch(prompt, [style_params['seed']], style_params)
+            if not images:
+                return None
             
             self.logger.info("Image generation successful")
-            return image
+            return images[0]
             
         except Exception as e:
             self.logger.error(f"Error generating art: {str(e)}")
             return None
     
+    def _resolve_style_params(self, style_params):
+        """Fill in default style parameters that were not provided"""
+        default_params = {
+            'height': 512,
+            'width': 512,
+            'num_inference_steps': 50,
+            'guidance_scale': 7.5,
+            'negative_prompt': None,
+            'seed': None
+        }
+        
+        if style_params is None:
+            return dict(default_params)
+        
+        # Update defaults with provided parameters
+        for key, value in default_params.items():
+            if key not in style_params:
+                style_params[key] = value
+        return style_params
+    
+    def _prepare_latents(self, seeds, height, width):
+        """
+        Build the initial noise for a batch, one independent generator per seed
+        
+        Noise is drawn on the CPU so that a given seed yields the same latent
+        regardless of the device or of which batch it ends up in.
+        """
+        shape = (
+            self.LATENT_CHANNELS,
+            height // self.LATENT_SCALE,
+            width // self.LATENT_SCALE
+        )
+        latents = []
+        for seed in seeds:
+            if seed is None:
+                seed = torch.randint(0, 2**32 - 1, (1,)).item()
+            generator = torch.Generator(device='cpu').manual_seed(int(seed))
+            latents.append(torch.randn(shape, generator=generator))
+        return torch.stack(latents).to(self.device, dtype=self.dtype or torch.float32)
+    
+    def _supports_embeddings(self):
+        """Whether the model can encode prompts separately from denoising"""
+        return hasattr(self.model, 'encode_prompt') or (
+            hasattr(self.model, 'tokenizer') and hasattr(self.model, 'text_encoder')
+        )
+    
+    def _encode_prompt(self, text):
+        """Run the text encoder for a single prompt"""
+        with torch.no_grad():
+            if hasattr(self.model, 'encode_prompt'):
+                return self.model.encode_prompt(text)
+            tokens = self.model.tokenizer(
+                text,
+                padding='max_length',
+                max_length=self.model.tokenizer.model_max_length,
+                truncation=True,
+                return_tensors='pt'
+            ).input_ids.to(self.device)
+            return self.model.text_encoder(tokens)[0]
+    
+    @staticmethod
+    def _prompt_at(prompt, i):
+        """The prompt for position i; prompt is one string or one per seed"""
+        return prompt[i] if isinstance(prompt, (list, tuple)) else prompt
+    
+    def _prompt_params(self, prompt, negative_prompt, count):
+        """Prompt arguments for a batch, using cached embeddings when possible"""
+        prompts = [self._prompt_at(prompt, i) for i in range(count)]
+        if self.embedding_cache is None:
+            params = {'prompt': prompts}
+            if negative_prompt:
+                params['negative_prompt'] = [negative_prompt] * count
+            return params
+        
+        dtype = self.dtype or torch.float32
+        params = {'prompt_embeds': torch.cat([
+            self.embedding_cache.get(text, self._encode_prompt).to(self.device, dtype=dtype)
+            for text in prompts
+        ])}
+        if negative_prompt:
+            negative_embeds = self.embedding_cache.get(negative_prompt, self._encode_prompt).to(self.device, dtype=dtype)
+            params['negative_prompt_embeds'] = torch.cat([negative_embeds] * count)
+        return params
+    
+    def _run_model(self, prompt, seeds, style_params, init_images=None, strength=None):
+        """
+        Run a single denoising pass for every seed in one latent batch
+        
+        With init_images the pass is img2img: denoising starts from those
+        images, keeping ``strength`` of the noise schedule.
+        """
+        generation_params = {
+            'height': style_params['height'],
+            'width': style_params['width'],
+            'num_inference_steps': style_params['num_inference_steps'],
+            'guidance_scale': style_params['guidance_scale'],
+            'latents': self._prepare_latents(
+                seeds,
+                style_params['height'],
+                style_params['width']
+            )
+        }
+        generation_params.update(
+            self._prompt_params(prompt, style_params['negative_prompt'], len(seeds))
+        )
+        if init_images is not None:
+            generation_params['image'] = init_images
+            generation_params['strength'] = strength
+        
+        with torch.no_grad(), metrics.time("denoise"):
+            images = self.model(**generation_params)
+        
+        if not isinstance(images, (list, tuple)):
+            images = [images]
+        return list(images)
+    
     def save_image(self, image, path):
         """Save the generated image to a file"""
-        try:
-            if image is not None:
-                image.save(path)
-                self.logger.info(f"Image saved successfully to {path}")
-                return True
-            self.logger.warning("No image to save")
-            return False
-        except Exception as e:
-            self.logger.error(f"Error saving image: {str(e)}")
-            return False
+        return self.encoder.save(image, path)
+    
+    def close(self):
+        """Wait for background saves and stop the encoder pool"""
+        self.encoder.close()
+
+    def save_image_async(self, image, path):
+        """Save on a background thread; returns a Future resolving to save_image's result"""
+        return self.encoder.save_async(image, path)
+    
+    @staticmethod
+    def variation_seeds(num_variations, style_params=None):
+        """
+        Seeds used for a set of variations: base seed + 1, + 2, ...
+
+        Without a base seed, random seeds are drawn up front so every
+        variation still has a known seed.
+        """
+        base_seed = (style_params or {}).get('seed')
+        if base_seed is None:
+            return [torch.randint(0, 2**32 - 1, (1,)).item() for _ in range(num_variations)]
+        return [base_seed + i for i in range(1, num_variations + 1)]
+    
+    def _cache_key(self, prompt, style_params, seed):
+        if self.result_cache is None or seed is None:
+            return None
+        if self.dtype is not None:
+            # Reduced precision renders slightly different pixels
+            style_params = {**style_params, 'dtype': str(self.dtype)}
+        return self.result_cache.key(prompt, style_params, seed)
+    
+    def _iter_seeds(self, prompt, seeds, style_params, init_images=None, strength=None):
+        """
+        Yield (position, image) for seeds as soon as each image is available
+        
+        Seeds already in the result cache are served from disk first; the
+        rest are batched through the model and yielded batch by batch.
+        Failed batches are logged and skipped. img2img results are not
+        cached since they depend on the init image.
+        """
+        if init_images is None:
+            keys = [
+                self._cache_key(self._prompt_at(prompt, i), style_params, seed)
+                for i, seed in enumerate(seeds)
+            ]
+        else:
+            keys = [None] * len(seeds)
+        missing = []
+        for i, key in enumerate(keys):
+            image = self.result_cache.get(key) if key else None
+            if image is None:
+                missing.append(i)
+            else:
+                yield i, image
+        
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start:start + self.batch_size]
+            self.logger.info(
+                f"Generating variations {start + 1}-{start + len(chunk)}/{len(missing)}"
+            )
+            try:
+                generated = self._run_model(
+                    [self._prompt_at(prompt, i) for i in chunk],
+                    [seeds[i] for i in chunk],
+                    style_params,
+                    init_images=[init_images[i] for i in chunk] if init_images is not None else None,
+                    strength=strength
+                )
+            except Exception as e:
+                self.logger.error(f"Error generating variation batch: {str(e)}")
+                continue
+            for i, image in zip(chunk, generated):
+                if keys[i]:
+                    self.result_cache.put(keys[i], image)
+                yield i, image
+    
+    def _generate_seeds(self, prompt, seeds, style_params, init_images=None, strength=None):
+        """Generate one image per seed, aligned with seeds (None where it failed)"""
+        images = [None] * len(seeds)
+        for i, image in self._iter_seeds(prompt, seeds, style_params, init_images, strength):
+            images[i] = image
+        return images
+    
+    def iter_batch(self, prompt, seeds, style_params=None, previews=None):
+        """
+        Stream (position, seed, image) as each batch completes
+        
+        Positions index into seeds; results may arrive out of order when
+        some seeds come from the result cache. prompt is one string for
+        every seed or a list with one prompt per seed. With previews ({seed: image})
+        and final_mode 'img2img', previews are upscaled and refined instead
+        of rendered from scratch (see render_selected).
+        """
+        style_params = self._resolve_style_params(style_params)
+        init_images, strength = None, None
+        if previews and self.preview_options.get('final_mode') == 'img2img':
+            size = (style_params['width'], style_params['height'])
+            init_images = []
+            for seed in seeds:
+                if seed not in previews:
+                    raise ValueError(f"No preview image for seed {seed}")
+                init_images.append(previews[seed].convert('RGB').resize(size, Image.LANCZOS))
+            strength = self.preview_options.get('strength', 0.5)
+        
+        for i, image in self._iter_seeds(prompt, seeds, style_params, init_images, strength):
+            yield i, seeds[i], image
+    
+    def generate_batch(self, prompt, seeds, style_params=None):
+        """Generate one image per seed, in latent batches of at most ``batch_size``"""
+        style_params = self._resolve_style_params(style_params)
+        images = self._generate_seeds(prompt, seeds, style_params)
+        return [image for image in images if image is not None]
+    
+    def preview_params(self, style_params=None, preview_options=None):
+        """
+        Cheap version of style_params for candidate previews
+        
+        preview_options:
+            scale (float): Fraction of the final width/height (default 1.0)
+            num_inference_steps (int): Denoising steps (default 15)
+        
+        At scale 1.0 the latents match the final render, so a full-quality
+        rerender of a seed keeps the preview's composition. Smaller previews
+        are best finished with img2img.
+        """
+        options = preview_options or self.preview_options
+        params = dict(self._resolve_style_params(style_params))
+        scale = options.get('scale', 1.0)
+        # Latent dims must stay whole numbers
+        multiple = self.LATENT_SCALE
+        params['height'] = max(multiple, int(params['height'] * scale) // multiple * multiple)
+        params['width'] = max(multiple, int(params['width'] * scale) // multiple * multiple)
+        params['num_inference_steps'] = min(
+            params['num_inference_steps'],
+            options.get('num_inference_steps', 15)
+        )
+        return params
+    
+    def generate_previews(self, prompt, num_candidates, style_params=None, preview_options=None):
+        """
+        Generate a large pool of cheap candidates for curation
+        
+        Returns (seed, image) pairs; pass the chosen seeds to render_selected.
+        """
+        style_params = self._resolve_style_params(style_params)
+        seeds = self.variation_seeds(num_candidates, style_params)
+        params = self.preview_params(style_params, preview_options)
+        self.logger.info(
+            f"Generating {num_candidates} previews at {params['width']}x{params['height']}, "
+            f"{params['num_inference_steps']} steps"
+        )
+        images = self._generate_seeds(prompt, seeds, params)
+        return [(seed, image) for seed, image in zip(seeds, images) if image is not None]
+    
+    def render_selected(self, prompt, seeds, style_params=None, previews=None):
+        """
+        Render curated seeds at full quality
+        
+        By default each seed is rendered again from scratch with the full
+        style_params. With preview_options final_mode 'img2img' and the
+        preview images given as {seed: image}, previews are upscaled and
+        refined instead, keeping ``strength`` of the denoising schedule.
+        Returns images in seed order, skipping failures.
+        """
+        images = [None] * len(seeds)
+        for i, _, image in self.iter_batch(prompt, seeds, style_params, previews):
+            images[i] = image
+        return [image for image in images if image is not None]
+    
+    def iter_variations(self, prompt, num_variations=4, style_params=None):
+        """
+        Stream variations as (index, seed, image), one batch at a time
+        
+        Unlike generate_variations, only the current batch is held in
+        memory and callers can start on the first images while later
+        batches are still rendering. Indices start at 1.
+        """
+        style_params = self._resolve_style_params(style_params)
+        seeds = self.variation_seeds(num_variations, style_params)
+        for i, seed, image in self.iter_batch(prompt, seeds, style_params):
+            yield i + 1, seed, image
     
     def generate_variations(self, prompt, num_variations=4, style_params=None):
-        """Generate multiple variations of the same prompt"""
-        images = []
-        for i in range(num_variations):
-            if style_params and 'seed' in style_params:
-                # Increment seed for each variation
-                style_params['seed'] += 1
-            
-            self.logger.info(f"Generating variation {i+1}/{num_variations}")
-            image = self.generate_art(prompt, style_params)
-            if image is not None:
-                images.append(image)
+        """
+        Generate multiple variations of the same prompt
         
-        return images 
\ No newline at end of file
+        Variations are rendered in latent batches of at most ``batch_size``
+        images, with one seed per variation. Seeds follow the same schedule
+        as before (base seed + 1, + 2, ...), so a batched run produces the
+        same images as generating each seed on its own.
+        """
+        style_params = self._resolve_style_params(style_params)
+        seeds = self.variation_seeds(num_variations, style_params)
+        return self.generate_batch(prompt, seeds, style_params)
@@ -0,0 +1,482 @@
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+import aiohttp
+from hexbytes import HexBytes
+from web3 import AsyncWeb3
+from web3.datastructures import AttributeDict
+from web3.exceptions import TimeExhausted
+
+from blockchain_interface import BlockchainInterface, FeeOracle, encode_call
+from metrics import metrics
+
+class RPCError(Exception):
+    """Error object returned by the node for one call"""
+
+class AsyncBlockchainInterface:
+    """
+    Minting backend that shares JSON-RPC round trips between transactions
+
+    An asyncio loop in a background thread owns one pooled aiohttp
+    session (also used by the AsyncWeb3 provider). Mints requested within
+    batch_window seconds of each other, from any thread, are prepared and
+    broadcast together: chain id, pending nonce and fee history come back
+    in one JSON-RPC batch, gas is estimated once per calldata shape in a
+    second, and the signed transactions go out in a third. A single
+    poller checks every pending receipt in one batch per poll_interval.
+
+    The synchronous methods mirror BlockchainInterface, so it can replace
+    it in main(). Dropped transactions are reported as TimeExhausted
+    after drop_timeout rather than rebroadcast.
+    """
+
+    GAS_MARGIN = BlockchainInterface.GAS_MARGIN
+    succeeded = staticmethod(BlockchainInterface.succeeded)
+
+    def __init__(self, provider_url, contract_address, contract_abi, poll_interval=0.1, drop_timeout=120.0,
+                 fee_ttl=12.0, max_connections=32, batch_window=0.01, max_batch_size=100):
+        self.logger = logging.getLogger(__name__)
+        self.provider_url = provider_url
+        self.w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(provider_url))
+        self.contract = self.w3.eth.contract(address=contract_address, abi=contract_abi)
+        self.poll_interval = poll_interval
+        self.drop_timeout = drop_timeout
+        self.fee_ttl = fee_ttl
+        self.max_connections = max_connections
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.round_trips = 0
+
+        self._ids = itertools.count(1)
+        self._session = None
+        self._chain_id = None
+        self._nonces = {}
+        self._fees = None
+        self._fees_fetched_at = 0.0
+        self._gas_estimates = {}
+        self._queued = []
+        self._flush_scheduled = False
+        self._pending = {}
+        self._poller = None
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async-rpc", daemon=True)
+        self._thread.start()
+
+    def _submit(self, coro):
+        """Run a coroutine on the backend loop and return a concurrent Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _get_session(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=60)
+            )
+            await self.w3.provider.cache_async_session(self._session)
+        return self._session
+
+    async def _rpc_batch(self, calls):
+        """
+        Send (method, params) pairs as one JSON-RPC batch
+
+        Returns one result per call, or an RPCError in place of a result
+        the node rejected.
+        """
+        if not calls:
+            return []
+        requests = [
+            {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+            for method, params in calls
+        ]
+        session = await self._get_session()
+        async with session.post(self.provider_url, json=requests) as response:
+            response.raise_for_status()
+            replies = await response.json(content_type=None)
+        self.round_trips += 1
+        if isinstance(replies, dict):
+            # Nodes without batch support answer with a single error
+            raise RPCError(replies.get("error", replies))
+        by_id = {reply.get("id"): reply for reply in replies}
+        results = []
+        for request in requests:
+            reply = by_id.get(request["id"], {"error": {"message": "missing from batch response"}})
+            if "error" in reply:
+                results.append(RPCError(reply["error"].get("message", reply["error"])))
+            else:
+                results.append(reply.get("result"))
+        return results
+
+    async def _rpc(self, method, params):
+        result = (await self._rpc_batch([(method, params)]))[0]
+        if isinstance(result, RPCError):
+            raise result
+        return result
+
+    def _encode_call(self, fn_name, args):
+        return encode_call(self.contract, fn_name, args)
+
+    async def _prepare(self, senders):
+        """Fetch whatever of chain id, nonces and fees is missing in one batch"""
+        calls = []
+        if self._chain_id is None:
+            calls.append(("chain_id", ("eth_chainId", [])))
+        for sender in senders:
+            if self._nonces.get(sender) is None:
+                calls.append((("nonce", sender), ("eth_getTransactionCount", [sender, "pending"])))
+        fees_stale = self._fees is None or time.time() - self._fees_fetched_at >= self.fee_ttl
+        if fees_stale:
+            calls += [
+                ("fee_history", ("eth_feeHistory", [hex(10), "latest", [50]])),
+                ("latest_block", ("eth_getBlockByNumber", ["latest", False])),
+                ("priority_fee", ("eth_maxPriorityFeePerGas", [])),
+                ("gas_price", ("eth_gasPrice", []))
+            ]
+        if not calls:
+            return
+        results = dict(zip((key for key, _ in calls), await self._rpc_batch([call for _, call in calls])))
+
+        if "chain_id" in results:
+            self._chain_id = int(self._raise(results["chain_id"]), 16)
+        for sender in senders:
+            if ("nonce", sender) in results:
+                self._nonces[sender] = int(self._raise(results[("nonce", sender)]), 16)
+        if fees_stale:
+            self._fees = self._fees_from(results)
+            self._fees_fetched_at = time.time()
+
+    @staticmethod
+    def _raise(result):
+        if isinstance(result, RPCError):
+            raise result
+        return result
+
+    def _fees_from(self, results):
+        history = results["fee_history"]
+        if isinstance(history, RPCError):
+            history = {}
+        history = {
+            "baseFeePerGas": [int(fee, 16) for fee in history.get("baseFeePerGas") or []],
+            "reward": [[int(fee, 16) for fee in block] for block in history.get("reward") or []]
+        }
+        base_fee = FeeOracle.next_base_fee(history)
+        block = results["latest_block"]
+        if base_fee is None and isinstance(block, dict) and block.get("baseFeePerGas"):
+            base_fee = int(block["baseFeePerGas"], 16)
+        if base_fee is None:
+            return {'gasPrice': int(self._raise(results["gas_price"]), 16)}
+        priority_fee = FeeOracle.median_reward(history)
+        if priority_fee is None:
+            priority_fee = int(self._raise(results["priority_fee"]), 16)
+        return FeeOracle.caps(base_fee, priority_fee)
+
+    async def _estimate_gas(self, requests):
+        """Fill the gas estimate cache for any new calldata shapes in one batch"""
+        missing = {}
+        for request in requests:
+            key = (request["data"][:10], len(request["data"]))
+            if key not in self._gas_estimates and key not in missing:
+                missing[key] = (
+                    "eth_estimateGas",
+                    [{"from": request["sender"], "to": self.contract.address, "data": request["data"]}]
+                )
+        results = await self._rpc_batch(list(missing.values()))
+        for key, result in zip(missing, results):
+            self._gas_estimates[key] = int(int(self._raise(result), 16) * self.GAS_MARGIN)
+
+    async def _send(self, sender, data, private_key, on_signed=None):
+        """
+        Queue a transaction for the next broadcast batch and return its hash
+
+        on_signed is called with the hash before the batch is broadcast,
+        and with None if the node rejects the transaction.
+        """
+        future = self._loop.create_future()
+        self._queued.append({
+            "sender": sender, "data": data, "key": private_key, "future": future, "on_signed": on_signed
+        })
+        if len(self._queued) >= self.max_batch_size:
+            await self._flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._loop.call_later(self.batch_window, lambda: asyncio.ensure_future(self._flush()))
+        return await future
+
+    async def _flush(self):
+        self._flush_scheduled = False
+        requests, self._queued = self._queued, []
+        if not requests:
+            return
+        try:
+            await self._prepare({request["sender"] for request in requests})
+            await self._estimate_gas(requests)
+            signed = []
+            for request in requests:
+                nonce = self._nonces[request["sender"]]
+                self._nonces[request["sender"]] = nonce + 1
+                transaction = {
+                    'chainId': self._chain_id,
+                    'to': self.contract.address,
+                    'value': 0,
+                    'data': request["data"],
+                    'gas': self._gas_estimates[(request["data"][:10], len(request["data"]))],
+                    'nonce': nonce,
+                    **self._fees
+                }
+                with metrics.time("sign"):
+                    signed_txn = self.w3.eth.account.sign_transaction(transaction, private_key=request["key"])
+                signed.append(signed_txn.rawTransaction)
+                request["hash"] = signed_txn.hash
+            for request in requests:
+                if request["on_signed"] is not None:
+                    request["on_signed"](request["hash"])
+            # One batched round trip sends them all, so each waits the same time
+            start = time.perf_counter()
+            results = await self._rpc_batch([
+                ("eth_sendRawTransaction", [HexBytes(raw).hex()]) for raw in signed
+            ])
+            for _ in signed:
+                metrics.observe("send", time.perf_counter() - start)
+        except Exception as e:
+            metrics.failure("send", len(requests))
+            for request in requests:
+                if not request["future"].done():
+                    request["future"].set_exception(e)
+            # Nonces may have been handed out for transactions never sent
+            self._nonces.clear()
+            return
+
+        failed = False
+        for request, result in zip(requests, results):
+            if isinstance(result, RPCError):
+                failed = True
+                metrics.failure("send")
+                if request["on_signed"] is not None:
+                    request["on_signed"](None)
+                request["future"].set_exception(result)
+            else:
+                request["future"].set_result(HexBytes(result))
+        if failed:
+            self.logger.warning("Some transactions in the batch were rejected, resyncing nonces")
+            self._nonces.clear()
+
+    @staticmethod
+    def _format_receipt(receipt):
+        formatted = dict(receipt)
+        for field in ("transactionHash", "blockHash"):
+            formatted[field] = HexBytes(receipt[field])
+        for field in ("blockNumber", "gasUsed", "cumulativeGasUsed", "status", "transactionIndex"):
+            if isinstance(receipt.get(field), str):
+                formatted[field] = int(receipt[field], 16)
+        return AttributeDict(formatted)
+
+    async def _track(self, tx_hash):
+        future = self._loop.create_future()
+        self._pending[HexBytes(tx_hash)] = (future, time.time())
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.ensure_future(self._poll())
+        return await future
+
+    async def _poll(self):
+        """Check every pending receipt in one batch per poll interval"""
+        while self._pending:
+            pending = list(self._pending.items())
+            try:
+                results = await self._rpc_batch([
+                    ("eth_getTransactionReceipt", [tx_hash.hex()]) for tx_hash, _ in pending
+                ])
+            except Exception as e:
+                self.logger.error(f"Error polling transaction receipts: {str(e)}")
+                results = [None] * len(pending)
+            now = time.time()
+            for (tx_hash, (future, sent_at)), receipt in zip(pending, results):
+                if isinstance(receipt, dict):
+                    del self._pending[tx_hash]
+                    metrics.observe("confirm", now - sent_at)
+                    future.set_result(self._format_receipt(receipt))
+                elif now - sent_at >= self.drop_timeout:
+                    del self._pending[tx_hash]
+                    metrics.failure("confirm")
+                    future.set_exception(TimeExhausted(f"Transaction {tx_hash.hex()} was not mined in time"))
+            await asyncio.sleep(self.poll_interval)
+
+    async def _send_mint(self, wallet_address, token_uri, private_key, sent=None, on_signed=None):
+        data = self._encode_call('mintNFT', [wallet_address, token_uri])
+        tx_hash = await self._send(wallet_address, data, private_key, on_signed)
+        if sent is not None:
+            sent(tx_hash)
+        return await self._track(tx_hash)
+
+    def send_mint(self, wallet_address, token_uri, private_key, job_ledger=None, token_index=None):
+        """
+        Send a mint transaction without waiting for it to be mined
+
+        Returns a Future that resolves to the transaction receipt, with the
+        transaction hash as its tx_hash attribute. With a job_ledger, the
+        token is marked tx_sent with the signed hash before the broadcast
+        batch goes out and confirmed once mined without reverting.
+        """
+        broadcast = threading.Event()
+        sent_hash = []
+
+        def sent(tx_hash):
+            sent_hash.append(tx_hash)
+            broadcast.set()
+
+        def on_signed(tx_hash):
+            BlockchainInterface.record_sent(job_ledger, [token_index], tx_hash)
+
+        future = self._submit(self._send_mint(
+            wallet_address, token_uri, private_key, sent, on_signed if job_ledger is not None else None
+        ))
+        future.add_done_callback(lambda done: broadcast.set())
+        broadcast.wait()
+        if not sent_hash:
+            # Failed before broadcast; surface the error like the sync backend
+            future.result()
+        future.tx_hash = sent_hash[0]
+        if job_ledger is not None:
+            future.add_done_callback(lambda done: BlockchainInterface.record_mined(job_ledger, [token_index], done))
+        return future
+
+    def mint_nft(self, wallet_address, token_uri, private_key, timeout=120, job_ledger=None, token_index=None):
+        try:
+            return self.send_mint(
+                wallet_address,
+                token_uri,
+                private_key,
+                job_ledger=job_ledger,
+                token_index=token_index
+            ).result(timeout)
+        except Exception as e:
+            print(f"Error minting NFT: {str(e)}")
+            return None
+
+    def track_transaction(self, tx_hash):
+        """Return a receipt Future for a transaction sent earlier, e.g. before a restart"""
+        return self._submit(self._track(tx_hash))
+
+    async def _resume(self, tx_hash):
+        receipt, transaction = await self._rpc_batch([
+            ("eth_getTransactionReceipt", [HexBytes(tx_hash).hex()]),
+            ("eth_getTransactionByHash", [HexBytes(tx_hash).hex()])
+        ])
+        return self._raise(receipt), self._raise(transaction)
+
+    def resume_transaction(self, tx_hash):
+        """
+        Receipt Future for a transaction recorded before a restart, or None
+
+        The receipt and the transaction are looked up in one batch: a
+        mined transaction resolves right away, a pending one is tracked,
+        and one the node has never seen (e.g. presigned but never
+        broadcast) gives None instead of waiting for drop_timeout.
+        """
+        receipt, transaction = self._submit(self._resume(tx_hash)).result()
+        if isinstance(receipt, dict):
+            future = Future()
+            future.set_result(self._format_receipt(receipt))
+            return future
+        if transaction is None:
+            return None
+        return self.track_transaction(tx_hash)
+
+    async def _send_raw(self, signed_transactions):
+        for start in range(0, len(signed_transactions), self.max_batch_size):
+            chunk = signed_transactions[start:start + self.max_batch_size]
+            results = await self._rpc_batch([
+                ("eth_sendRawTransaction", [HexBytes(raw_transaction).hex()])
+                for raw_transaction, _ in chunk
+            ])
+            for (_, tx_hash), result in zip(chunk, results):
+                if isinstance(result, RPCError):
+                    metrics.failure("send")
+                    self.logger.warning(f"Node rejected {tx_hash}: {str(result)}")
+
+    def broadcast_signed(self, signed_transactions):
+        """
+        Send presigned (raw_transaction, tx_hash) pairs in JSON-RPC batches
+
+        Returns one receipt Future per transaction. Rejected transactions
+        (e.g. already sent by an earlier broadcast) are still tracked by
+        their hash.
+        """
+        self._submit(self._send_raw(list(signed_transactions))).result()
+        return [self.track_transaction(tx_hash) for _, tx_hash in signed_transactions]
+
+    async def _send_mints(self, wallet_address, token_uris, private_key, job_ledger, token_indices):
+        """Queue mints for the next broadcast batch; returns a hash or the error per token"""
+        sends = []
+        for token_uri, token_index in zip(token_uris, token_indices):
+            on_signed = None
+            if job_ledger is not None:
+                def on_signed(tx_hash, token_index=token_index):
+                    BlockchainInterface.record_sent(job_ledger, [token_index], tx_hash)
+            data = self._encode_call('mintNFT', [wallet_address, token_uri])
+            sends.append(self._send(wallet_address, data, private_key, on_signed))
+        return await asyncio.gather(*sends, return_exceptions=True)
+
+    async def _confirm(self, tx_hash, job_ledger, token_index):
+        receipt = await self._track(tx_hash)
+        if job_ledger is not None:
+            BlockchainInterface.record_receipt(job_ledger, [token_index], receipt)
+        return receipt
+
+    def mint_batch(self, wallet_address, recipients, token_uris, private_key, max_batch_size=None, timeout=120,
+                   job_ledger=None, token_indices=None):
+        """
+        Mint many tokens with one mintNFT transaction each, broadcast in batches
+
+        Every transaction shares the same few round trips, so this needs
+        no batch entry point on the contract. Mints are broadcast
+        max_batch_size (default: the backend's) at a time, each chunk
+        once the previous one is out. Returns one receipt per token, with
+        None for a mint that failed or was not mined within timeout
+        seconds, or None if nothing could be sent. A job_ledger is
+        updated per token as in send_mint.
+        """
+        max_batch_size = max_batch_size or self.max_batch_size
+        if job_ledger is None:
+            token_indices = [None] * len(token_uris)
+        futures = []
+        try:
+            if any(recipient != wallet_address for recipient in recipients):
+                raise ValueError("mintNFT can only mint to the sending wallet")
+            for start in range(0, len(token_uris), max_batch_size):
+                chunk = slice(start, start + max_batch_size)
+                sent = self._submit(self._send_mints(
+                    wallet_address, token_uris[chunk], private_key, job_ledger, token_indices[chunk]
+                )).result(timeout)
+                for tx_hash, token_index in zip(sent, token_indices[chunk]):
+                    if isinstance(tx_hash, Exception):
+                        self.logger.error(f"Error sending mint: {str(tx_hash)}")
+                        futures.append(None)
+                    else:
+                        futures.append(self._submit(self._confirm(tx_hash, job_ledger, token_index)))
+        except Exception as e:
+            print(f"Error batch minting NFTs: {str(e)}")
+            if not futures:
+                return None
+            futures += [None] * (len(token_uris) - len(futures))
+
+        receipts = []
+        for future in futures:
+            try:
+                receipts.append(future.result(timeout) if future is not None else None)
+            except Exception as e:
+                self.logger.error(f"Error waiting for mint receipt: {str(e)}")
+                receipts.append(None)
+        return receipts
+
+    async def _close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    def close(self):
+        self._submit(self._close()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
@@ -1,37 +1,743 @@
 from web3 import Web3
+from hexbytes import HexBytes
+from web3.exceptions import TimeExhausted, TransactionNotFound
+from concurrent.futures import Future
 import json
+import logging
+import requests
+import threading
+import urllib3
+import time
+
+from metrics import metrics
+
+def encode_call(contract, fn_name, args):
+    """ABI-encode a contract call as calldata"""
+    # encodeABI was renamed to encode_abi in later web3 releases
+    encode_abi = getattr(contract, 'encode_abi', None) or contract.encodeABI
+    return encode_abi(fn_name=fn_name, args=args)
+
+class NonceManager:
+    """
+    Hand out nonces for one account locally
+
+    The pending transaction count is read from the node once; after that
+    nonces are allocated in memory so several transactions can be sent
+    back to back without colliding. A nonce whose transaction never made
+    it to the node is only taken back while nothing was allocated after
+    it; otherwise the caller has to fill the gap. When the node rejects a
+    nonce, resync() reseeds the count from the node.
+    """
+
+    def __init__(self, w3, address):
+        self.w3 = w3
+        self.address = address
+        self._next = None
+        self._lock = threading.Lock()
+
+    def allocate(self):
+        with self._lock:
+            if self._next is None:
+                self._next = self.w3.eth.get_transaction_count(self.address, 'pending')
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def release(self, nonce):
+        """
+        Return a nonce whose transaction was never broadcast
+
+        Returns False when a later nonce is already out, which leaves a
+        gap the caller has to fill.
+        """
+        with self._lock:
+            if self._next is not None and nonce == self._next - 1:
+                self._next -= 1
+                return True
+            return self._next is None
+
+    def resync(self):
+        """Forget local state and reseed from the node on the next allocation"""
+        with self._lock:
+            self._next = None
+
+class FeeOracle:
+    """
+    EIP-1559 fee caps from a cached eth_feeHistory sample
+
+    One feeHistory call covers every transaction sent within ttl seconds.
+    The priority fee is the median of the sampled blocks' reward
+    percentile and maxFeePerGas leaves room for base_fee_multiplier times
+    the next block's base fee, so a transaction stays includable for a
+    few full blocks while only ever paying base fee plus tip. Chains
+    without a base fee get a legacy gasPrice instead.
+    """
+
+    def __init__(self, w3, ttl=12.0, history_blocks=10, reward_percentile=50, base_fee_multiplier=2):
+        self.logger = logging.getLogger(__name__)
+        self.w3 = w3
+        self.ttl = ttl
+        self.history_blocks = history_blocks
+        self.reward_percentile = reward_percentile
+        self.base_fee_multiplier = base_fee_multiplier
+        self._fees = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def fees(self):
+        """Fee fields for a transaction: maxFeePerGas/maxPriorityFeePerGas or gasPrice"""
+        with self._lock:
+            if self._fees is None or time.time() - self._fetched_at >= self.ttl:
+                self._fees = self._fetch()
+                self._fetched_at = time.time()
+            return dict(self._fees)
+
+    def invalidate(self):
+        with self._lock:
+            self._fees = None
+
+    def _fetch(self):
+        try:
+            history = self.w3.eth.fee_history(self.history_blocks, 'latest', [self.reward_percentile])
+        except Exception as e:
+            self.logger.warning(f"eth_feeHistory unavailable, falling back: {str(e)}")
+            history = {}
+
+        base_fee = self.next_base_fee(history)
+        if base_fee is None:
+            base_fee = self.w3.eth.get_block('latest').get('baseFeePerGas')
+        if base_fee is None:
+            return {'gasPrice': self.w3.eth.gas_price}
+        priority_fee = self.median_reward(history)
+        if priority_fee is None:
+            priority_fee = self.w3.eth.max_priority_fee
+        return self.caps(base_fee, priority_fee, self.base_fee_multiplier)
+
+    @staticmethod
+    def next_base_fee(history):
+        # The last entry is the base fee of the next block
+        base_fees = history.get('baseFeePerGas') or []
+        return base_fees[-1] if base_fees else None
+
+    @staticmethod
+    def median_reward(history):
+        rewards = sorted(block[0] for block in history.get('reward') or [] if block)
+        return rewards[len(rewards) // 2] if rewards else None
+
+    @staticmethod
+    def caps(base_fee, priority_fee, base_fee_multiplier=2):
+        return {
+            'maxFeePerGas': int(base_fee * base_fee_multiplier) + priority_fee,
+            'maxPriorityFeePerGas': priority_fee
+        }
+
+    @staticmethod
+    def bump(fees, current, factor=1.25):
+        """Fees for a replacement transaction: at least factor times the original, never below current"""
+        return {
+            key: max(value, int(fees.get(key, fees.get('gasPrice', 0)) * factor))
+            for key, value in current.items()
+        }
+
+class ReceiptTracker:
+    """
+    Resolve futures for sent transactions from a single polling thread
+
+    Instead of every caller blocking in wait_for_transaction_receipt, all
+    pending hashes are checked together once per new block. A transaction
+    the node no longer knows about after drop_timeout seconds is
+    rebroadcast; once max_rebroadcasts is exhausted it is reported to
+    on_dropped so the nonce gap can be filled.
+    """
+
+    def __init__(self, w3, poll_interval=0.1, drop_timeout=120.0, max_rebroadcasts=3, on_dropped=None):
+        self.logger = logging.getLogger(__name__)
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.drop_timeout = drop_timeout
+        self.max_rebroadcasts = max_rebroadcasts
+        self.on_dropped = on_dropped
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_block = None
+
+    def track(self, tx_hash, raw_transaction=None, sender=None, nonce=None, fees=None):
+        """Start tracking a sent transaction and return a Future for its receipt"""
+        future = Future()
+        with self._lock:
+            self._pending[bytes(tx_hash)] = {
+                "future": future,
+                "raw": raw_transaction,
+                "sender": sender,
+                "nonce": nonce,
+                "fees": fees or {},
+                "sent_at": time.time(),
+                "tracked_at": time.time(),
+                "rebroadcasts": 0
+            }
+            # Check the new hash on the next poll even without a new block,
+            # it may have been mined already
+            self._last_block = None
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="receipt-tracker", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return future
+
+    @property
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+            try:
+                self.poll()
+            except Exception as e:
+                self.logger.error(f"Error polling transaction receipts: {str(e)}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def poll(self):
+        """Check every pending transaction once"""
+        block = self.w3.eth.block_number
+        now = time.time()
+        with self._lock:
+            pending = list(self._pending.items())
+            overdue = any(now - entry["sent_at"] >= self.drop_timeout for _, entry in pending)
+            # Receipts can only appear with a new block
+            if block == self._last_block and not overdue:
+                return
+            # Recorded together with the snapshot, so a hash tracked while
+            # this poll runs still resets it for the next one
+            self._last_block = block
+
+        for tx_hash, entry in pending:
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                receipt = None
+            if receipt is not None:
+                self._resolve(tx_hash, receipt=receipt)
+            elif now - entry["sent_at"] >= self.drop_timeout:
+                self._handle_overdue(tx_hash, entry)
+
+    def _resolve(self, tx_hash, receipt=None, error=None):
+        with self._lock:
+            entry = self._pending.pop(tx_hash, None)
+        if entry is None or entry["future"].done():
+            return
+        if error is not None:
+            metrics.failure("confirm")
+            entry["future"].set_exception(error)
+        else:
+            metrics.observe("confirm", time.time() - entry["tracked_at"])
+            entry["future"].set_result(receipt)
+
+    def _handle_overdue(self, tx_hash, entry):
+        try:
+            self.w3.eth.get_transaction(tx_hash)
+            # Still in the mempool, just slow to be mined
+            entry["sent_at"] = time.time()
+            return
+        except TransactionNotFound:
+            pass
+
+        if entry["raw"] is not None and entry["rebroadcasts"] < self.max_rebroadcasts:
+            entry["rebroadcasts"] += 1
+            entry["sent_at"] = time.time()
+            self.logger.warning(
+                f"Transaction {tx_hash.hex()} dropped, rebroadcasting "
+                f"({entry['rebroadcasts']}/{self.max_rebroadcasts})"
+            )
+            metrics.retry("send")
+            try:
+                self.w3.eth.send_raw_transaction(entry["raw"])
+                return
+            except Exception as e:
+                self.logger.error(f"Error rebroadcasting transaction: {str(e)}")
+
+        self._resolve(
+            tx_hash,
+            error=TimeExhausted(f"Transaction {tx_hash.hex()} was dropped from the mempool")
+        )
+        if self.on_dropped is not None and entry["nonce"] is not None:
+            self.on_dropped(entry)
 
 class BlockchainInterface:
-    def __init__(self, provider_url, contract_address, contract_abi):
-        self.w3 = Web3(Web3.HTTPProvider(provider_url))
+    # Headroom added on top of estimate_gas results
+    GAS_MARGIN = 1.2
+    FEE_FIELDS = ('gasPrice', 'maxFeePerGas', 'maxPriorityFeePerGas')
+
+    def __init__(self, provider_url, contract_address, contract_abi, poll_interval=0.1, drop_timeout=120.0,
+                 fee_ttl=12.0, provider=None):
+        self.logger = logging.getLogger(__name__)
+        self.w3 = Web3(provider or Web3.HTTPProvider(provider_url))
         self.contract = self.w3.eth.contract(
             address=contract_address,
             abi=contract_abi
         )
-    
-    def mint_nft(self, wallet_address, token_uri, private_key):
+        self._chain_id = None
+        self._nonce_managers = {}
+        self._signers = {}
+        self._gas_estimates = {}
+        self._lock = threading.Lock()
+        self.fee_oracle = FeeOracle(self.w3, ttl=fee_ttl)
+        self.receipt_tracker = ReceiptTracker(
+            self.w3,
+            poll_interval=poll_interval,
+            drop_timeout=drop_timeout,
+            on_dropped=self._fill_nonce_gap
+        )
+
+    @property
+    def chain_id(self):
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chain_id
+        return self._chain_id
+
+    def nonce_manager(self, address):
+        """Return the shared NonceManager for an account"""
+        with self._lock:
+            if address not in self._nonce_managers:
+                self._nonce_managers[address] = NonceManager(self.w3, address)
+            return self._nonce_managers[address]
+
+    # Node messages for a nonce below or above the account's next one
+    # (geth/erigon, hardhat, openethereum, besu, eth-tester)
+    NONCE_ERRORS = ('nonce too low', 'nonce too high', 'nonce is too low', 'nonce is too high',
+                    'nonce_too_low', 'nonce_too_high', 'invalid transaction nonce')
+
+    @classmethod
+    def _nonce_rejected(cls, error):
+        """True when the node refused a transaction because its nonce is too low or too high"""
+        message = str(error).lower()
+        return any(marker in message for marker in cls.NONCE_ERRORS)
+
+    @staticmethod
+    def _already_known(error):
+        """True when the node already holds this exact signed transaction"""
+        message = str(error).lower()
+        return 'already known' in message or 'known transaction' in message
+
+    @staticmethod
+    def _maybe_delivered(error):
+        """
+        True when a failed send may still have reached the node
+
+        Timeouts and connections dropped after the request went out leave
+        it open whether the node took the transaction. A connection that
+        was never established, or an error the node replied with, means
+        it did not.
+        """
+        if isinstance(error, (requests.exceptions.ConnectTimeout, ConnectionRefusedError)):
+            return False
+        if isinstance(error, requests.exceptions.ConnectionError):
+            reason = getattr(error.args[0], 'reason', None) if error.args else None
+            # NewConnectionError is a ConnectTimeoutError in urllib3
+            return not isinstance(reason, urllib3.exceptions.ConnectTimeoutError)
+        return isinstance(error, (requests.exceptions.RequestException, OSError))
+
+    def _return_nonce(self, nonce_manager, sender, nonce, private_key):
+        """Take back the nonce of a transaction that never reached the node"""
+        if nonce_manager.release(nonce):
+            return
+        with self._lock:
+            self._signers[sender] = private_key
+        self._fill_nonce_gap({"sender": sender, "nonce": nonce, "fees": {}})
+
+    @staticmethod
+    def succeeded(receipt):
+        """Whether a mined transaction ran without reverting"""
+        return receipt is not None and receipt.get('status', 1) == 1
+
+    def _send_signed(self, transaction, private_key, sender, nonce_manager, on_signed=None):
+        """
+        Sign and broadcast a transaction, returning a Future for its receipt
+
+        If the node rejects the nonce, e.g. because another tool sent from
+        the same wallet, the nonce manager is resynced and the transaction
+        is sent once more with a fresh nonce. A node that already holds
+        the same signed transaction (e.g. from a send whose reply was lost)
+        counts as a successful send. on_signed is called with the
+        transaction hash right before each broadcast, and with None once
+        the transaction is known not to have reached the node.
+        """
+        for attempt in range(2):
+            try:
+                with metrics.time("sign"):
+                    signed_txn = self.w3.eth.account.sign_transaction(
+                        transaction,
+                        private_key=private_key
+                    )
+            except Exception:
+                self._return_nonce(nonce_manager, sender, transaction['nonce'], private_key)
+                metrics.failure("send")
+                raise
+            try:
+                if on_signed is not None:
+                    on_signed(signed_txn.hash)
+                with metrics.time("send"):
+                    tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+                break
+            except Exception as e:
+                if self._already_known(e):
+                    # Resending would mint twice; track the copy the node has
+                    tx_hash = signed_txn.hash
+                    break
+                maybe_delivered = self._maybe_delivered(e)
+                if on_signed is not None and not maybe_delivered:
+                    on_signed(None)
+                if self._nonce_rejected(e):
+                    # The local count is behind (or ahead of) the node
+                    nonce_manager.resync()
+                    if attempt == 0:
+                        self.logger.warning(f"Nonce {transaction['nonce']} rejected, resyncing: {str(e)}")
+                        metrics.retry("send")
+                        transaction = dict(transaction, nonce=nonce_manager.allocate())
+                        continue
+                elif maybe_delivered:
+                    # May or may not have reached the node, let the node
+                    # decide; the ledger keeps the hash to wait for
+                    nonce_manager.resync()
+                else:
+                    # Refused or never connected, so the nonce is still unused
+                    self._return_nonce(nonce_manager, sender, transaction['nonce'], private_key)
+                metrics.failure("send")
+                raise
+
+        with self._lock:
+            self._signers[sender] = private_key
+        future = self.receipt_tracker.track(
+            tx_hash,
+            raw_transaction=signed_txn.rawTransaction,
+            sender=sender,
+            nonce=transaction['nonce'],
+            fees={key: transaction[key] for key in self.FEE_FIELDS if key in transaction}
+        )
+        future.tx_hash = tx_hash
+        return future
+
+    def _encode_call(self, fn_name, args):
+        return encode_call(self.contract, fn_name, args)
+
+    def gas_limit(self, fn_name, args, sender):
+        """
+        estimate_gas once per calldata shape, plus GAS_MARGIN
+
+        Calls with the same selector and calldata length (e.g. mints of
+        equally long URIs) cost the same gas, so the estimate is reused.
+        The first caller of a shape stores a Future that concurrent
+        callers wait on, so only one estimate_gas is made per shape.
+        """
+        calldata = self._encode_call(fn_name, args)
+        key = (calldata[:10], len(calldata))
+        with self._lock:
+            estimate = self._gas_estimates.get(key)
+            owner = estimate is None
+            if owner:
+                estimate = self._gas_estimates[key] = Future()
+        if owner:
+            try:
+                call = getattr(self.contract.functions, fn_name)(*args)
+                estimate.set_result(int(call.estimate_gas({'from': sender}) * self.GAS_MARGIN))
+            except Exception as e:
+                # Let the next call estimate again
+                with self._lock:
+                    del self._gas_estimates[key]
+                estimate.set_exception(e)
+        return estimate.result()
+
+    def track_transaction(self, tx_hash):
+        """Return a receipt Future for a transaction sent earlier, e.g. before a restart"""
+        return self.receipt_tracker.track(HexBytes(tx_hash))
+
+    def resume_transaction(self, tx_hash):
+        """
+        Receipt Future for a transaction recorded before a restart, or None
+
+        A mined transaction resolves from a single receipt lookup and a
+        pending one is tracked as usual. A transaction the node has never
+        seen (e.g. presigned but never broadcast) gives None right away
+        instead of being waited for until drop_timeout.
+        """
+        tx_hash = HexBytes(tx_hash)
+        try:
+            receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            receipt = None
+        if receipt is not None:
+            future = Future()
+            future.set_result(receipt)
+            return future
+        try:
+            self.w3.eth.get_transaction(tx_hash)
+        except TransactionNotFound:
+            return None
+        return self.track_transaction(tx_hash)
+
+    def broadcast_signed(self, signed_transactions):
+        """
+        Send presigned (raw_transaction, tx_hash) pairs back to back
+
+        Returns one receipt Future per transaction. A transaction the node
+        rejects (e.g. already sent by an earlier broadcast) is still
+        tracked by its hash, so a rerun picks up where the last one
+        stopped.
+        """
+        futures = []
+        for raw_transaction, tx_hash in signed_transactions:
+            raw_transaction = HexBytes(raw_transaction)
+            try:
+                with metrics.time("send"):
+                    tx_hash = self.w3.eth.send_raw_transaction(raw_transaction)
+            except Exception as e:
+                metrics.failure("send")
+                self.logger.warning(f"Node rejected {tx_hash}: {str(e)}")
+            futures.append(self.receipt_tracker.track(HexBytes(tx_hash), raw_transaction=raw_transaction))
+        return futures
+
+    def send_mint(self, wallet_address, token_uri, private_key, job_ledger=None, token_index=None):
+        """
+        Send a mint transaction without waiting for it to be mined
+
+        Returns a Future that resolves to the transaction receipt. With a
+        job_ledger, the token is marked tx_sent with the signed hash before
+        the transaction is broadcast, so a crash in between cannot lead to
+        a second mint, and confirmed once it is mined without reverting.
+        """
+        args = [wallet_address, token_uri]
+        gas = self.gas_limit('mintNFT', args, wallet_address)
+        nonce_manager = self.nonce_manager(wallet_address)
+        nonce = nonce_manager.allocate()
         try:
-            nonce = self.w3.eth.get_transaction_count(wallet_address)
-            
             # Build transaction
-            transaction = self.contract.functions.mintNFT(
-                wallet_address,
-                token_uri
-            ).build_transaction({
-                'chainId': 1,  # Ethereum mainnet
-                'gas': 2000000,
-                'gasPrice': self.w3.eth.gas_price,
+            transaction = self.contract.functions.mintNFT(*args).build_transaction({
+                'from': wallet_address,
+                'chainId': self.chain_id,
+                'gas': gas,
                 'nonce': nonce,
+                **self.fee_oracle.fees()
             })
-            
-            # Sign and send transaction
-            signed_txn = self.w3.eth.account.sign_transaction(
-                transaction,
-                private_key=private_key
+        except Exception:
+            self._return_nonce(nonce_manager, wallet_address, nonce, private_key)
+            raise
+
+        if job_ledger is None:
+            return self._send_signed(transaction, private_key, wallet_address, nonce_manager)
+        future = self._send_signed(
+            transaction, private_key, wallet_address, nonce_manager,
+            on_signed=lambda tx_hash: self.record_sent(job_ledger, [token_index], tx_hash)
+        )
+        future.add_done_callback(lambda done: self.record_mined(job_ledger, [token_index], done))
+        return future
+
+    @staticmethod
+    def record_sent(job_ledger, token_indices, tx_hash):
+        """Ledger hook for a mint about to be broadcast (tx_hash) or not sent after all (None)"""
+        if tx_hash is None:
+            job_ledger.update_many({index: {"tx_hash": None} for index in token_indices}, "metadata_pinned")
+        else:
+            tx_hash = HexBytes(tx_hash).hex()
+            job_ledger.update_many({index: {"tx_hash": tx_hash} for index in token_indices}, "tx_sent")
+
+    @classmethod
+    def record_mined(cls, job_ledger, token_indices, done):
+        """
+        Ledger hook for a finished receipt Future
+
+        A reverted mint goes back to metadata_pinned so a rerun mints it
+        again; a mint that timed out stays tx_sent to be waited for.
+        """
+        if done.exception() is None:
+            cls.record_receipt(job_ledger, token_indices, done.result())
+
+    @classmethod
+    def record_receipt(cls, job_ledger, token_indices, receipt):
+        """Mark tokens confirmed, or back to metadata_pinned if their mint reverted"""
+        if cls.succeeded(receipt):
+            job_ledger.update_many({index: {"error": None} for index in token_indices}, "confirmed")
+        else:
+            job_ledger.update_many(
+                {index: {"tx_hash": None, "error": "mint transaction reverted"} for index in token_indices},
+                "metadata_pinned"
             )
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            
-            return self.w3.eth.wait_for_transaction_receipt(tx_hash)
+
+    def mint_nft(self, wallet_address, token_uri, private_key, timeout=120, job_ledger=None, token_index=None):
+        try:
+            return self.send_mint(
+                wallet_address,
+                token_uri,
+                private_key,
+                job_ledger=job_ledger,
+                token_index=token_index
+            ).result(timeout)
         except Exception as e:
             print(f"Error minting NFT: {str(e)}")
-            return None 
\ No newline at end of file
+            return None
+
+    def _abi_function(self, name):
+        for entry in self.contract.abi:
+            if entry.get('type') == 'function' and entry.get('name') == name:
+                return entry
+        return None
+
+    @property
+    def batch_mode(self):
+        """
+        How mint_batch packs several mints into one transaction
+
+        'mintBatch' when the contract exposes mintBatch(address[], string[])
+        or mintBatch(address, string[]), 'multicall' when it exposes
+        multicall(bytes[]), otherwise None.
+        """
+        mint_batch = self._abi_function('mintBatch')
+        if mint_batch is not None:
+            types = [arg['type'] for arg in mint_batch.get('inputs', [])]
+            if types in (['address[]', 'string[]'], ['address', 'string[]']):
+                return 'mintBatch'
+        multicall = self._abi_function('multicall')
+        if multicall is not None:
+            types = [arg['type'] for arg in multicall.get('inputs', [])]
+            if types == ['bytes[]']:
+                return 'multicall'
+        return None
+
+    def _batch_call(self, recipients, token_uris):
+        """Function name and arguments of the call minting one batch"""
+        mode = self.batch_mode
+        if mode == 'mintBatch':
+            if self._abi_function('mintBatch')['inputs'][0]['type'] == 'address':
+                if len(set(recipients)) != 1:
+                    raise ValueError("mintBatch(address, string[]) needs a single recipient per batch")
+                return 'mintBatch', [recipients[0], list(token_uris)]
+            return 'mintBatch', [list(recipients), list(token_uris)]
+        if mode == 'multicall':
+            calls = [
+                self._encode_call('mintNFT', [recipient, token_uri])
+                for recipient, token_uri in zip(recipients, token_uris)
+            ]
+            return 'multicall', [calls]
+        raise ValueError("Contract ABI has neither mintBatch nor multicall")
+
+    def send_mint_batch(self, wallet_address, recipients, token_uris, private_key, max_batch_size=50,
+                        job_ledger=None, token_indices=None):
+        """
+        Send mints for many tokens, packing up to max_batch_size per transaction
+
+        Returns one Future per transaction sent. Gas for each batch comes
+        from estimate_gas plus GAS_MARGIN, estimated once per calldata
+        shape. Contracts without a batch entry
+        point fall back to one pipelined mintNFT transaction per token.
+        With a job_ledger, every token of a batch (token_indices line up
+        with token_uris) is marked tx_sent with the batch's hash before it
+        is broadcast and confirmed once it is mined, as in send_mint.
+        """
+        if len(recipients) != len(token_uris):
+            raise ValueError("recipients and token_uris must have the same length")
+
+        if self.batch_mode is None:
+            if any(recipient != wallet_address for recipient in recipients):
+                raise ValueError("mintNFT fallback can only mint to the sending wallet")
+            return [
+                self.send_mint(
+                    wallet_address,
+                    token_uri,
+                    private_key,
+                    job_ledger=job_ledger,
+                    token_index=token_indices[position] if job_ledger is not None else None
+                )
+                for position, token_uri in enumerate(token_uris)
+            ]
+
+        nonce_manager = self.nonce_manager(wallet_address)
+        futures = []
+        for start in range(0, len(token_uris), max_batch_size):
+            fn_name, args = self._batch_call(
+                recipients[start:start + max_batch_size],
+                token_uris[start:start + max_batch_size]
+            )
+            gas = self.gas_limit(fn_name, args, wallet_address)
+            nonce = nonce_manager.allocate()
+            try:
+                transaction = getattr(self.contract.functions, fn_name)(*args).build_transaction({
+                    'from': wallet_address,
+                    'chainId': self.chain_id,
+                    'gas': gas,
+                    'nonce': nonce,
+                    **self.fee_oracle.fees()
+                })
+            except Exception:
+                self._return_nonce(nonce_manager, wallet_address, nonce, private_key)
+                raise
+            if job_ledger is None:
+                futures.append(self._send_signed(transaction, private_key, wallet_address, nonce_manager))
+                continue
+            batch = token_indices[start:start + max_batch_size]
+            future = self._send_signed(
+                transaction, private_key, wallet_address, nonce_manager,
+                on_signed=lambda tx_hash, batch=batch: self.record_sent(job_ledger, batch, tx_hash)
+            )
+            future.add_done_callback(lambda done, batch=batch: self.record_mined(job_ledger, batch, done))
+            futures.append(future)
+        return futures
+
+    def mint_batch(self, wallet_address, recipients, token_uris, private_key, max_batch_size=50, timeout=120,
+                   job_ledger=None, token_indices=None):
+        """Mint many tokens and wait for every batch transaction to be mined"""
+        try:
+            futures = self.send_mint_batch(
+                wallet_address, recipients, token_uris, private_key, max_batch_size,
+                job_ledger=job_ledger, token_indices=token_indices
+            )
+            return [future.result(timeout) for future in futures]
+        except Exception as e:
+            print(f"Error batch minting NFTs: {str(e)}")
+            return None
+
+    def _fill_nonce_gap(self, entry):
+        """
+        Replace a dropped transaction with an empty self-transfer
+
+        Later nonces from the same account cannot be mined until the gap
+        is filled, so a zero-value transfer is sent at the same nonce with
+        bumped fees to also replace any stale copy of the original.
+        """
+        sender = entry["sender"]
+        with self._lock:
+            private_key = self._signers.get(sender)
+        if private_key is None:
+            self.logger.error(f"Cannot fill nonce gap {entry['nonce']}: unknown signer {sender}")
+            return
+
+        self.fee_oracle.invalidate()
+        fees = FeeOracle.bump(entry["fees"], self.fee_oracle.fees())
+        transaction = {
+            'chainId': self.chain_id,
+            'to': sender,
+            'value': 0,
+            'gas': 21000,
+            'nonce': entry["nonce"],
+            **fees
+        }
+        try:
+            with metrics.time("sign"):
+                signed_txn = self.w3.eth.account.sign_transaction(transaction, private_key=private_key)
+            metrics.retry("send")
+            with metrics.time("send"):
+                tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            self.logger.warning(f"Filled nonce gap {entry['nonce']} with {tx_hash.hex()}")
+            self.receipt_tracker.track(
+                tx_hash,
+                raw_transaction=signed_txn.rawTransaction,
+                sender=sender,
+                fees=fees
+            )
+        except Exception as e:
+            self.logger.error(f"Error filling nonce gap {entry['nonce']}: {str(e)}")
@@ -0,0 +1,89 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import torch
+
+class PromptEmbeddingCache:
+    """
+    LRU cache of text-encoder outputs keyed by (model, prompt)
+
+    A drop reuses the same prompt and negative prompt across thousands of
+    images, so the text encoder only needs to run once per distinct
+    string. With cache_dir set, embeddings are also written to disk and
+    survive across runs and worker processes.
+    """
+
+    def __init__(self, model_id, max_entries=128, cache_dir=None):
+        self.logger = logging.getLogger(__name__)
+        self.model_id = str(model_id)
+        self.max_entries = max(1, max_entries)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _key(self, prompt):
+        return hashlib.sha256(f"{self.model_id}\0{prompt}".encode()).hexdigest()
+
+    def get(self, prompt, encode):
+        """Return the embedding for prompt, calling encode(prompt) on a miss"""
+        key = self._key(prompt)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        embedding = self._load(key)
+        if embedding is not None:
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            embedding = encode(prompt)
+            with self._lock:
+                self.misses += 1
+            self._store(key, embedding)
+
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return embedding
+
+    def _load(self, key):
+        if self.cache_dir is None:
+            return None
+        path = self.cache_dir / f"{key}.pt"
+        if not path.exists():
+            return None
+        try:
+            return torch.load(path, map_location='cpu', weights_only=True)
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable embedding cache entry {path}: {str(e)}")
+            return None
+
+    def _store(self, key, embedding):
+        if self.cache_dir is None:
+            return
+        try:
+            tmp_path = self.cache_dir / f"{key}.pt.tmp"
+            torch.save(embedding.detach().cpu(), tmp_path)
+            tmp_path.replace(self.cache_dir / f"{key}.pt")
+        except Exception as e:
+            self.logger.warning(f"Error writing embedding cache entry: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._entries)
+            }
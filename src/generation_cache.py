@@ -0,0 +1,122 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from PIL import Image
+
+class GenerationCache:
+    """
+    Content-addressed on-disk cache of generated images
+
+    With a fixed seed generation is deterministic, so an image is fully
+    identified by (model, prompt, style parameters, seed). Images are
+    stored as losslessly compressed PNGs under a hash of those inputs.
+    File modification times track recency; once the cache grows past
+    max_bytes the least recently used images are deleted. The running
+    byte count is corrected from the directory before evicting, and every
+    RESCAN_PUTS writes, so entries written by other processes count too.
+    """
+
+    RESCAN_PUTS = 32
+
+    def __init__(self, cache_dir, model_id, max_bytes=2 * 1024**3):
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.model_id = str(model_id)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._total_bytes = sum(size for _, size, _ in self._scan())
+
+    def key(self, prompt, style_params, seed):
+        """Canonical hash of everything that determines the image"""
+        params = {k: v for k, v in (style_params or {}).items() if k != 'seed'}
+        canonical = json.dumps(
+            {"model": self.model_id, "prompt": prompt, "params": params, "seed": seed},
+            sort_keys=True,
+            separators=(',', ':')
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.png"
+
+    def _scan(self):
+        """(mtime, size, path) of every entry on disk"""
+        entries = []
+        for path in self.cache_dir.glob("*/*.png"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # Evicted by another process meanwhile
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with Image.open(path) as image:
+                image.load()
+            # Touch so eviction sees this entry as recently used
+            os.utime(path)
+            with self._lock:
+                self.hits += 1
+            return image
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable cache entry {path}: {str(e)}")
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, image):
+        path = self._path(key)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            # Unique per writer, so processes caching the same key don't collide
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            # Fast, still lossless compression: the cache is local scratch space
+            image.save(tmp_path, format="PNG", compress_level=1)
+            size = tmp_path.stat().st_size
+            try:
+                replaced = path.stat().st_size
+            except FileNotFoundError:
+                replaced = 0
+            tmp_path.replace(path)
+            with self._lock:
+                self._total_bytes += size - replaced
+                self._puts += 1
+                rescan = self._puts % self.RESCAN_PUTS == 0
+            self._evict(rescan)
+        except Exception as e:
+            self.logger.warning(f"Error writing generation cache entry: {str(e)}")
+
+    def _evict(self, rescan=False):
+        with self._lock:
+            if self._total_bytes <= self.max_bytes and not rescan:
+                return
+            entries = sorted(self._scan())
+            self._total_bytes = sum(size for _, size, _ in entries)
+            if self._total_bytes <= self.max_bytes:
+                return
+            # Evict below the budget so the next puts don't rescan right away
+            target = self.max_bytes * 0.9
+            for _, size, path in entries:
+                if self._total_bytes <= target:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                self._total_bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes": self._total_bytes}
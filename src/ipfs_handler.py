@@ -1,46 +1,324 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import io
 import json
+import uuid
 from pathlib import Path
+from metrics import metrics
+from utils.cid import compute_cid_v1
+from utils.helpers import NFTUtils
+from utils.pin_index import PinIndex
+
+class _MultipartStream(io.RawIOBase):
+    """
+    multipart/form-data body that reads files one at a time as it is sent
+
+    Only the file being sent is open, so a directory of any size fits in
+    the fd limit and in memory. The length is known up front (requests
+    sends a Content-Length), and seek(0) rewinds the body so urllib3 can
+    retry the request.
+    """
+
+    def __init__(self, files, fields):
+        self.boundary = uuid.uuid4().hex
+        self._parts = []
+        for name, value in fields.items():
+            self._parts.append(
+                f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                f'{value}\r\n'.encode()
+            )
+        for filename, path in files:
+            filename = filename.replace('"', '%22')
+            self._parts.append(
+                f'--{self.boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                'Content-Type: application/octet-stream\r\n\r\n'.encode()
+            )
+            self._parts.append(Path(path))
+            self._parts.append(b'\r\n')
+        self._parts.append(f'--{self.boundary}--\r\n'.encode())
+        self.length = sum(part.stat().st_size if isinstance(part, Path) else len(part) for part in self._parts)
+        self.seek(0)
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self.length
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if offset != 0 or whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("the body can only be rewound to the start")
+        self._close_file()
+        self._index = 0
+        self._offset = 0
+        self._position = 0
+        return 0
+
+    def _close_file(self):
+        if getattr(self, '_file', None) is not None:
+            self._file.close()
+        self._file = None
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.length - self._position
+        chunks = []
+        while size > 0 and self._index < len(self._parts):
+            part = self._parts[self._index]
+            if isinstance(part, Path):
+                if self._file is None:
+                    self._file = part.open("rb")
+                chunk = self._file.read(size)
+                if not chunk:
+                    self._close_file()
+                    self._index += 1
+                    continue
+            else:
+                chunk = part[self._offset:self._offset + size]
+                self._offset += len(chunk)
+                if self._offset >= len(part):
+                    self._index += 1
+                    self._offset = 0
+            chunks.append(chunk)
+            size -= len(chunk)
+            self._position += len(chunk)
+        return b"".join(chunks)
+
+    def close(self):
+        self._close_file()
+        super().close()
 
 class IPFSHandler:
-    def __init__(self, pinata_api_key, pinata_secret_key):
+    # Pinata answers bulk load with 429 and transient 5xx errors
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    # Slowest upload rate a directory pin is given time for, on top of
+    # the usual timeout
+    MIN_UPLOAD_BYTES_PER_SECOND = 1024 * 1024
+    # Metadata fields that change on every build (NFTMetadata stamps
+    # created_at) and so are left out of the metadata dedup key
+    VOLATILE_METADATA_FIELDS = ('created_at',)
+
+    def __init__(self, pinata_api_key, pinata_secret_key, api_url="https://api.pinata.cloud",
+                 max_concurrency=8, max_retries=5, backoff_factor=0.5, timeout=120,
+                 pin_index_path=None):
         self.pinata_api_key = pinata_api_key
         self.pinata_secret_key = pinata_secret_key
         self.headers = {
             'pinata_api_key': pinata_api_key,
             'pinata_secret_api_key': pinata_secret_key
         }
-        self.pin_endpoint = "https://api.pinata.cloud/pinning/pinFileToIPFS"
-        self.json_endpoint = "https://api.pinata.cloud/pinning/pinJSONToIPFS"
+        self.pin_endpoint = f"{api_url}/pinning/pinFileToIPFS"
+        self.json_endpoint = f"{api_url}/pinning/pinJSONToIPFS"
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+
+        # One keep-alive session shared by all uploads, with a connection
+        # pool large enough for upload_many and exponential backoff retries
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset(['POST']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.max_concurrency,
+            max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # Content already pinned in an earlier run is not uploaded again
+        self.pin_index = PinIndex(pin_index_path) if pin_index_path else None
+        self.dedup_hits = 0
+
+    def _lookup(self, content_id):
+        if self.pin_index is None or content_id is None:
+            return None
+        pinned = self.pin_index.get(content_id)
+        if pinned:
+            self.dedup_hits += 1
+        return pinned
+
+    def _record(self, content_id, pinned_cid, size=None):
+        if self.pin_index is not None and content_id is not None:
+            self.pin_index.add(content_id, pinned_cid, size)
+
+    def predict_uri(self, file_path):
+        """
+        Return the ipfs:// URI a file will have, before (or without) uploading it
+
+        The CID is computed locally with Pinata's CIDv1 import settings.
+        The mint pipeline does not use it: metadata is only built once the
+        image is actually pinned, so it never points at a failed upload.
+        """
+        content_id = NFTUtils.get_file_cid(Path(file_path))
+        if content_id is None:
+            return None
+        pinned = self.pin_index.get(content_id) if self.pin_index is not None else None
+        return f"ipfs://{pinned or content_id}"
+
+    def _post(self, url, **kwargs):
+        """POST to Pinata, recording latency, urllib3 retries and failures as the pin stage"""
+        try:
+            with metrics.time("pin"):
+                response = self.session.post(url, **kwargs)
+        except Exception:
+            metrics.failure("pin")
+            raise
+        retries = getattr(response.raw, 'retries', None)
+        if retries is not None:
+            metrics.retry("pin", len(retries.history))
+        if response.status_code != 200:
+            metrics.failure("pin")
+        return response
+
+    def _pin_file(self, content_id, file, size):
+        """POST one file (an open file or a (name, bytes) tuple) and record its CID"""
+        response = self._post(
+            self.pin_endpoint,
+            files={'file': file},
+            # Ask for CIDv1 so the CID matches the locally computed one
+            data={'pinataOptions': json.dumps({'cidVersion': 1})},
+            timeout=self.timeout
+        )
+        if response.status_code == 200:
+            pinned = response.json()['IpfsHash']
+            self._record(content_id, pinned, size)
+            return f"ipfs://{pinned}"
+        return None
 
     def upload_file(self, file_path):
         try:
+            content_id = NFTUtils.get_file_cid(Path(file_path))
+            pinned = self._lookup(content_id)
+            if pinned:
+                return f"ipfs://{pinned}"
+
             with Path(file_path).open("rb") as fp:
-                files = {
-                    'file': fp
-                }
-                response = requests.post(
-                    self.pin_endpoint,
-                    files=files,
-                    headers=self.headers
-                )
-                if response.status_code == 200:
-                    return f"ipfs://{response.json()['IpfsHash']}"
-                return None
+                return self._pin_file(content_id, fp, Path(file_path).stat().st_size)
+        except Exception as e:
+            print(f"Error uploading to IPFS: {str(e)}")
+            return None
+
+    def upload_bytes(self, data, filename="file"):
+        """
+        Pin in-memory content without writing it to disk first
+
+        The CID is computed from the same buffer that is sent, so the
+        returned URI can go straight into metadata.
+        """
+        try:
+            content_id = compute_cid_v1(io.BytesIO(data))
+            pinned = self._lookup(content_id)
+            if pinned:
+                return f"ipfs://{pinned}"
+            return self._pin_file(content_id, (filename, data), len(data))
         except Exception as e:
             print(f"Error uploading to IPFS: {str(e)}")
             return None
 
+    def upload_image(self, image, encoder, filename="image"):
+        """Encode a PIL image with an ImageEncoder in memory and pin it"""
+        try:
+            data = encoder.encode(image)
+        except Exception as e:
+            print(f"Error encoding image for IPFS: {str(e)}")
+            return None
+        return self.upload_bytes(data, f"{filename}.{encoder.extension}")
+
     def upload_metadata(self, metadata):
         try:
-            response = requests.post(
+            canonical = json.dumps(metadata, sort_keys=True, separators=(',', ':'))
+            stable = {key: value for key, value in metadata.items() if key not in self.VOLATILE_METADATA_FIELDS}
+            content_id = "json:" + hashlib.sha256(
+                json.dumps(stable, sort_keys=True, separators=(',', ':')).encode()
+            ).hexdigest()
+            pinned = self._lookup(content_id)
+            if pinned:
+                return f"ipfs://{pinned}"
+
+            response = self._post(
                 self.json_endpoint,
                 json=metadata,
-                headers=self.headers
+                timeout=self.timeout
             )
             if response.status_code == 200:
-                return f"ipfs://{response.json()['IpfsHash']}"
+                pinned = response.json()['IpfsHash']
+                self._record(content_id, pinned, len(canonical))
+                return f"ipfs://{pinned}"
             return None
         except Exception as e:
             print(f"Error uploading metadata to IPFS: {str(e)}")
-            return None 
\ No newline at end of file
+            return None
+
+    def upload_directory(self, dir_path):
+        """
+        Pin every file under dir_path as one IPFS directory in a single request
+
+        Returns ipfs://<dirCID>; files are then addressable as
+        ipfs://<dirCID>/<relative path>.
+        """
+        try:
+            dir_path = Path(dir_path)
+            paths = sorted(path for path in dir_path.rglob('*') if path.is_file())
+            if not paths:
+                print(f"No files to upload in {dir_path}")
+                return None
+            # Pinata builds the directory from the common path prefix
+            body = _MultipartStream(
+                [(f"{dir_path.name}/{path.relative_to(dir_path).as_posix()}", path) for path in paths],
+                {
+                    'pinataOptions': json.dumps({'cidVersion': 1}),
+                    'pinataMetadata': json.dumps({'name': dir_path.name})
+                }
+            )
+            try:
+                response = self._post(
+                    self.pin_endpoint,
+                    data=body,
+                    headers={'Content-Type': body.content_type},
+                    # Large directories take longer to send and to be pinned
+                    timeout=self.timeout + len(body) / self.MIN_UPLOAD_BYTES_PER_SECOND
+                )
+            finally:
+                body.close()
+            if response.status_code == 200:
+                return f"ipfs://{response.json()['IpfsHash']}"
+            return None
+        except Exception as e:
+            print(f"Error uploading directory to IPFS: {str(e)}")
+            return None
+
+    def upload_many(self, file_paths, max_concurrency=None):
+        """
+        Upload several files concurrently over the pooled session
+
+        Returns the IPFS URIs in the same order as file_paths, with None
+        for any file that failed to upload.
+        """
+        workers = max_concurrency or self.max_concurrency
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.upload_file, file_paths))
+
+    def close(self):
+        self.session.close()
+        if self.pin_index is not None:
+            self.pin_index.close()
@@ -0,0 +1,141 @@
+import sqlite3
+import threading
+import logging
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+class JobLedger:
+    """
+    Durable per-token progress for a collection run
+
+    Every token of a run has one row recording the furthest stage it has
+    reached, plus the seed, paths, CIDs and transaction hash collected on
+    the way. Writes are committed immediately (SQLite in WAL mode), so
+    after a crash a rerun can skip finished work and, for tokens whose
+    mint transaction was already sent, wait for that transaction instead
+    of minting again.
+    """
+
+    STAGES = (
+        "pending",
+        "generated",
+        "image_pinned",
+        "metadata_pinned",
+        "tx_sent",
+        "confirmed"
+    )
+    FIELDS = ("seed", "image_path", "image_uri", "metadata_uri", "tx_hash", "error")
+
+    def __init__(self, db_path: str = "output/job_ledger.sqlite3", run_id: str = "default"):
+        self.logger = logging.getLogger(__name__)
+        self.run_id = run_id
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tokens ("
+                "run_id TEXT NOT NULL, "
+                "token_index INTEGER NOT NULL, "
+                "stage TEXT NOT NULL, "
+                "seed INTEGER, "
+                "image_path TEXT, "
+                "image_uri TEXT, "
+                "metadata_uri TEXT, "
+                "tx_hash TEXT, "
+                "error TEXT, "
+                "updated_at TEXT, "
+                "PRIMARY KEY (run_id, token_index))"
+            )
+
+    @staticmethod
+    def make_run_id(prompt: str, style_params: Dict[str, Any], seeds: Optional[List[int]] = None,
+                    traits: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Identify a run by what it generates, so a rerun with the same inputs resumes it"""
+        run = {"prompt": prompt, "style_params": style_params}
+        if seeds is not None:
+            run["seeds"] = list(seeds)
+        if traits:
+            run["traits"] = traits
+        canonical = json.dumps(run, sort_keys=True)
+        return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+    def get(self, token_index: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM tokens WHERE run_id = ? AND token_index = ?",
+                (self.run_id, token_index)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def reached(self, token_index: int, stage: str) -> bool:
+        """Whether a token has completed at least the given stage"""
+        row = self.get(token_index)
+        return row is not None and self.STAGES.index(row["stage"]) >= self.STAGES.index(stage)
+
+    def update(self, token_index: int, stage: str, **fields) -> None:
+        """Record that a token reached a stage, along with any new fields"""
+        self.update_many({token_index: fields}, stage)
+
+    def update_many(self, updates: Dict[int, Dict[str, Any]], stage: str) -> None:
+        """Record that several tokens reached a stage in one transaction, with per-token fields"""
+        if stage not in self.STAGES:
+            raise ValueError(f"Unknown ledger stage: {stage}")
+        for fields in updates.values():
+            unknown = set(fields) - set(self.FIELDS)
+            if unknown:
+                raise ValueError(f"Unknown ledger fields: {sorted(unknown)}")
+
+        updated_at = datetime.now().isoformat()
+        with self._lock, self._conn:
+            for token_index, fields in updates.items():
+                columns = ["stage", "updated_at"] + list(fields)
+                values = [stage, updated_at] + list(fields.values())
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO tokens (run_id, token_index, stage) VALUES (?, ?, 'pending')",
+                    (self.run_id, token_index)
+                )
+                self._conn.execute(
+                    f"UPDATE tokens SET {', '.join(f'{column} = ?' for column in columns)} "
+                    "WHERE run_id = ? AND token_index = ?",
+                    values + [self.run_id, token_index]
+                )
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Every token recorded for this run, by index"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM tokens WHERE run_id = ? ORDER BY token_index",
+                (self.run_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def unfinished(self, total: int) -> List[int]:
+        """Token indices 1..total that are not confirmed yet"""
+        with self._lock:
+            confirmed = {
+                row[0] for row in self._conn.execute(
+                    "SELECT token_index FROM tokens WHERE run_id = ? AND stage = 'confirmed'",
+                    (self.run_id,)
+                )
+            }
+        return [index for index in range(1, total + 1) if index not in confirmed]
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, COUNT(*) FROM tokens WHERE run_id = ? GROUP BY stage",
+                (self.run_id,)
+            ).fetchall()
+        return {stage: count for stage, count in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
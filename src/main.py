@@ -1,15 +1,24 @@
-from art_generator import AIArtGenerator
+# torch, web3, requests, numpy and PIL take seconds to import, so modules
+# that need them are imported inside the commands that use them
 from nft_metadata import NFTMetadata
-from blockchain_interface import BlockchainInterface
-from ipfs_handler import IPFSHandler
+from pipeline import SKIP, MintPipeline, Stage
+from job_ledger import JobLedger
+from metrics import metrics
 import os
 import json
 from pathlib import Path
 from utils.config_validator import ConfigValidator
 from utils.config_manager import ConfigManager
 from utils.helpers import NFTUtils, PromptHelper
+from utils.cli_parser import parse_arguments
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from art_generator import AIArtGenerator
+    from blockchain_interface import BlockchainInterface
+    from ipfs_handler import IPFSHandler
+    from near_duplicates import NearDuplicateIndex
 
 def setup_directories():
     """Create necessary directories if they don't exist"""
@@ -63,7 +72,7 @@ def load_configurations(config_validator: ConfigValidator) -> Optional[Dict[str,
     return configs
 
 def generate_nft_collection(
-    art_generator: AIArtGenerator,
+    art_generator: "AIArtGenerator",
     prompt: str,
     num_variations: int,
     style_params: Dict[str, Any]
@@ -71,10 +80,958 @@ def generate_nft_collection(
     """Generate a collection of NFT images"""
     return art_generator.generate_variations(prompt, num_variations, style_params)
 
+# Worker pool size for each pipeline stage. Mint workers share one local
+# nonce allocator, so several mints can wait on receipts at the same time
+PIPELINE_WORKERS = {
+    # One worker, so two near-identical images can't both pass unseen
+    "dedup": 1,
+    "encode": 2,
+    "upload_image": 4,
+    "upload_metadata": 4,
+    "mint": 4
+}
+PIPELINE_QUEUE_SIZE = 8
+
+def iter_generated_images(
+    art_generator: "AIArtGenerator",
+    prompt: str,
+    num_variations: int,
+    style_params: Dict[str, Any],
+    job_ledger: Optional[JobLedger] = None,
+    seeds: Optional[list] = None,
+    previews: Optional[Dict[int, Any]] = None,
+    prompts: Optional[list] = None,
+    attributes: Optional[list] = None
+):
+    """
+    Yield pipeline items as soon as each image is generated
+    
+    Images stream out of art_generator.iter_batch batch by batch, so only
+    the batch in flight and the pipeline queues hold images in memory.
+    With a job ledger, confirmed tokens are skipped and tokens whose image
+    is already pinned or on disk are passed on with what the ledger knows
+    about them instead of being generated again. Explicit seeds (curated from
+    previews) replace the usual variation seeds; with their preview images
+    they are finished as in render_selected. Per-token prompts and
+    attributes (from draw_traits) are indexed like the tokens.
+    """
+    if seeds is None:
+        from art_generator import AIArtGenerator
+        seeds = AIArtGenerator.variation_seeds(num_variations, style_params)
+    pending = []
+    for index, seed in enumerate(seeds, 1):
+        row = job_ledger.get(index) if job_ledger is not None else None
+        if row is not None:
+            if row["stage"] == "confirmed":
+                continue
+            if row["seed"] is not None:
+                seed = row["seed"]
+            on_disk = row["image_path"] and Path(row["image_path"]).exists()
+            if row["stage"] != "pending" and (row["image_uri"] or on_disk):
+                item = {
+                    "index": index,
+                    "seed": seed,
+                    "image_path": row["image_path"],
+                    "image_uri": row["image_uri"],
+                    "metadata_uri": row["metadata_uri"],
+                    "tx_hash": row["tx_hash"]
+                }
+                if attributes is not None:
+                    item["attributes"] = attributes[index - 1]
+                yield item
+                continue
+        pending.append((index, seed))
+    
+    if not pending:
+        return
+    results = art_generator.iter_batch(
+        [prompts[index - 1] for index, _ in pending] if prompts is not None else prompt,
+        [seed for _, seed in pending],
+        style_params,
+        previews=previews
+    )
+    for position, seed, image in results:
+        index = pending[position][0]
+        item = {"index": index, "seed": seed, "image": image}
+        if attributes is not None:
+            item["attributes"] = attributes[index - 1]
+        yield item
+
+def draw_traits(
+    trait_tables: list,
+    prompt: str,
+    num_tokens: int,
+    style_params: Dict[str, Any]
+) -> tuple:
+    """
+    Per-token prompts and metadata attributes for a collection
+    
+    Trait combinations are drawn for every token at once (seeded by the
+    run's seed, so reruns draw the same), and each token's trait prompt
+    fragments are added to the base prompt.
+    """
+    from trait_engine import TraitEngine
+    engine = TraitEngine(trait_tables, seed=style_params.get('seed'))
+    indices = engine.draw(num_tokens)
+    prompts = [
+        PromptHelper.enhance_prompt(prompt, details=fragment)
+        for fragment in engine.prompt_fragments(indices)
+    ]
+    return prompts, engine.attributes(indices, engine.rarity(indices))
+
+PREVIEW_DIR = "output/previews"
+
+def run_previews(
+    art_generator: "AIArtGenerator",
+    prompt: str,
+    num_candidates: int,
+    style_params: Dict[str, Any],
+    logger: logging.Logger
+) -> list:
+    """Generate cheap candidates into PREVIEW_DIR and return their seeds"""
+    preview_dir = Path(PREVIEW_DIR)
+    preview_dir.mkdir(parents=True, exist_ok=True)
+    extension = art_generator.encoder.extension
+    seeds = []
+    for seed, image in art_generator.generate_previews(prompt, num_candidates, style_params):
+        if art_generator.save_image(image, str(preview_dir / f"preview_{seed}.{extension}")):
+            seeds.append(seed)
+    logger.info(f"Saved {len(seeds)} previews to {preview_dir}; render picks with --seeds")
+    return seeds
+
+def load_previews(seeds: list, extension: str = "png") -> Dict[int, Any]:
+    """Load saved previews for curated seeds, skipping any that are missing"""
+    from PIL import Image
+    previews = {}
+    for seed in seeds:
+        path = Path(PREVIEW_DIR) / f"preview_{seed}.{extension}"
+        if path.exists():
+            with Image.open(path) as image:
+                previews[seed] = image.copy()
+    return previews
+
+def build_metadata(
+    nft_metadata: NFTMetadata,
+    index: int,
+    image_uri: str,
+    style_params: Dict[str, Any],
+    seed: Optional[int],
+    attributes: Optional[list] = None
+) -> Dict[str, Any]:
+    """Create the metadata document for one piece of the collection"""
+    if attributes is None:
+        attributes = [
+            {"trait_type": "Style", "value": "Futuristic"},
+            {"trait_type": "Theme", "value": "Cityscape"},
+            {"trait_type": "AI Model", "value": "Stable Diffusion"},
+            {"trait_type": "Variation", "value": str(index)}
+        ]
+    else:
+        attributes = attributes + [{"trait_type": "AI Model", "value": "Stable Diffusion"}]
+    generator_params = dict(style_params)
+    generator_params['seed'] = seed
+    
+    return nft_metadata.create_metadata(
+        name=f"AI Generated Futuristic City #{index}",
+        description="A stunning AI-generated artwork featuring a futuristic cityscape",
+        image_path=image_uri,
+        attributes=attributes,
+        generator_params=generator_params
+    )
+
+def build_mint_stages(
+    art_generator: "AIArtGenerator",
+    nft_metadata: NFTMetadata,
+    ipfs_handler: "IPFSHandler",
+    blockchain: Optional["BlockchainInterface"],
+    blockchain_config: Dict[str, Any],
+    style_params: Dict[str, Any],
+    logger: logging.Logger,
+    job_ledger: Optional[JobLedger] = None,
+    save_local_copy: bool = True,
+    duplicate_index: Optional["NearDuplicateIndex"] = None,
+    reject_duplicates: bool = False
+) -> list:
+    """
+    Build the dedup -> encode -> upload image -> upload metadata -> mint stages
+    
+    With a duplicate_index, images that look like an earlier piece are
+    logged and, with reject_duplicates, dropped before they are pinned.
+    Images are encoded in memory and pinned from that buffer; the local
+    copy under output/, named after the ledger's run id, is written in
+    the background, or not at all without save_local_copy. Stages skip work an item already carries
+    from the job ledger and record each completed step in it.
+    """
+    def record(item, stage, **fields):
+        if job_ledger is not None:
+            job_ledger.update(item["index"], stage, **fields)
+
+    encoder = art_generator.encoder
+    run_label = job_ledger.run_id if job_ledger is not None else "run"
+
+    def dedup(item):
+        if "image" not in item:
+            return item
+        match = duplicate_index.check([item["image"]], [f"{run_label}/{item['index']}"])[0]
+        if match is None:
+            return item
+        label, distance = match
+        logger.warning(f"Image {item['index']} is a near duplicate of {label} (distance {distance})")
+        if not reject_duplicates:
+            return item
+        record(item, "pending", seed=item["seed"], error=f"near duplicate of {label}")
+        return SKIP
+
+    def encode(item):
+        if "image" not in item:
+            return item
+        try:
+            item["image_bytes"] = encoder.encode(item.pop("image"))
+        except Exception as e:
+            logger.error(f"Failed to encode image {item['index']}: {str(e)}")
+            return None
+        if save_local_copy:
+            # Named per run, so another prompt's token i never overwrites it
+            item["image_path"] = f"output/generated_art_{run_label}_{item['index']}.{encoder.extension}"
+            item["local_copy"] = encoder.write_async(item["image_bytes"], item["image_path"])
+        return item
+
+    def upload_image(item):
+        if item.get("image_uri"):
+            return item
+        if "image_bytes" in item:
+            item["image_uri"] = ipfs_handler.upload_bytes(
+                item.pop("image_bytes"),
+                f"generated_art_{item['index']}.{encoder.extension}"
+            )
+        else:
+            item["image_uri"] = ipfs_handler.upload_file(item["image_path"])
+        fields = {"seed": item["seed"]}
+        # The local copy has had the whole upload to finish writing
+        local_copy = item.pop("local_copy", None)
+        if local_copy is not None and local_copy.result():
+            fields["image_path"] = item["image_path"]
+        if not item["image_uri"]:
+            logger.error(f"Failed to upload image {item['index']} to IPFS")
+            # A rerun can still pin the local copy instead of regenerating
+            if "image_path" in fields:
+                record(item, "generated", **fields)
+            return None
+        record(item, "image_pinned", image_uri=item["image_uri"], **fields)
+        return item
+
+    def upload_metadata(item):
+        if item.get("metadata_uri"):
+            return item
+        i = item["index"]
+        metadata = build_metadata(
+            nft_metadata,
+            i,
+            item["image_uri"],
+            style_params,
+            item["seed"],
+            item.get("attributes")
+        )
+        item["metadata_uri"] = ipfs_handler.upload_metadata(metadata)
+        if not item["metadata_uri"]:
+            logger.error(f"Failed to upload metadata {i} to IPFS")
+            return None
+        record(item, "metadata_pinned", metadata_uri=item["metadata_uri"])
+        return item
+
+    def mint(item):
+        i = item["index"]
+        receipt = None
+        if item.get("tx_hash"):
+            # Sent before a restart: wait for that transaction, don't mint twice
+            try:
+                earlier = blockchain.resume_transaction(item["tx_hash"])
+                if earlier is None:
+                    logger.warning(f"Earlier mint of NFT #{i} never reached the node, minting again")
+                else:
+                    receipt = earlier.result()
+            except Exception as e:
+                logger.warning(f"Earlier mint of NFT #{i} was not mined, minting again: {str(e)}")
+            if receipt is not None and not blockchain.succeeded(receipt):
+                logger.warning(f"Earlier mint of NFT #{i} reverted, minting again")
+                receipt = None
+            if receipt is not None:
+                record(item, "confirmed")
+        if receipt is None:
+            receipt = blockchain.mint_nft(
+                blockchain_config["wallet_address"],
+                item["metadata_uri"],
+                blockchain_config["private_key"],
+                job_ledger=job_ledger,
+                token_index=i
+            )
+        if not receipt:
+            logger.error(f"Failed to mint NFT #{i}")
+            return None
+        if not blockchain.succeeded(receipt):
+            logger.error(f"Mint of NFT #{i} reverted: {receipt['transactionHash'].hex()}")
+            return None
+        logger.info(f"NFT #{i} minted successfully!")
+        logger.info(f"Transaction hash: {receipt['transactionHash'].hex()}")
+        logger.info(f"Image IPFS URI: {item['image_uri']}")
+        logger.info(f"Metadata IPFS URI: {item['metadata_uri']}")
+        item["tx_hash"] = receipt['transactionHash'].hex()
+        return item
+
+    steps = [("dedup", dedup)] if duplicate_index is not None else []
+    steps += [
+        ("encode", encode),
+        ("upload_image", upload_image),
+        ("upload_metadata", upload_metadata)
+    ]
+    # Without a blockchain (dry run) the pipeline stops after pinning
+    if blockchain is not None:
+        steps.append(("mint", mint))
+    return [
+        Stage(name, func, PIPELINE_WORKERS[name], PIPELINE_QUEUE_SIZE)
+        for name, func in steps
+    ]
+
+def run_collection(
+    art_generator: "AIArtGenerator",
+    nft_metadata: NFTMetadata,
+    ipfs_handler: "IPFSHandler",
+    blockchain: Optional["BlockchainInterface"],
+    blockchain_config: Dict[str, Any],
+    prompt: str,
+    num_variations: int,
+    style_params: Dict[str, Any],
+    logger: logging.Logger,
+    seeds: Optional[list] = None,
+    previews: Optional[Dict[int, Any]] = None,
+    prompts: Optional[list] = None,
+    attributes: Optional[list] = None,
+    duplicate_index: Optional["NearDuplicateIndex"] = None,
+    reject_duplicates: bool = False,
+    job_ledger: Optional[JobLedger] = None
+) -> list:
+    """
+    Pin a whole collection as two IPFS directories and mint it
+
+    Images and metadata are written into images/ and metadata/ under a
+    timestamped output directory and each tree is pinned in a single
+    request, so token URIs take the baseURI form ipfs://<dirCID>/<n>.json.
+    With a job ledger, every token is recorded once both directories are
+    pinned and again with its batch transaction before that is
+    broadcast. A rerun then keeps the pinned directories, waits for
+    transactions already sent and only mints the tokens left over.
+    """
+    rows = [row for row in job_ledger.rows() if row["metadata_uri"]] if job_ledger is not None else []
+    if rows:
+        logger.info(f"Resuming collection with {len(rows)} pinned tokens from the job ledger")
+        items = [
+            {"index": row["token_index"], "metadata_uri": row["metadata_uri"], "stage": row["stage"],
+             "tx_hash": row["tx_hash"]}
+            for row in rows
+        ]
+    else:
+        items = pin_collection(
+            art_generator,
+            nft_metadata,
+            ipfs_handler,
+            prompt,
+            num_variations,
+            style_params,
+            logger,
+            seeds=seeds,
+            previews=previews,
+            prompts=prompts,
+            attributes=attributes,
+            duplicate_index=duplicate_index,
+            reject_duplicates=reject_duplicates
+        )
+        if job_ledger is not None and items:
+            job_ledger.update_many(
+                {
+                    item["index"]: {"seed": item["seed"], "image_uri": item["image_uri"],
+                                    "metadata_uri": item["metadata_uri"]}
+                    for item in items
+                },
+                "metadata_pinned"
+            )
+
+    token_uris = [item["metadata_uri"] for item in items]
+    if blockchain is None:
+        return token_uris
+
+    # Wait for batches sent before a restart instead of minting them twice
+    waited = {}
+    unminted = []
+    for item in items:
+        if item.get("stage") == "confirmed":
+            continue
+        if item.get("tx_hash"):
+            if item["tx_hash"] not in waited:
+                try:
+                    earlier = blockchain.resume_transaction(item["tx_hash"])
+                    if earlier is None:
+                        logger.warning(f"Earlier mint transaction {item['tx_hash']} never reached the node")
+                        waited[item["tx_hash"]] = None
+                    else:
+                        waited[item["tx_hash"]] = earlier.result()
+                except Exception as e:
+                    logger.warning(f"Earlier mint transaction {item['tx_hash']} was not mined: {str(e)}")
+                    waited[item["tx_hash"]] = None
+            receipt = waited[item["tx_hash"]]
+            if receipt is not None and blockchain.succeeded(receipt):
+                if job_ledger is not None:
+                    job_ledger.update(item["index"], "confirmed")
+                continue
+        unminted.append(item)
+    if len(unminted) < len(items):
+        logger.info(f"{len(items) - len(unminted)} tokens were already minted")
+    if not unminted:
+        return token_uris
+
+    wallet_address = blockchain_config["wallet_address"]
+    receipts = blockchain.mint_batch(
+        wallet_address,
+        [wallet_address] * len(unminted),
+        [item["metadata_uri"] for item in unminted],
+        blockchain_config["private_key"],
+        job_ledger=job_ledger,
+        token_indices=[item["index"] for item in unminted]
+    )
+    if receipts is None:
+        logger.error("Failed to mint collection")
+        return []
+    for receipt in receipts:
+        if receipt is not None:
+            logger.info(f"Transaction hash: {receipt['transactionHash'].hex()}")
+    if not all(blockchain.succeeded(receipt) for receipt in receipts):
+        logger.error("Some collection mint transactions failed or reverted")
+        return []
+    return token_uris
+
+def pin_collection(
+    art_generator: "AIArtGenerator",
+    nft_metadata: NFTMetadata,
+    ipfs_handler: "IPFSHandler",
+    prompt: str,
+    num_variations: int,
+    style_params: Dict[str, Any],
+    logger: logging.Logger,
+    seeds: Optional[list] = None,
+    previews: Optional[Dict[int, Any]] = None,
+    prompts: Optional[list] = None,
+    attributes: Optional[list] = None,
+    duplicate_index: Optional["NearDuplicateIndex"] = None,
+    reject_duplicates: bool = False
+) -> list:
+    """Generate a collection and pin it as two directories; returns the pinned items with their URIs"""
+    output_dir = NFTUtils.create_output_directory()
+    if output_dir is None:
+        return []
+    images_dir = output_dir / "images"
+    metadata_dir = output_dir / "metadata"
+    images_dir.mkdir()
+    metadata_dir.mkdir()
+    
+    # Encoding runs in the background while the next batch renders
+    extension = art_generator.encoder.extension
+    saves = []
+    generated = iter_generated_images(
+        art_generator,
+        prompt,
+        num_variations,
+        style_params,
+        seeds=seeds,
+        previews=previews,
+        prompts=prompts,
+        attributes=attributes
+    )
+    # Labels name the collection, not this attempt, so a retry is not
+    # flagged as a duplicate of the images it rendered last time
+    run_label = JobLedger.make_run_id(prompt, style_params, seeds, attributes)
+    for item in generated:
+        if duplicate_index is not None:
+            match = duplicate_index.check([item["image"]], [f"{run_label}/{item['index']}"])[0]
+            if match is not None:
+                logger.warning(f"Image {item['index']} is a near duplicate of {match[0]} (distance {match[1]})")
+                if reject_duplicates:
+                    metrics.skip("dedup")
+                    continue
+        image_path = images_dir / f"{item['index']}.{extension}"
+        saves.append((item, art_generator.save_image_async(item.pop("image"), str(image_path))))
+    items = [item for item, saved in saves if saved.result()]
+    
+    images_uri = ipfs_handler.upload_directory(images_dir)
+    if not images_uri:
+        logger.error("Failed to upload image directory to IPFS")
+        return []
+    logger.info(f"Image directory IPFS URI: {images_uri}")
+    
+    for item in items:
+        metadata = build_metadata(
+            nft_metadata,
+            item["index"],
+            f"{images_uri}/{item['index']}.{extension}",
+            style_params,
+            item["seed"],
+            item.get("attributes")
+        )
+        nft_metadata.save_metadata(metadata, str(metadata_dir / f"{item['index']}.json"))
+    
+    metadata_uri = ipfs_handler.upload_directory(metadata_dir)
+    if not metadata_uri:
+        logger.error("Failed to upload metadata directory to IPFS")
+        return []
+    logger.info(f"Metadata directory IPFS URI: {metadata_uri}")
+    
+    for item in items:
+        item["image_uri"] = f"{images_uri}/{item['index']}.{extension}"
+        item["metadata_uri"] = f"{metadata_uri}/{item['index']}.json"
+    return items
+
+def create_blockchain(blockchain_config: Dict[str, Any]):
+    """Connect the configured RPC backend"""
+    # The async backend shares JSON-RPC round trips between mints
+    backend = blockchain_config.get("rpc_backend", "sync")
+    if backend == "async":
+        from async_blockchain import AsyncBlockchainInterface as blockchain_class
+    else:
+        from blockchain_interface import BlockchainInterface as blockchain_class
+    return blockchain_class(
+        blockchain_config["provider_url"],
+        blockchain_config["contract_address"],
+        blockchain_config["contract_abi"],
+        fee_ttl=blockchain_config.get("fee_cache_ttl", 12.0)
+    )
+
+def run_presign(
+    blockchain_config: Dict[str, Any],
+    token_uris: list,
+    path: str,
+    offline: bool,
+    logger: logging.Logger,
+    job_ledger: Optional[JobLedger] = None,
+    token_indices: Optional[list] = None
+) -> bool:
+    """
+    Sign mint transactions for token_uris into path instead of sending them
+    
+    Offline (--dry-run) every signing parameter must be set in the
+    presign section of the blockchain config; otherwise missing ones are
+    read from the node. With a job ledger, each token (token_indices
+    line up with token_uris) is marked tx_sent with its presigned hash
+    before the file is written, so a rerun after the broadcast picks up
+    that transaction instead of minting the token again. A token whose
+    transaction the node has never seen is minted normally.
+    """
+    if not token_uris:
+        logger.error("Nothing to presign")
+        return False
+    from presigner import presign_mints, resolve_signing_params, save_signed
+    presign_config = blockchain_config.get("presign", {})
+    lookup = None
+    if not offline:
+        from blockchain_interface import BlockchainInterface
+        lookup = BlockchainInterface(
+            blockchain_config["provider_url"],
+            blockchain_config["contract_address"],
+            blockchain_config["contract_abi"]
+        )
+    params = resolve_signing_params(
+        presign_config,
+        blockchain_config["wallet_address"],
+        token_uris,
+        lookup
+    )
+    if params is None:
+        return False
+    transactions = presign_mints(
+        blockchain_config["contract_address"],
+        blockchain_config["contract_abi"],
+        blockchain_config["wallet_address"],
+        blockchain_config["private_key"],
+        token_uris,
+        params,
+        processes=presign_config.get("processes")
+    )
+    if job_ledger is not None:
+        for token_index, entry in zip(token_indices, transactions):
+            entry["token_index"] = token_index
+            job_ledger.update(token_index, "tx_sent", tx_hash=entry["tx_hash"])
+    return save_signed(
+        path,
+        blockchain_config["wallet_address"],
+        blockchain_config["contract_address"],
+        params,
+        transactions,
+        job_ledger
+    )
+
+def create_art_generator(art_config: Dict[str, Any], server_url: Optional[str] = None):
+    """A local model, a worker pool or a model server client, as configured"""
+    workers = art_config.get("workers", {})
+    prompt_cache = art_config.get("prompt_cache", {})
+    result_cache = art_config.get("result_cache", {})
+    generator_kwargs = {
+        "embedding_cache_size": prompt_cache.get("max_entries", 128),
+        "embedding_cache_dir": prompt_cache.get("cache_dir"),
+        "result_cache_dir": result_cache.get("cache_dir"),
+        "result_cache_max_bytes": result_cache.get("max_bytes", 2 * 1024**3),
+        "preview_options": art_config.get("preview", {}),
+        "output_format": art_config.get("output_format", "png"),
+        "encode_options": art_config.get("encode_options"),
+        "memory_options": art_config.get("memory")
+    }
+    if server_url:
+        # The model is already loaded in a long-lived server process
+        from model_server import RemoteArtGenerator
+        return RemoteArtGenerator(
+            server_url,
+            output_format=generator_kwargs["output_format"],
+            encode_options=generator_kwargs["encode_options"]
+        )
+    if workers.get("count", 1) > 1:
+        from worker_pool import ArtWorkerPool
+        return ArtWorkerPool(
+            art_config["model_path"],
+            num_workers=workers["count"],
+            devices=workers.get("devices"),
+            threads_per_worker=workers.get("threads_per_worker"),
+            batch_size=art_config.get("batch_size", 1),
+            share_weights=workers.get("share_weights", False),
+            generator_kwargs=generator_kwargs
+        )
+    from art_generator import AIArtGenerator
+    return AIArtGenerator(
+        art_config["model_path"],
+        batch_size=art_config.get("batch_size", 1),
+        **generator_kwargs
+    )
+
+def create_ipfs_handler(ipfs_config: Dict[str, Any]):
+    from ipfs_handler import IPFSHandler
+    return IPFSHandler(
+        ipfs_config["pinata_api_key"],
+        ipfs_config["pinata_secret_key"],
+        max_concurrency=ipfs_config.get("max_concurrency", 8),
+        max_retries=ipfs_config.get("max_retries", 5),
+        pin_index_path="output/pin_index.sqlite3"
+    )
+
+def create_duplicate_index(art_config: Dict[str, Any]):
+    """Perceptual hashes of earlier pieces, to catch near-identical images"""
+    dedup_config = art_config.get("dedup", {})
+    if not dedup_config.get("enabled"):
+        return None
+    from near_duplicates import NearDuplicateIndex
+    return NearDuplicateIndex(
+        dedup_config.get("archive_path"),
+        method=dedup_config.get("method", "dhash"),
+        max_distance=dedup_config.get("max_distance", 4)
+    )
+
+def style_params_from_args(args: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'height': args["height"],
+        'width': args["width"],
+        'num_inference_steps': args["steps"],
+        'guidance_scale': args["guidance_scale"],
+        'seed': args["seed"] if args["seed"] is not None else 42,  # Set seed for reproducibility
+        'negative_prompt': args["negative_prompt"] or "blurry, low quality, distorted"
+    }
+
+def log_memory(art_generator, logger: logging.Logger) -> None:
+    """Report peak memory of a local model with the memory options in effect"""
+    if not hasattr(art_generator, "memory_stats"):
+        return
+    stats = art_generator.memory_stats()
+    logger.info(f"Memory: {stats}")
+    for key in ("peak_device_bytes", "peak_rss_bytes"):
+        if key in stats:
+            metrics.set_gauge(key, stats[key])
+
+def close_all(*resources) -> None:
+    """Close worker pools, async backends and the like that need it"""
+    for resource in resources:
+        if resource is not None and hasattr(resource, "close"):
+            resource.close()
+
+def serve_command(args: Dict[str, Any], configs: Dict[str, Any], logger: logging.Logger) -> None:
+    from model_server import ModelServer
+    art_generator = create_art_generator(configs["art"])
+    try:
+        ModelServer(art_generator, port=args["server_port"]).serve_forever()
+    finally:
+        close_all(art_generator)
+
+def broadcast_command(args: Dict[str, Any], configs: Dict[str, Any], logger: logging.Logger) -> None:
+    # Presigned transactions need no model or IPFS access
+    from presigner import broadcast_signed_file
+    blockchain = create_blockchain(configs["blockchain"])
+    try:
+        receipts = broadcast_signed_file(blockchain, args["path"])
+        logger.info(f"Mined {sum(1 for receipt in receipts if receipt)}/{len(receipts)} presigned mints")
+    finally:
+        close_all(blockchain)
+
+def pin_command(args: Dict[str, Any], configs: Dict[str, Any], logger: logging.Logger) -> None:
+    ipfs_handler = create_ipfs_handler(configs["ipfs"])
+    try:
+        files = [path for path in args["paths"] if not Path(path).is_dir()]
+        for path, uri in zip(files, ipfs_handler.upload_many(files)):
+            print(f"{path}\t{uri}")
+        for path in args["paths"]:
+            if Path(path).is_dir():
+                print(f"{path}\t{ipfs_handler.upload_directory(path)}")
+    finally:
+        ipfs_handler.close()
+
+def mint_command(args: Dict[str, Any], configs: Dict[str, Any], logger: logging.Logger) -> None:
+    token_uris = list(args["token_uris"])
+    if args["uris_file"]:
+        with open(args["uris_file"], 'r') as f:
+            token_uris += [line.strip() for line in f if line.strip()]
+    if not token_uris:
+        logger.error("No token URIs to mint")
+        return
+    blockchain_config = configs["blockchain"]
+    blockchain = create_blockchain(blockchain_config)
+    try:
+        wallet_address = blockchain_config["wallet_address"]
+        futures = [
+            blockchain.send_mint(wallet_address, token_uri, blockchain_config["private_key"])
+            for token_uri in token_uris
+        ]
+        minted = 0
+        for token_uri, future in zip(token_uris, futures):
+            try:
+                receipt = future.result(timeout=600)
+                if not blockchain.succeeded(receipt):
+                    logger.error(f"Mint of {token_uri} reverted: {receipt['transactionHash'].hex()}")
+                    continue
+                logger.info(f"Minted {token_uri}: {receipt['transactionHash'].hex()}")
+                minted += 1
+            except Exception as e:
+                logger.error(f"Failed to mint {token_uri}: {str(e)}")
+        logger.info(f"Minted {minted}/{len(token_uris)} NFTs")
+    finally:
+        close_all(blockchain)
+
+def generate_command(args: Dict[str, Any], configs: Dict[str, Any], logger: logging.Logger) -> None:
+    """Render images into a timestamped output directory without pinning or minting"""
+    art_generator = create_art_generator(configs["art"], args["server_url"])
+    try:
+        prompt = args["prompt"] or "A futuristic cityscape with floating islands and neon lights"
+        style_params = style_params_from_args(args)
+        if args["preview"]:
+            if not hasattr(art_generator, "generate_previews"):
+                logger.error("Preview mode needs a local model")
+                return
+            run_previews(art_generator, prompt, args["preview"], style_params, logger)
+            return
+        
+        seeds = args["seeds"]
+        num_variations = len(seeds) if seeds else args["variations"]
+        previews = None
+        if seeds and configs["art"].get("preview", {}).get("final_mode") == "img2img":
+            previews = load_previews(seeds, art_generator.encoder.extension)
+        prompts, attributes = None, None
+        if configs["art"].get("traits"):
+            prompts, attributes = draw_traits(configs["art"]["traits"], prompt, num_variations, style_params)
+        
+        output_dir = NFTUtils.create_output_directory()
+        if output_dir is None:
+            return
+        extension = art_generator.encoder.extension
+        saves = [
+            art_generator.save_image_async(item["image"], str(output_dir / f"{item['index']}.{extension}"))
+            for item in iter_generated_images(
+                art_generator,
+                prompt,
+                num_variations,
+                style_params,
+                seeds=seeds,
+                previews=previews,
+                prompts=prompts,
+                attributes=attributes
+            )
+        ]
+        saved = sum(1 for future in saves if future.result())
+        logger.info(f"Saved {saved}/{num_variations} images to {output_dir}")
+        log_memory(art_generator, logger)
+    finally:
+        close_all(art_generator)
+
+def run_command(args: Dict[str, Any], configs: Dict[str, Any], logger: logging.Logger) -> None:
+    """Generate, pin and mint a collection"""
+    art_generator = None
+    ipfs_handler = None
+    blockchain = None
+    duplicate_index = None
+    try:
+        art_generator = create_art_generator(configs["art"], args["server_url"])
+        nft_metadata = NFTMetadata()
+        ipfs_handler = create_ipfs_handler(configs["ipfs"])
+        
+        # With --presign the run stops after pinning and mints are signed instead
+        if not args["dry_run"] and not args["presign"]:
+            blockchain = create_blockchain(configs["blockchain"])
+        
+        # Generate NFT collection
+        prompt = args["prompt"] or "A futuristic cityscape with floating islands and neon lights"
+        num_variations = args["variations"]
+        style_params = style_params_from_args(args)
+        
+        if args["preview"]:
+            if not hasattr(art_generator, "generate_previews"):
+                logger.error("Preview mode needs a local model")
+                return
+            run_previews(art_generator, prompt, args["preview"], style_params, logger)
+            return
+        
+        # Curated seeds replace the usual variation seeds
+        seeds = args["seeds"]
+        previews = None
+        if seeds:
+            num_variations = len(seeds)
+            if configs["art"].get("preview", {}).get("final_mode") == "img2img":
+                previews = load_previews(seeds, art_generator.encoder.extension)
+        
+        duplicate_index = create_duplicate_index(configs["art"])
+        reject_duplicates = configs["art"].get("dedup", {}).get("mode") == "reject"
+        
+        # Weighted trait tables give every token its own attributes and prompt
+        trait_tables = configs["art"].get("traits")
+        prompts, attributes = None, None
+        if trait_tables:
+            prompts, attributes = draw_traits(trait_tables, prompt, num_variations, style_params)
+        
+        if args["collection_mode"]:
+            # Kept apart from the pipeline runs of the same inputs, whose
+            # token URIs differ
+            job_ledger = JobLedger(
+                "output/job_ledger.sqlite3",
+                "collection-" + JobLedger.make_run_id(prompt, style_params, seeds, trait_tables)
+            )
+            token_uris = run_collection(
+                art_generator,
+                nft_metadata,
+                ipfs_handler,
+                blockchain,
+                configs["blockchain"],
+                prompt,
+                num_variations,
+                style_params,
+                logger,
+                seeds=seeds,
+                previews=previews,
+                prompts=prompts,
+                attributes=attributes,
+                duplicate_index=duplicate_index,
+                reject_duplicates=reject_duplicates,
+                job_ledger=job_ledger
+            )
+            logger.info(f"Collection ready with {len(token_uris)}/{num_variations} tokens")
+            if args["presign"]:
+                # Tokens signed by an earlier --presign keep their transaction
+                unsigned = [row for row in job_ledger.rows() if row["metadata_uri"] and not row["tx_hash"]]
+                run_presign(
+                    configs["blockchain"],
+                    [row["metadata_uri"] for row in unsigned],
+                    args["presign"],
+                    args["dry_run"],
+                    logger,
+                    job_ledger=job_ledger,
+                    token_indices=[row["token_index"] for row in unsigned]
+                )
+            logger.info(f"Job ledger: {job_ledger.summary()}")
+            return
+        
+        # Generate, save, pin and mint as a pipeline so the model keeps
+        # rendering while earlier pieces are on the network
+        # Progress is recorded per token so a rerun resumes unfinished work
+        job_ledger = JobLedger(
+            "output/job_ledger.sqlite3",
+            JobLedger.make_run_id(prompt, style_params, seeds, trait_tables)
+        )
+        stages = build_mint_stages(
+            art_generator,
+            nft_metadata,
+            ipfs_handler,
+            blockchain,
+            configs["blockchain"],
+            style_params,
+            logger,
+            job_ledger,
+            save_local_copy=configs["art"].get("save_local_copy", True),
+            duplicate_index=duplicate_index,
+            reject_duplicates=reject_duplicates
+        )
+        pipeline = MintPipeline(stages)
+        completed = pipeline.run(
+            iter_generated_images(
+                art_generator,
+                prompt,
+                num_variations,
+                style_params,
+                job_ledger,
+                seeds=seeds,
+                previews=previews,
+                prompts=prompts,
+                attributes=attributes
+            )
+        )
+        logger.info(f"Processed {len(completed)}/{num_variations} NFTs")
+        if args["presign"]:
+            # Tokens signed by an earlier --presign keep their transaction
+            unsigned = [item for item in sorted(completed, key=lambda item: item["index"]) if not item.get("tx_hash")]
+            if len(unsigned) < len(completed):
+                logger.info(f"Skipping {len(completed) - len(unsigned)} tokens that were already signed or sent")
+            run_presign(
+                configs["blockchain"],
+                [item["metadata_uri"] for item in unsigned],
+                args["presign"],
+                args["dry_run"],
+                logger,
+                job_ledger=job_ledger,
+                token_indices=[item["index"] for item in unsigned]
+            )
+        logger.info(f"Job ledger: {job_ledger.summary()}")
+        if getattr(art_generator, "embedding_cache", None) is not None:
+            logger.info(f"Prompt embedding cache: {art_generator.embedding_cache.stats()}")
+        if getattr(art_generator, "result_cache", None) is not None:
+            logger.info(f"Generation result cache: {art_generator.result_cache.stats()}")
+        log_memory(art_generator, logger)
+    finally:
+        close_all(art_generator, ipfs_handler, blockchain)
+        if duplicate_index is not None:
+            duplicate_index.save()
+
+COMMANDS = {
+    "generate": generate_command,
+    "pin": pin_command,
+    "mint": mint_command,
+    "run": run_command,
+    "serve": serve_command,
+    "broadcast": broadcast_command
+}
+
 def main():
+    args = parse_arguments()
+    command = args["command"]
+    # Flags from before the subcommands
+    if command == "run":
+        if args["setup_config"]:
+            command = "setup-config"
+        elif args["broadcast"]:
+            command, args["path"] = "broadcast", args["broadcast"]
+        elif args["serve"]:
+            command = "serve"
+    
     # Setup logging
     logger = setup_logging()
-    logger.info("Starting NFT generation process")
+    logger.info(f"Starting NFT generation process ({command})")
+    if args["metrics"]:
+        metrics.enable()
     
     # Setup directories
     setup_directories()
@@ -82,95 +1039,24 @@ def main():
     # Setup configuration
     config_manager = ConfigManager()
     config_manager.create_default_configs()  # Create default configs if they don't exist
+    if command == "setup-config":
+        logger.info("Default configuration files are in place")
+        return
     
     configs = config_manager.load_all_configs()
     if not configs:
         logger.error("Failed to load configurations")
         return
     
-    # Initialize utilities
-    nft_utils = NFTUtils()
-    prompt_helper = PromptHelper()
-    
     try:
-        # Initialize components
-        art_generator = AIArtGenerator(configs["art"]["model_path"])
-        nft_metadata = NFTMetadata()
-        ipfs_handler = IPFSHandler(
-            configs["ipfs"]["pinata_api_key"],
-            configs["ipfs"]["pinata_secret_key"]
-        )
-        
-        blockchain = BlockchainInterface(
-            configs["blockchain"]["provider_url"],
-            configs["blockchain"]["contract_address"],
-            configs["blockchain"]["contract_abi"]
-        )
-        
-        # Generate NFT collection
-        prompt = "A futuristic cityscape with floating islands and neon lights"
-        style_params = {
-            'height': 512,
-            'width': 512,
-            'num_inference_steps': 50,
-            'guidance_scale': 7.5,
-            'seed': 42,  # Set seed for reproducibility
-            'negative_prompt': "blurry, low quality, distorted"
-        }
-        
-        images = generate_nft_collection(art_generator, prompt, num_variations=4, style_params=style_params)
-        
-        # Process each generated image
-        for i, image in enumerate(images, 1):
-            if image:
-                # Save the generated image
-                image_path = f"output/generated_art_{i}.png"
-                art_generator.save_image(image, image_path)
-                
-                # Upload image to IPFS
-                image_ipfs_uri = ipfs_handler.upload_file(image_path)
-                if not image_ipfs_uri:
-                    logger.error(f"Failed to upload image {i} to IPFS")
-                    continue
-                
-                # Create metadata
-                attributes = [
-                    {"trait_type": "Style", "value": "Futuristic"},
-                    {"trait_type": "Theme", "value": "Cityscape"},
-                    {"trait_type": "AI Model", "value": "Stable Diffusion"},
-                    {"trait_type": "Variation", "value": str(i)}
-                ]
-                
-                metadata = nft_metadata.create_metadata(
-                    name=f"AI Generated Futuristic City #{i}",
-                    description="A stunning AI-generated artwork featuring a futuristic cityscape",
-                    image_path=image_ipfs_uri,
-                    attributes=attributes,
-                    generator_params=style_params
-                )
-                
-                # Upload metadata to IPFS
-                metadata_ipfs_uri = ipfs_handler.upload_metadata(metadata)
-                if not metadata_ipfs_uri:
-                    logger.error(f"Failed to upload metadata {i} to IPFS")
-                    continue
-                
-                # Mint NFT
-                wallet_address = configs["blockchain"]["wallet_address"]
-                private_key = configs["blockchain"]["private_key"]
-                
-                receipt = blockchain.mint_nft(wallet_address, metadata_ipfs_uri, private_key)
-                if receipt:
-                    logger.info(f"NFT #{i} minted successfully!")
-                    logger.info(f"Transaction hash: {receipt['transactionHash'].hex()}")
-                    logger.info(f"Image IPFS URI: {image_ipfs_uri}")
-                    logger.info(f"Metadata IPFS URI: {metadata_ipfs_uri}")
-                else:
-                    logger.error(f"Failed to mint NFT #{i}")
-        
+        COMMANDS[command](args, configs, logger)
     except Exception as e:
         logger.error(f"An error occurred: {str(e)}")
         return
+    finally:
+        if args["metrics"]:
+            metrics.log_summary()
+            metrics.write(args["metrics"])
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,173 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict
+
+# Upper bounds in seconds, wide enough for a sub-millisecond encode and a
+# multi-minute confirmation
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+class RunMetrics:
+    """
+    Latency histograms and counters for one run, keyed by stage
+
+    Stages are the steps that decide where a run spends its time:
+    model_load, denoise, encode, pin, sign, send and confirm. Counters
+    track retries, failures and deliberate skips per stage, and gauges hold point values
+    such as peak memory. Every observation is kept, so
+    the JSON summary reports exact percentiles; the Prometheus export
+    buckets them into cumulative histograms. Recording is a no-op until
+    enable() is called, so instrumented code costs nothing by default.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.logger = logging.getLogger(__name__)
+        self.enabled = False
+        self.buckets = tuple(buckets)
+        self._samples = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+
+    def enable(self) -> None:
+        self.enabled = True
+        self._started_at = time.time()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples = {}
+            self._counters = {}
+            self._gauges = {}
+        self._started_at = time.time()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def time(self, stage: str):
+        """Time the body of a with block as one observation of stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def increment(self, counter: str, stage: str, value: int = 1) -> None:
+        if not self.enabled or not value:
+            return
+        with self._lock:
+            key = (counter, stage)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    def retry(self, stage: str, value: int = 1) -> None:
+        self.increment("retries", stage, value)
+
+    def failure(self, stage: str, value: int = 1) -> None:
+        self.increment("failures", stage, value)
+
+    def skip(self, stage: str, value: int = 1) -> None:
+        self.increment("skipped", stage, value)
+
+    @staticmethod
+    def _percentile(ordered, fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self) -> Dict[str, Any]:
+        """Count, total and p50/p90/p99 latency per stage plus all counters"""
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        stages = {}
+        for stage, ordered in sorted(samples.items()):
+            total = sum(ordered)
+            stages[stage] = {
+                "count": len(ordered),
+                "total_seconds": round(total, 6),
+                "mean_seconds": round(total / len(ordered), 6),
+                "p50_seconds": round(self._percentile(ordered, 0.50), 6),
+                "p90_seconds": round(self._percentile(ordered, 0.90), 6),
+                "p99_seconds": round(self._percentile(ordered, 0.99), 6),
+                "max_seconds": round(ordered[-1], 6)
+            }
+        summary = {
+            "wall_seconds": round(time.time() - self._started_at, 3),
+            "stages": stages
+        }
+        for (counter, stage), value in sorted(counters.items()):
+            summary.setdefault(counter, {})[stage] = value
+        if gauges:
+            summary["gauges"] = dict(sorted(gauges.items()))
+        return summary
+
+    def to_prometheus(self) -> str:
+        """Render everything in the Prometheus text exposition format"""
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        lines = [
+            "# HELP nexio_stage_seconds Latency of each run stage",
+            "# TYPE nexio_stage_seconds histogram"
+        ]
+        for stage, ordered in sorted(samples.items()):
+            for bound in self.buckets:
+                count = bisect.bisect_right(ordered, bound)
+                lines.append(f'nexio_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'nexio_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {len(ordered)}')
+            lines.append(f'nexio_stage_seconds_sum{{stage="{stage}"}} {sum(ordered)}')
+            lines.append(f'nexio_stage_seconds_count{{stage="{stage}"}} {len(ordered)}')
+        for counter in sorted({counter for counter, _ in counters}):
+            lines.append(f"# HELP nexio_{counter}_total {counter.capitalize()} per run stage")
+            lines.append(f"# TYPE nexio_{counter}_total counter")
+            for (name, stage), value in sorted(counters.items()):
+                if name == counter:
+                    lines.append(f'nexio_{counter}_total{{stage="{stage}"}} {value}')
+        for name, value in sorted(gauges.items()):
+            lines.append(f"# TYPE nexio_{name} gauge")
+            lines.append(f"nexio_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> bool:
+        """Write a JSON summary for .json paths, Prometheus text otherwise"""
+        try:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.suffix == ".json":
+                path.write_text(json.dumps(self.summary(), indent=2))
+            else:
+                path.write_text(self.to_prometheus())
+            self.logger.info(f"Wrote run metrics to {path}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error writing run metrics: {str(e)}")
+            return False
+
+    def log_summary(self) -> None:
+        summary = self.summary()
+        for stage, stats in summary["stages"].items():
+            self.logger.info(
+                f"Metrics {stage}: count={stats['count']} "
+                f"p50={stats['p50_seconds']:.3f}s p99={stats['p99_seconds']:.3f}s "
+                f"total={stats['total_seconds']:.2f}s "
+                f"retries={summary.get('retries', {}).get(stage, 0)} "
+                f"failures={summary.get('failures', {}).get(stage, 0)} "
+                f"skipped={summary.get('skipped', {}).get(stage, 0)}"
+            )
+
+# Shared by every module of a run; main() enables it for --metrics
+metrics = RunMetrics()
@@ -0,0 +1,199 @@
+import base64
+import json
+import logging
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+from image_encoder import ImageEncoder
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7860
+
+def encode_image(image):
+    """Serialize a PIL image as raw pixels; cheaper than PNG on localhost"""
+    return {
+        "mode": image.mode,
+        "size": list(image.size),
+        "data": base64.b64encode(image.tobytes()).decode()
+    }
+
+def decode_image(payload):
+    return Image.frombytes(payload["mode"], tuple(payload["size"]), base64.b64decode(payload["data"]))
+
+class _GenerationHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        self.server.model_server.logger.debug(format % args)
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._reply(404, {"error": "not found"})
+            return
+        generator = self.server.model_server.art_generator
+        self._reply(200, {"status": "ok", "batch_size": generator.batch_size})
+
+    def do_POST(self):
+        if self.path != "/generate":
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            job = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if "seeds" in job:
+                images = self.server.model_server.generate_batch(
+                    job["prompt"],
+                    job["seeds"],
+                    job.get("style_params")
+                )
+            else:
+                images = self.server.model_server.generate(
+                    job["prompt"],
+                    job.get("num_variations"),
+                    job.get("style_params")
+                )
+            self._reply(200, {"images": [encode_image(image) for image in images]})
+        except Exception as e:
+            self.server.model_server.logger.error(f"Error handling generation job: {str(e)}")
+            self._reply(500, {"error": str(e)})
+
+class ModelServer:
+    """
+    Keep one AIArtGenerator loaded and serve generation jobs over localhost HTTP
+
+    POST /generate takes {"prompt", "style_params", "num_variations"}; with
+    num_variations it behaves like generate_variations, with "seeds" like
+    generate_batch, otherwise like generate_art. Jobs run one at a time on
+    the loaded model.
+    """
+
+    def __init__(self, art_generator, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.logger = logging.getLogger(__name__)
+        self.art_generator = art_generator
+        self.httpd = ThreadingHTTPServer((host, port), _GenerationHandler)
+        self.httpd.model_server = self
+        self._model_lock = threading.Lock()
+
+    def generate(self, prompt, num_variations=None, style_params=None):
+        with self._model_lock:
+            if num_variations is None:
+                image = self.art_generator.generate_art(prompt, style_params)
+                if image is None:
+                    raise RuntimeError("Image generation failed")
+                return [image]
+            return self.art_generator.generate_variations(prompt, num_variations, style_params)
+
+    def generate_batch(self, prompt, seeds, style_params=None):
+        with self._model_lock:
+            return self.art_generator.generate_batch(prompt, seeds, style_params)
+
+    def serve_forever(self):
+        host, port = self.httpd.server_address
+        self.logger.info(f"Model server listening on http://{host}:{port}")
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.httpd.server_close()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+
+class RemoteArtGenerator:
+    """Drop-in replacement for AIArtGenerator that submits jobs to a ModelServer"""
+
+    def __init__(self, server_url, timeout=600, output_format="png", encode_options=None):
+        self.logger = logging.getLogger(__name__)
+        self.server_url = server_url.rstrip("/")
+        self.timeout = timeout
+        self.encoder = ImageEncoder(output_format, encode_options)
+        self._batch_size = None
+
+    def _request(self, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            f"{self.server_url}{path}",
+            data=data,
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    @property
+    def batch_size(self):
+        if self._batch_size is None:
+            self._batch_size = self._request("/health")["batch_size"]
+        return self._batch_size
+
+    def generate_art(self, prompt, style_params=None):
+        try:
+            result = self._request("/generate", {"prompt": prompt, "style_params": style_params})
+            return decode_image(result["images"][0])
+        except Exception as e:
+            self.logger.error(f"Error generating art on model server: {str(e)}")
+            return None
+
+    def generate_variations(self, prompt, num_variations=4, style_params=None):
+        try:
+            result = self._request("/generate", {
+                "prompt": prompt,
+                "style_params": style_params,
+                "num_variations": num_variations
+            })
+            return [decode_image(image) for image in result["images"]]
+        except Exception as e:
+            self.logger.error(f"Error generating variations on model server: {str(e)}")
+            return []
+
+    def generate_batch(self, prompt, seeds, style_params=None):
+        try:
+            result = self._request("/generate", {
+                "prompt": prompt,
+                "style_params": style_params,
+                "seeds": list(seeds)
+            })
+            return [decode_image(image) for image in result["images"]]
+        except Exception as e:
+            self.logger.error(f"Error generating batch on model server: {str(e)}")
+            return []
+
+    def iter_batch(self, prompt, seeds, style_params=None, previews=None):
+        """Stream (position, seed, image), one server-side batch per request"""
+        if previews:
+            self.logger.warning("Preview refinement is not supported by the model server, rendering from scratch")
+        batch_size = self.batch_size
+        for start in range(0, len(seeds), batch_size):
+            chunk = list(seeds[start:start + batch_size])
+            chunk_prompt = prompt[start:start + batch_size] if isinstance(prompt, list) else prompt
+            images = self.generate_batch(chunk_prompt, chunk, style_params)
+            if len(images) != len(chunk):
+                self.logger.error(f"Model server returned {len(images)}/{len(chunk)} images, skipping batch")
+                continue
+            for offset, image in enumerate(images):
+                yield start + offset, chunk[offset], image
+
+    def iter_variations(self, prompt, num_variations=4, style_params=None):
+        """Stream variations as (index, seed, image), one batch at a time"""
+        base_seed = (style_params or {}).get('seed')
+        if base_seed is None:
+            self.logger.error("Streaming from the model server needs a base seed")
+            return
+        seeds = [base_seed + i for i in range(1, num_variations + 1)]
+        for i, seed, image in self.iter_batch(prompt, seeds, style_params):
+            yield i + 1, seed, image
+
+    def save_image(self, image, path):
+        """Save the generated image to a file"""
+        return self.encoder.save(image, path)
+
+    def save_image_async(self, image, path):
+        return self.encoder.save_async(image, path)
+
+    def close(self):
+        self.encoder.close()
@@ -0,0 +1,159 @@
+import logging
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+from PIL import Image
+
+# Byte popcount table for NumPy releases without np.bitwise_count
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """Number of set bits in each uint64"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _POPCOUNT[values.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+def _pack_bits(bits: np.ndarray) -> np.ndarray:
+    """(N, 64) booleans -> N uint64 hashes"""
+    return np.packbits(bits.reshape(len(bits), 64), axis=1).view('>u8').ravel().astype(np.uint64)
+
+def _grayscale(images, size: Tuple[int, int]) -> np.ndarray:
+    return np.stack([
+        np.asarray(image.convert("L").resize(size, Image.BILINEAR), dtype=np.float32)
+        for image in images
+    ])
+
+def dhash(images) -> np.ndarray:
+    """64-bit difference hashes: sign of horizontal gradients on a 9x8 thumbnail"""
+    pixels = _grayscale(images, (9, 8))
+    return _pack_bits(pixels[:, :, 1:] > pixels[:, :, :-1])
+
+_DCT_SIZE = 32
+_DCT = np.sqrt(2.0 / _DCT_SIZE) * np.cos(
+    np.pi * (2 * np.arange(_DCT_SIZE)[None, :] + 1) * np.arange(_DCT_SIZE)[:, None] / (2 * _DCT_SIZE)
+)
+_DCT[0] /= np.sqrt(2.0)
+
+def phash(images) -> np.ndarray:
+    """64-bit perceptual hashes: low 8x8 DCT coefficients of a 32x32 thumbnail against their median"""
+    pixels = _grayscale(images, (_DCT_SIZE, _DCT_SIZE))
+    coefficients = np.einsum('ij,njk,lk->nil', _DCT, pixels, _DCT)[:, :8, :8].reshape(len(pixels), 64)
+    # The DC term only reflects overall brightness
+    medians = np.median(coefficients[:, 1:], axis=1, keepdims=True)
+    return _pack_bits(coefficients > medians)
+
+HASHES = {"dhash": dhash, "phash": phash}
+
+class NearDuplicateIndex:
+    """
+    Flag generated images that look like ones already in the collection
+
+    Images are reduced to 64-bit perceptual hashes (dHash or pHash), a
+    whole batch at a time. Lookups XOR the query against every archived
+    hash in one array and count bits, which scans 100k hashes in about
+    a millisecond, so no tree index is needed. The archive is kept in an
+    .npz file across runs. Labels (e.g. "token 12") are stored alongside
+    for reporting.
+    """
+
+    def __init__(self, archive_path: Optional[str] = None, method: str = "dhash", max_distance: int = 4):
+        self.logger = logging.getLogger(__name__)
+        if method not in HASHES:
+            raise ValueError(f"Unknown perceptual hash: {method}")
+        self.method = method
+        self.max_distance = max_distance
+        self.archive_path = Path(archive_path) if archive_path else None
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._labels = []
+        self._lock = threading.Lock()
+        if self.archive_path is not None and self.archive_path.exists():
+            try:
+                with np.load(self.archive_path, allow_pickle=False) as archive:
+                    if str(archive["method"]) == method:
+                        self._hashes = archive["hashes"].astype(np.uint64)
+                        self._labels = archive["labels"].tolist()
+                    else:
+                        self.logger.warning(f"Ignoring {self.archive_path}: built with {archive['method']}")
+            except Exception as e:
+                self.logger.warning(f"Ignoring unreadable hash archive {self.archive_path}: {str(e)}")
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def hash(self, images) -> np.ndarray:
+        return HASHES[self.method](images)
+
+    def nearest(self, hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Index and Hamming distance of the closest archived hash for each query (-1 if empty)"""
+        with self._lock:
+            archive = self._hashes
+        return self._nearest(archive, hashes)
+
+    @staticmethod
+    def _nearest(archive, hashes):
+        if len(archive) == 0:
+            return np.full(len(hashes), -1), np.full(len(hashes), 65)
+        matches = np.empty(len(hashes), dtype=np.int64)
+        distances = np.empty(len(hashes), dtype=np.int64)
+        for i, value in enumerate(hashes):
+            counts = popcount64(archive ^ value)
+            matches[i] = np.argmin(counts)
+            distances[i] = counts[matches[i]]
+        return matches, distances
+
+    def check(self, images, labels: List[str], add: bool = True) -> List[Optional[Tuple[str, int]]]:
+        """
+        Check a batch of images against the archive and each other
+
+        Returns (label, distance) of the matching image for each near
+        duplicate and None for the rest. Unless add is False, images that
+        are not duplicates join the archive.
+        """
+        hashes = self.hash(images)
+        with self._lock:
+            matches, distances = self._nearest(self._hashes, hashes)
+            results = []
+            accepted = []
+            for i, value in enumerate(hashes):
+                match = None
+                if distances[i] <= self.max_distance and self._labels[matches[i]] == labels[i]:
+                    # A rerun of the same token is not a duplicate of itself
+                    # and is already archived
+                    results.append(None)
+                    continue
+                if distances[i] <= self.max_distance:
+                    match = (self._labels[matches[i]], int(distances[i]))
+                elif accepted:
+                    # Earlier images of the same batch are not archived yet
+                    batch_distances = popcount64(hashes[accepted] ^ value)
+                    closest = int(np.argmin(batch_distances))
+                    if batch_distances[closest] <= self.max_distance:
+                        match = (labels[accepted[closest]], int(batch_distances[closest]))
+                results.append(match)
+                if match is None:
+                    accepted.append(i)
+            if add and accepted:
+                self._hashes = np.concatenate([self._hashes, hashes[accepted]])
+                self._labels.extend(labels[i] for i in accepted)
+        return results
+
+    def save(self) -> bool:
+        if self.archive_path is None:
+            return False
+        try:
+            self.archive_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                # np.savez appends .npz unless the name already ends with it
+                tmp_path = self.archive_path.with_name(self.archive_path.stem + ".tmp.npz")
+                np.savez(
+                    tmp_path,
+                    method=np.array(self.method),
+                    hashes=self._hashes,
+                    labels=np.array(self._labels, dtype=str)
+                )
+                tmp_path.replace(self.archive_path)
+            return True
+        except Exception as e:
+            self.logger.error(f"Error saving hash archive: {str(e)}")
+            return False
@@ -0,0 +1,170 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from metrics import metrics
+
+# Marks the end of the stream on a stage's input queue
+_DONE = object()
+
+# Returned by a stage function to drop an item on purpose (e.g. a rejected
+# near duplicate), so it is counted as skipped rather than failed
+SKIP = object()
+
+
+class Stage:
+    """A single step of the mint pipeline backed by its own worker pool"""
+
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+                 workers: int = 1, queue_size: int = 4):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        # Bounded input queue: a full queue blocks the upstream stage
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.stats = {
+            "processed": 0,
+            "failed": 0,
+            "skipped": 0,
+            "busy_seconds": 0.0,
+            "blocked_seconds": 0.0
+        }
+        self._lock = threading.Lock()
+
+    def record(self, key: str, value=1) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+
+class MintPipeline:
+    """
+    Run items through a chain of stages connected by bounded queues
+
+    Items are plain dicts. Each stage function receives an item and returns
+    it (possibly updated) to pass it on, None to drop it as failed, or SKIP
+    to drop it on purpose. Because every
+    queue is bounded, a slow stage (e.g. minting) throttles the stages
+    before it instead of letting finished images pile up in memory.
+    """
+
+    def __init__(self, stages: List[Stage], source_name: str = "generate"):
+        self.logger = logging.getLogger(__name__)
+        self.stages = stages
+        self.source_name = source_name
+        self.source_stats = {"produced": 0, "busy_seconds": 0.0, "blocked_seconds": 0.0}
+        self.results: List[Dict[str, Any]] = []
+        self._results_lock = threading.Lock()
+
+    def _put(self, target: Optional[Stage], item: Any, stats: Dict[str, Any], lock=None) -> None:
+        """Hand an item downstream, accounting time spent waiting for space"""
+        if target is None:
+            if item is not _DONE:
+                with self._results_lock:
+                    self.results.append(item)
+            return
+        start = time.perf_counter()
+        target.queue.put(item)
+        waited = time.perf_counter() - start
+        if lock is not None:
+            with lock:
+                stats["blocked_seconds"] += waited
+        else:
+            stats["blocked_seconds"] += waited
+
+    def _feed(self, source: Iterable[Dict[str, Any]]) -> None:
+        """Pull items from the source (the generation stage) into the first queue"""
+        first = self.stages[0] if self.stages else None
+        iterator = iter(source)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    self.logger.error(f"Error in {self.source_name} stage: {str(e)}")
+                    break
+                self.source_stats["busy_seconds"] += time.perf_counter() - start
+                self.source_stats["produced"] += 1
+                self._put(first, item, self.source_stats)
+        finally:
+            if first is not None:
+                for _ in range(first.workers):
+                    first.queue.put(_DONE)
+
+    def _work(self, index: int, finished: List[int], finished_lock: threading.Lock) -> None:
+        stage = self.stages[index]
+        target = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                break
+            start = time.perf_counter()
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                self.logger.error(f"Error in {stage.name} stage: {str(e)}")
+                result = None
+            stage.record("busy_seconds", time.perf_counter() - start)
+            if result is SKIP:
+                stage.record("skipped")
+                metrics.skip(stage.name)
+                continue
+            if result is None:
+                stage.record("failed")
+                metrics.failure(stage.name)
+                continue
+            stage.record("processed")
+            self._put(target, result, stage.stats, stage._lock)
+
+        # The last worker of a stage to finish closes the next stage
+        with finished_lock:
+            finished[index] += 1
+            last = finished[index] == stage.workers
+        if last and target is not None:
+            for _ in range(target.workers):
+                target.queue.put(_DONE)
+
+    def run(self, source: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run the pipeline to completion and return the items that made it through"""
+        self.results = []
+        finished = [0] * len(self.stages)
+        finished_lock = threading.Lock()
+
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(index, finished, finished_lock),
+                    name=f"{stage.name}-{n}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        # Generation runs on the calling thread so the model stays on it
+        self._feed(source)
+        for thread in threads:
+            thread.join()
+
+        self.log_stats()
+        return self.results
+
+    def log_stats(self) -> None:
+        self.logger.info(
+            f"Stage {self.source_name}: produced={self.source_stats['produced']} "
+            f"busy={self.source_stats['busy_seconds']:.2f}s "
+            f"blocked={self.source_stats['blocked_seconds']:.2f}s"
+        )
+        for stage in self.stages:
+            self.logger.info(
+                f"Stage {stage.name}: processed={stage.stats['processed']} "
+                f"failed={stage.stats['failed']} "
+                f"skipped={stage.stats['skipped']} "
+                f"busy={stage.stats['busy_seconds']:.2f}s "
+                f"blocked={stage.stats['blocked_seconds']:.2f}s"
+            )
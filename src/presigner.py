@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from web3 import Web3
+
+from blockchain_interface import encode_call
+from job_ledger import JobLedger
+
+logger = logging.getLogger(__name__)
+
+def _sign_chunk(contract_address: str, contract_abi: list, private_key: str, recipient: str,
+                params: Dict[str, Any], start_nonce: int, token_uris: List[str]) -> List[Dict[str, Any]]:
+    """Sign mintNFT transactions for consecutive nonces; runs in a worker process"""
+    w3 = Web3()
+    contract = w3.eth.contract(address=contract_address, abi=contract_abi)
+    signed = []
+    for offset, token_uri in enumerate(token_uris):
+        transaction = {
+            'chainId': params["chain_id"],
+            'to': contract.address,
+            'value': 0,
+            'data': encode_call(contract, 'mintNFT', [recipient, token_uri]),
+            'gas': params["gas"],
+            'nonce': start_nonce + offset,
+            **params["fees"]
+        }
+        signed_txn = w3.eth.account.sign_transaction(transaction, private_key=private_key)
+        signed.append({
+            "nonce": start_nonce + offset,
+            "token_uri": token_uri,
+            "tx_hash": signed_txn.hash.hex(),
+            "raw_transaction": signed_txn.rawTransaction.hex()
+        })
+    return signed
+
+def resolve_signing_params(
+    presign_config: Dict[str, Any],
+    wallet_address: str,
+    token_uris: List[str],
+    blockchain=None
+) -> Optional[Dict[str, Any]]:
+    """
+    Chain id, first nonce, gas limit and fee caps for a presigned run
+
+    Values set in the presign config are used as-is, which allows
+    signing on a machine without network access. Anything left unset is
+    looked up through a BlockchainInterface: the pending nonce, the fee
+    oracle's caps and a gas estimate for the longest token URI.
+    """
+    params = {
+        "chain_id": presign_config.get("chain_id"),
+        "start_nonce": presign_config.get("start_nonce"),
+        "gas": presign_config.get("gas_limit"),
+        "fees": None
+    }
+    if presign_config.get("max_fee_per_gas") is not None:
+        params["fees"] = {
+            'maxFeePerGas': presign_config["max_fee_per_gas"],
+            'maxPriorityFeePerGas': presign_config.get("max_priority_fee_per_gas", 0)
+        }
+
+    missing = [key for key, value in params.items() if value is None]
+    if not missing:
+        return params
+    if blockchain is None:
+        logger.error(f"Offline presigning needs {', '.join(missing)} in the presign config")
+        return None
+
+    if params["chain_id"] is None:
+        params["chain_id"] = blockchain.chain_id
+    if params["start_nonce"] is None:
+        params["start_nonce"] = blockchain.w3.eth.get_transaction_count(wallet_address, 'pending')
+    if params["gas"] is None:
+        # Longer URIs cost more to store, so the longest one bounds them all
+        longest = max(token_uris, key=len)
+        params["gas"] = blockchain.gas_limit('mintNFT', [wallet_address, longest], wallet_address)
+    if params["fees"] is None:
+        params["fees"] = blockchain.fee_oracle.fees()
+    return params
+
+def presign_mints(
+    contract_address: str,
+    contract_abi: list,
+    wallet_address: str,
+    private_key: str,
+    token_uris: List[str],
+    params: Dict[str, Any],
+    processes: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Sign one mintNFT transaction per token URI across worker processes
+
+    Token i gets nonce start_nonce + i, so the signed set can only be
+    mined in full and in order. No network access is needed.
+    """
+    processes = max(1, processes or os.cpu_count() or 1)
+    chunk_size = max(1, -(-len(token_uris) // processes))
+    chunks = [
+        (start, token_uris[start:start + chunk_size])
+        for start in range(0, len(token_uris), chunk_size)
+    ]
+    with ProcessPoolExecutor(max_workers=min(processes, len(chunks) or 1)) as executor:
+        futures = [
+            executor.submit(
+                _sign_chunk,
+                contract_address,
+                contract_abi,
+                private_key,
+                wallet_address,
+                params,
+                params["start_nonce"] + start,
+                chunk
+            )
+            for start, chunk in chunks
+        ]
+        return [entry for future in futures for entry in future.result()]
+
+def save_signed(path: str, wallet_address: str, contract_address: str,
+                params: Dict[str, Any], transactions: List[Dict[str, Any]],
+                job_ledger: Optional[JobLedger] = None) -> bool:
+    """
+    Write a presigned run to a JSON file
+
+    With a job_ledger, the file names the ledger and run it belongs to,
+    so broadcasting it can mark the tokens confirmed.
+    """
+    try:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        signed = {
+            "from": wallet_address,
+            "contract_address": contract_address,
+            "chain_id": params["chain_id"],
+            "gas": params["gas"],
+            "fees": params["fees"],
+            "transactions": transactions
+        }
+        if job_ledger is not None:
+            signed["ledger"] = {"path": str(Path(job_ledger.db_path).resolve()), "run_id": job_ledger.run_id}
+        with open(path, 'w') as f:
+            json.dump(signed, f, indent=2)
+        logger.info(f"Wrote {len(transactions)} signed transactions to {path}")
+        return True
+    except Exception as e:
+        logger.error(f"Error writing signed transactions: {str(e)}")
+        return False
+
+def load_signed(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Error loading signed transactions: {str(e)}")
+        return None
+
+def broadcast_signed_file(blockchain, path: str, timeout: float = 600) -> List[Any]:
+    """
+    Push every transaction in a presigned file and wait for the receipts
+
+    Returns the receipts in nonce order, with None for transactions that
+    were not mined or reverted. Files signed from a run update that run's
+    job ledger: mined tokens are marked confirmed, reverted ones go back
+    to metadata_pinned so a rerun mints them again.
+    """
+    signed = load_signed(path)
+    if signed is None:
+        return []
+    job_ledger = None
+    if signed.get("ledger"):
+        job_ledger = JobLedger(signed["ledger"]["path"], signed["ledger"]["run_id"])
+    transactions = sorted(signed["transactions"], key=lambda entry: entry["nonce"])
+    futures = blockchain.broadcast_signed(
+        [(entry["raw_transaction"], entry["tx_hash"]) for entry in transactions]
+    )
+    receipts = []
+    try:
+        for entry, future in zip(transactions, futures):
+            token_index = entry.get("token_index")
+            try:
+                receipt = future.result(timeout)
+            except Exception as e:
+                logger.error(f"Transaction for {entry['token_uri']} (nonce {entry['nonce']}) failed: {str(e)}")
+                receipts.append(None)
+                continue
+            if not blockchain.succeeded(receipt):
+                logger.error(f"Transaction for {entry['token_uri']} (nonce {entry['nonce']}) reverted")
+                if job_ledger is not None and token_index is not None:
+                    job_ledger.update(token_index, "metadata_pinned", tx_hash=None, error="mint transaction reverted")
+                receipts.append(None)
+                continue
+            if job_ledger is not None and token_index is not None:
+                job_ledger.update(token_index, "confirmed", error=None)
+            receipts.append(receipt)
+    finally:
+        if job_ledger is not None:
+            job_ledger.close()
+    return receipts
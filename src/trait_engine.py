@@ -0,0 +1,129 @@
+import logging
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+class TraitEngine:
+    """
+    Draw weighted trait combinations for a whole collection at once
+
+    Trait tables come from the ``traits`` list in art_config.json:
+
+        [{"name": "Background",
+          "values": [{"value": "Neon Night", "weight": 5,
+                      "prompt": "neon-lit night sky", "max_count": 100}, ...]},
+         ...]
+
+    All N tokens are drawn per trait with one weighted NumPy choice.
+    Duplicate combinations (rows of the index matrix) and values over
+    their max_count are found with array operations and only those
+    tokens are redrawn. Rarity scores are the sum over traits of
+    1 / value frequency, computed for the whole collection as arrays. The same seed always gives the same draw, so a
+    resumed run gets the same traits.
+    """
+
+    def __init__(self, trait_tables: List[Dict[str, Any]], seed: Optional[int] = None,
+                 unique: bool = True, max_rounds: int = 100):
+        self.logger = logging.getLogger(__name__)
+        if not trait_tables:
+            raise ValueError("At least one trait table is required")
+        self.names = [table["name"] for table in trait_tables]
+        self.values = [[entry["value"] for entry in table["values"]] for table in trait_tables]
+        self.prompts = [[entry.get("prompt", "") for entry in table["values"]] for table in trait_tables]
+        self.weights = [
+            np.array([entry.get("weight", 1.0) for entry in table["values"]], dtype=np.float64)
+            for table in trait_tables
+        ]
+        self.caps = [
+            np.array([
+                entry["max_count"] if entry.get("max_count") is not None else np.iinfo(np.int64).max
+                for entry in table["values"]
+            ], dtype=np.int64)
+            for table in trait_tables
+        ]
+        self.sizes = [len(values) for values in self.values]
+        self.seed = seed
+        self.unique = unique
+        self.max_rounds = max_rounds
+
+    def _draw_column(self, rng, trait, count, taken):
+        """Draw count values of one trait, only from values with capacity left"""
+        weights = np.where(self.caps[trait] > taken, self.weights[trait], 0.0)
+        if weights.sum() <= 0:
+            raise ValueError(f"Trait '{self.names[trait]}' has no capacity left")
+        return rng.choice(self.sizes[trait], size=count, p=weights / weights.sum())
+
+    def _over_cap(self, column, trait):
+        """Mask of tokens whose value is past its max_count (later tokens lose)"""
+        order = np.argsort(column, kind='stable')
+        sorted_values = column[order]
+        # Running position of each token within its value group
+        starts = np.searchsorted(sorted_values, sorted_values, side='left')
+        rank = np.arange(len(column)) - starts
+        mask = np.zeros(len(column), dtype=bool)
+        mask[order] = rank >= self.caps[trait][sorted_values]
+        return mask
+
+    def draw(self, count: int) -> np.ndarray:
+        """
+        Trait value indices for count tokens, shape (count, traits)
+
+        Raises ValueError if the caps or the number of distinct
+        combinations cannot cover count tokens.
+        """
+        for trait, caps in enumerate(self.caps):
+            if np.minimum(caps, count).sum() < count:
+                raise ValueError(f"max_count of trait '{self.names[trait]}' allows fewer than {count} tokens")
+        if self.unique and np.prod(self.sizes, dtype=np.float64) < count:
+            raise ValueError(f"Only {int(np.prod(self.sizes))} distinct trait combinations for {count} tokens")
+
+        rng = np.random.default_rng(self.seed)
+        indices = np.empty((count, len(self.sizes)), dtype=np.int64)
+        redraw = np.ones(count, dtype=bool)
+        for _ in range(self.max_rounds):
+            rows = np.flatnonzero(redraw)
+            for trait in range(len(self.sizes)):
+                taken = np.bincount(indices[~redraw, trait], minlength=self.sizes[trait])
+                indices[rows, trait] = self._draw_column(rng, trait, len(rows), taken)
+
+            redraw = np.zeros(count, dtype=bool)
+            for trait in range(len(self.sizes)):
+                redraw |= self._over_cap(indices[:, trait], trait)
+            if self.unique:
+                # Keep the first token of each combination, redraw the rest.
+                # Rows are compared whole: packing them into one integer
+                # overflows int64 for large trait spaces
+                _, first = np.unique(indices, axis=0, return_index=True)
+                duplicate = np.ones(count, dtype=bool)
+                duplicate[first] = False
+                redraw |= duplicate
+            if not redraw.any():
+                return indices
+        raise ValueError(f"Could not satisfy trait caps and uniqueness in {self.max_rounds} rounds")
+
+    def rarity(self, indices: np.ndarray) -> Dict[str, np.ndarray]:
+        """Rarity score per token (higher is rarer) and rank (1 is rarest)"""
+        count = len(indices)
+        scores = np.zeros(count, dtype=np.float64)
+        for trait in range(len(self.sizes)):
+            frequency = np.bincount(indices[:, trait], minlength=self.sizes[trait]) / count
+            scores += 1.0 / frequency[indices[:, trait]]
+        ranks = np.empty(count, dtype=np.int64)
+        ranks[np.argsort(-scores, kind='stable')] = np.arange(1, count + 1)
+        return {"scores": scores, "ranks": ranks}
+
+    def attributes(self, indices: np.ndarray, rarity: Optional[Dict[str, np.ndarray]] = None) -> List[list]:
+        """Metadata attribute lists, one per token"""
+        columns = [np.array(values, dtype=object)[indices[:, trait]] for trait, values in enumerate(self.values)]
+        attribute_lists = [
+            [{"trait_type": name, "value": value} for name, value in zip(self.names, row)]
+            for row in zip(*columns)
+        ]
+        if rarity is not None:
+            for attribute_list, rank in zip(attribute_lists, rarity["ranks"].tolist()):
+                attribute_list.append({"display_type": "number", "trait_type": "Rarity Rank", "value": rank})
+        return attribute_lists
+
+    def prompt_fragments(self, indices: np.ndarray) -> List[str]:
+        """Comma-joined prompt text of each token's traits, for PromptHelper.enhance_prompt"""
+        columns = [np.array(prompts, dtype=object)[indices[:, trait]] for trait, prompts in enumerate(self.prompts)]
+        return [", ".join(fragment for fragment in row if fragment) for row in zip(*columns)]
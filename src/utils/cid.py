@@ -0,0 +1,80 @@
+import base64
+import hashlib
+from typing import BinaryIO, List, Tuple
+
+# Defaults used by kubo (and Pinata) for CIDv1 file imports:
+# 256 KiB fixed-size chunks, raw leaves, balanced DAG of up to 174 links
+CHUNK_SIZE = 262144
+MAX_LINKS = 174
+
+RAW_CODEC = 0x55
+DAG_PB_CODEC = 0x70
+SHA2_256 = 0x12
+UNIXFS_FILE = 2
+
+def _varint(value: int) -> bytes:
+    """Encode an unsigned integer as a protobuf/multiformats varint"""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def _field(number: int, payload: bytes) -> bytes:
+    """Length-delimited protobuf field"""
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+def _cid_bytes(codec: int, data: bytes) -> bytes:
+    digest = hashlib.sha256(data).digest()
+    return b"\x01" + _varint(codec) + bytes([SHA2_256, len(digest)]) + digest
+
+def cid_to_string(cid: bytes) -> str:
+    """Multibase base32 (lowercase, unpadded) form, e.g. bafy..."""
+    return "b" + base64.b32encode(cid).decode().lower().rstrip("=")
+
+def _parent_node(children: List[Tuple[bytes, int, int]]) -> Tuple[bytes, int, int]:
+    """
+    Build a dag-pb UnixFS file node over (cid, tsize, filesize) children
+
+    Returns the same triple for the new node.
+    """
+    filesize = sum(child[2] for child in children)
+    unixfs = _varint(1 << 3) + _varint(UNIXFS_FILE) + _varint(3 << 3) + _varint(filesize)
+    for child in children:
+        unixfs += _varint(4 << 3) + _varint(child[2])
+
+    # dag-pb canonical form: Links (field 2) before Data (field 1)
+    node = b""
+    for cid, tsize, _ in children:
+        link = _field(1, cid) + _field(2, b"") + _varint(3 << 3) + _varint(tsize)
+        node += _field(2, link)
+    node += _field(1, unixfs)
+
+    tsize = len(node) + sum(child[1] for child in children)
+    return _cid_bytes(DAG_PB_CODEC, node), tsize, filesize
+
+def compute_cid_v1(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Compute the CIDv1 IPFS would assign to a file, without uploading it
+
+    The stream is read one chunk at a time; only the leaf CIDs are kept
+    in memory.
+    """
+    leaves = []
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        leaves.append((_cid_bytes(RAW_CODEC, chunk), len(chunk), len(chunk)))
+
+    if not leaves:
+        return cid_to_string(_cid_bytes(RAW_CODEC, b""))
+
+    level = leaves
+    while len(level) > 1:
+        level = [
+            _parent_node(level[start:start + MAX_LINKS])
+            for start in range(0, len(level), MAX_LINKS)
+        ]
+    return cid_to_string(level[0][0])
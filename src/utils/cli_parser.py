@@ -1,72 +1,181 @@
 import argparse
-from typing import Dict, Any
+import sys
+from typing import Dict, Any, List, Optional
 
-def parse_arguments() -> Dict[str, Any]:
-    parser = argparse.ArgumentParser(description='AI NFT Generator')
-    
+COMMANDS = ('setup-config', 'generate', 'pin', 'mint', 'run', 'serve', 'broadcast')
+
+def _add_common_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        '--metrics',
+        type=str,
+        metavar='PATH',
+        help='Record per-stage latencies, retries and failures and write them to PATH at the end of the run '
+             '(a JSON summary for .json paths, Prometheus text otherwise)'
+    )
+
+def _add_generation_arguments(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
         '--prompt',
         type=str,
         help='Text prompt for generating artwork'
     )
-    
+
     parser.add_argument(
         '--variations',
         type=int,
         default=1,
         help='Number of variations to generate (default: 1)'
     )
-    
+
     parser.add_argument(
         '--width',
         type=int,
         default=512,
         help='Width of generated image (default: 512)'
     )
-    
+
     parser.add_argument(
         '--height',
         type=int,
         default=512,
         help='Height of generated image (default: 512)'
     )
-    
+
     parser.add_argument(
         '--steps',
         type=int,
         default=50,
         help='Number of inference steps (default: 50)'
     )
-    
+
     parser.add_argument(
         '--guidance-scale',
         type=float,
         default=7.5,
         help='Guidance scale for generation (default: 7.5)'
     )
-    
+
     parser.add_argument(
         '--seed',
         type=int,
         help='Random seed for reproducibility'
     )
-    
+
     parser.add_argument(
         '--negative-prompt',
         type=str,
         help='Negative prompt to avoid certain features'
     )
-    
+
+    parser.add_argument(
+        '--preview',
+        type=int,
+        metavar='N',
+        help='Generate N cheap preview candidates into output/previews for curation, then exit'
+    )
+
+    parser.add_argument(
+        '--seeds',
+        type=lambda value: [int(seed) for seed in value.split(',')],
+        help='Comma-separated curated seeds to render at full quality, e.g. 43,57,61'
+    )
+
+    parser.add_argument(
+        '--server-url',
+        type=str,
+        help='Submit generation jobs to a running model server, e.g. http://127.0.0.1:7860'
+    )
+
+def _add_server_port(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
+        '--server-port',
+        type=int,
+        default=7860,
+        help='Port for serve (default: 7860)'
+    )
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='AI NFT Generator',
+        epilog='Without a command, "run" is assumed.'
+    )
+    commands = parser.add_subparsers(dest='command', metavar='command')
+
+    setup_config = commands.add_parser('setup-config', help='Create default configuration files')
+    _add_common_arguments(setup_config)
+
+    generate = commands.add_parser('generate', help='Generate images into a new output directory without pinning or minting')
+    _add_generation_arguments(generate)
+    _add_common_arguments(generate)
+
+    pin = commands.add_parser('pin', help='Pin files or directories to IPFS and print their URIs')
+    pin.add_argument(
+        'paths',
+        nargs='+',
+        help='Files are pinned one by one, directories as one IPFS directory'
+    )
+    _add_common_arguments(pin)
+
+    mint = commands.add_parser('mint', help='Mint NFTs for token URIs that are already pinned')
+    mint.add_argument(
+        'token_uris',
+        nargs='*',
+        help='Token URIs, e.g. ipfs://<CID>'
+    )
+    mint.add_argument(
+        '--uris-file',
+        type=str,
+        metavar='PATH',
+        help='Read token URIs from PATH, one per line'
+    )
+    _add_common_arguments(mint)
+
+    run = commands.add_parser('run', help='Generate, pin and mint a collection (the default)')
+    _add_generation_arguments(run)
+    run.add_argument(
         '--dry-run',
         action='store_true',
         help='Generate images without minting NFTs'
     )
-    
-    parser.add_argument(
-        '--setup-config',
+
+    run.add_argument(
+        '--collection-mode',
         action='store_true',
-        help='Create default configuration files'
+        help='Pin images and metadata as two IPFS directories and mint ipfs://<dirCID>/<n>.json token URIs'
+    )
+
+    run.add_argument(
+        '--presign',
+        type=str,
+        metavar='PATH',
+        help='Pin as usual, then sign the mint transactions into PATH instead of sending them '
+             '(with --dry-run, signs fully offline from the presign config)'
     )
-    
-    return vars(parser.parse_args()) 
\ No newline at end of file
+    _add_common_arguments(run)
+
+    # Flags from before the subcommands; main() maps them onto the
+    # setup-config, serve and broadcast commands
+    run.add_argument('--setup-config', action='store_true', help=argparse.SUPPRESS)
+    run.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    run.add_argument('--broadcast', type=str, help=argparse.SUPPRESS)
+    _add_server_port(run)
+
+    serve = commands.add_parser('serve', help='Load the model once and serve generation jobs on localhost')
+    _add_server_port(serve)
+    _add_common_arguments(serve)
+
+    broadcast = commands.add_parser('broadcast', help='Send presigned mint transactions and wait for them to be mined')
+    broadcast.add_argument(
+        'path',
+        help='File written by run --presign'
+    )
+    _add_common_arguments(broadcast)
+
+    return parser
+
+def parse_arguments(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # Without a command, run is assumed
+    if not (argv and (argv[0] in COMMANDS or argv[0] in ('-h', '--help'))):
+        argv = ['run'] + argv
+    return vars(build_parser().parse_args(argv))
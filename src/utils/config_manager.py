@@ -41,12 +41,24 @@ class ConfigManager:
                 }
             ],
             "wallet_address": "0xYourWalletAddress",
-            "private_key": "your-private-key"
+            "private_key": "your-private-key",
+            "fee_cache_ttl": 12.0,
+            "rpc_backend": "sync",
+            "presign": {
+                "chain_id": None,
+                "start_nonce": None,
+                "gas_limit": None,
+                "max_fee_per_gas": None,
+                "max_priority_fee_per_gas": None,
+                "processes": None
+            }
         }
         
         self.default_ipfs_config = {
             "pinata_api_key": "your-pinata-api-key",
-            "pinata_secret_key": "your-pinata-secret-key"
+            "pinata_secret_key": "your-pinata-secret-key",
+            "max_concurrency": 8,
+            "max_retries": 5
         }
         
         self.default_art_config = {
@@ -59,7 +71,43 @@ class ConfigManager:
                 "negative_prompt": "blurry, low quality, distorted"
             },
             "output_format": "png",
-            "batch_size": 4
+            "encode_options": {},
+            "memory": {
+                "dtype": None,
+                "attention_slicing": False,
+                "sequential_offload": False,
+                "vae_tiling": False
+            },
+            "save_local_copy": True,
+            "traits": [],
+            "dedup": {
+                "enabled": True,
+                "method": "dhash",
+                "max_distance": 4,
+                "mode": "flag",
+                "archive_path": "output/phash_archive.npz"
+            },
+            "batch_size": 4,
+            "workers": {
+                "count": 1,
+                "devices": ["cpu"],
+                "threads_per_worker": None,
+                "share_weights": False
+            },
+            "prompt_cache": {
+                "max_entries": 128,
+                "cache_dir": "output/prompt_cache"
+            },
+            "result_cache": {
+                "cache_dir": "output/generation_cache",
+                "max_bytes": 2147483648
+            },
+            "preview": {
+                "scale": 1.0,
+                "num_inference_steps": 15,
+                "final_mode": "rerender",
+                "strength": 0.5
+            }
         }
     
     def create_default_configs(self) -> None:
@@ -95,6 +143,13 @@ class ConfigManager:
             return None
         configs["blockchain"] = blockchain_config
         
+        # contract_abi may point at an ABI file such as contracts/nft_contract_abi.json
+        if isinstance(blockchain_config["contract_abi"], str):
+            contract_abi = self.load_contract_abi(blockchain_config["contract_abi"])
+            if contract_abi is None:
+                return None
+            blockchain_config["contract_abi"] = contract_abi
+        
         # Load IPFS config
         ipfs_config = self.validator.load_and_validate_config(
             str(self.config_dir / "ipfs_config.json"),
@@ -114,6 +169,25 @@ class ConfigManager:
         
         return configs
     
+    def load_contract_abi(self, abi_path: str) -> Optional[list]:
+        """Load a contract ABI file, relative to the config directory"""
+        abi_file = Path(abi_path)
+        if not abi_file.is_absolute():
+            abi_file = self.config_dir / abi_file
+        try:
+            with abi_file.open('r') as f:
+                abi = json.load(f)
+            # Accept both a bare ABI list and an artifact with an "abi" key
+            if isinstance(abi, dict):
+                abi = abi.get("abi")
+            if not isinstance(abi, list):
+                self.logger.error(f"No ABI found in {abi_file}")
+                return None
+            return abi
+        except Exception as e:
+            self.logger.error(f"Error loading contract ABI: {str(e)}")
+            return None
+    
     def update_config(self, config_type: str, updates: Dict[str, Any]) -> bool:
         """Update specific configuration file"""
         config_file = self.config_dir / f"{config_type}_config.json"
@@ -5,6 +5,7 @@ from typing import Optional
 import logging
 from datetime import datetime
 import json
+from .cid import compute_cid_v1
 
 class NFTUtils:
     def __init__(self):
@@ -66,10 +67,20 @@ class NFTUtils:
             logging.error(f"Error calculating file hash: {str(e)}")
             return None
 
+    @staticmethod
+    def get_file_cid(file_path: Path) -> Optional[str]:
+        """Calculate the IPFS CIDv1 of a file without uploading it"""
+        try:
+            with Path(file_path).open("rb") as f:
+                return compute_cid_v1(f)
+        except Exception as e:
+            logging.error(f"Error calculating file CID: {str(e)}")
+            return None
+
 class PromptHelper:
     @staticmethod
-    def enhance_prompt(prompt: str, style: Optional[str] = None) -> str:
-        """Enhance prompt with additional style information"""
+    def enhance_prompt(prompt: str, style: Optional[str] = None, details: Optional[str] = None) -> str:
+        """Enhance prompt with additional style information and per-token trait details"""
         style_templates = {
             "realistic": "ultra realistic, highly detailed, 8k resolution, professional photography",
             "anime": "anime style, cel shaded, vibrant colors, detailed illustration",
@@ -77,6 +88,8 @@ class PromptHelper:
             "digital": "digital art, clean lines, modern design, professional illustration"
         }
         
+        if details:
+            prompt = f"{prompt}, {details}"
         if style and style in style_templates:
             return f"{prompt}, {style_templates[style]}"
         return prompt
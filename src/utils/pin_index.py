@@ -0,0 +1,52 @@
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+class PinIndex:
+    """
+    Persistent map from locally computed content ids to pinned CIDs
+
+    Keys are the CIDv1 computed locally for files, or a sha256 of the
+    canonical JSON for metadata. Values are the CIDs Pinata reported,
+    which normally equal the key for files.
+    """
+
+    def __init__(self, db_path: str = "output/pin_index.sqlite3"):
+        self.logger = logging.getLogger(__name__)
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pins ("
+                "content_id TEXT PRIMARY KEY, "
+                "pinned_cid TEXT NOT NULL, "
+                "size INTEGER, "
+                "pinned_at TEXT)"
+            )
+
+    def get(self, content_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pinned_cid FROM pins WHERE content_id = ?",
+                (content_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def add(self, content_id: str, pinned_cid: str, size: Optional[int] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pins VALUES (?, ?, ?, ?)",
+                (content_id, pinned_cid, size, datetime.now().isoformat())
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pins").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,255 @@
+import logging
+import queue
+import torch
+import torch.multiprocessing as mp
+from art_generator import AIArtGenerator
+from image_encoder import ImageEncoder
+
+def _worker_main(worker_id, model_path, device, num_threads, batch_size, model, generator_kwargs,
+                 tasks, results, running, current_call):
+    """
+    Entry point of a generation worker process
+
+    running[2 * worker_id:2 * worker_id + 2] holds the (call id, task id)
+    the worker took last, written to shared memory before the work starts
+    so the parent can tell which task a crashed worker took with it.
+    Tasks of an abandoned call (not current_call) are skipped.
+    """
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    try:
+        generator = AIArtGenerator(
+            model_path,
+            device=device,
+            batch_size=batch_size,
+            model=model,
+            **generator_kwargs
+        )
+    except Exception as e:
+        results.put((None, None, worker_id, None, f"Worker {worker_id} failed to load model: {str(e)}"))
+        return
+    results.put((None, None, worker_id, [], None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        call_id, task_id, prompt, seeds, style_params, previews = task
+        if call_id != current_call.value:
+            continue
+        with running.get_lock():
+            running[2 * worker_id] = call_id
+            running[2 * worker_id + 1] = task_id
+        try:
+            images = [
+                (i, image)
+                for i, _, image in generator.iter_batch(prompt, seeds, style_params, previews)
+            ]
+            results.put((call_id, task_id, worker_id, images, None))
+        except Exception as e:
+            results.put((call_id, task_id, worker_id, None, str(e)))
+
+class ArtWorkerPool:
+    """
+    Spread generation over several processes, each with its own model
+
+    Seeds are cut into tasks of ``batch_size`` and handed to whichever
+    worker is free. Noise is drawn per seed on the CPU, so an image only
+    depends on its seed, not on which worker or batch rendered it.
+    Workers are assigned devices round-robin from ``devices`` and limited
+    to ``threads_per_worker`` torch threads each. With ``share_weights``
+    (CPU only) the model is loaded once and its tensors are placed in
+    shared memory instead of being copied into every worker.
+
+    Extra AIArtGenerator arguments go in ``generator_kwargs``. The pool
+    exposes the same interface as AIArtGenerator.
+    """
+
+    def __init__(self, model_path, num_workers=2, devices=None, threads_per_worker=None,
+                 batch_size=1, share_weights=False, generator_kwargs=None):
+        self.logger = logging.getLogger(__name__)
+        self.num_workers = max(1, num_workers)
+        self.worker_batch_size = max(1, int(batch_size or 1))
+        devices = devices or ['cpu']
+        generator_kwargs = generator_kwargs or {}
+        # Workers return raw images; encoding happens in this process
+        self.encoder = ImageEncoder(
+            generator_kwargs.get("output_format", "png"),
+            generator_kwargs.get("encode_options")
+        )
+
+        # Loaded once in this process and only used for shared weights,
+        # seed scheduling and saving
+        self.local = None
+        model = None
+        if share_weights:
+            # Same memory options as the workers, so they get the weights
+            # in the dtype they run in and never convert (and copy) them
+            self.local = AIArtGenerator(
+                model_path,
+                device='cpu',
+                batch_size=self.worker_batch_size,
+                **generator_kwargs
+            )
+            if hasattr(self.local.model, 'share_memory'):
+                self.local.model.share_memory()
+                model = self.local.model
+            else:
+                self.logger.warning("Model cannot be placed in shared memory, each worker loads its own copy")
+
+        context = mp.get_context('spawn')
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        # (call id, task id) each worker took last, -1 before its first
+        self._running = context.Array('q', [-1] * (2 * self.num_workers))
+        self._current_call = context.Value('q', 0)
+        self._workers = []
+        for worker_id in range(self.num_workers):
+            process = context.Process(
+                target=_worker_main,
+                args=(
+                    worker_id,
+                    model_path,
+                    devices[worker_id % len(devices)],
+                    threads_per_worker,
+                    self.worker_batch_size,
+                    model,
+                    generator_kwargs,
+                    self._tasks,
+                    self._results,
+                    self._running,
+                    self._current_call
+                ),
+                daemon=True
+            )
+            process.start()
+            self._workers.append(process)
+
+        # Wait until every worker has its model loaded
+        for _ in range(self.num_workers):
+            _, _, worker_id, _, error = self._results.get()
+            if error:
+                self.close()
+                raise RuntimeError(error)
+        self.logger.info(f"Started {self.num_workers} generation workers on {devices}")
+
+    @property
+    def batch_size(self):
+        """Images per call that keep every worker busy"""
+        return self.worker_batch_size * self.num_workers
+
+    def iter_batch(self, prompt, seeds, style_params=None, previews=None):
+        """
+        Stream (position, seed, image) as each worker finishes a task
+
+        Positions index into seeds; tasks finish in whatever order the
+        workers complete them. Every call gets its own id, so results left
+        over from an abandoned call are never matched to these seeds. A
+        task whose worker dies (e.g. killed for running out of memory) is
+        reported as failed instead of being waited for forever.
+        """
+        with self._current_call.get_lock():
+            self._current_call.value += 1
+            call_id = self._current_call.value
+        offsets = list(range(0, len(seeds), self.worker_batch_size))
+        for task_id, offset in enumerate(offsets):
+            task_seeds = seeds[offset:offset + self.worker_batch_size]
+            task_prompt = prompt[offset:offset + self.worker_batch_size] if isinstance(prompt, list) else prompt
+            task_previews = {seed: previews[seed] for seed in task_seeds if seed in previews} if previews else None
+            self._tasks.put((call_id, task_id, task_prompt, task_seeds, style_params, task_previews))
+
+        unfinished = set(range(len(offsets)))
+        lost = set()
+        while unfinished:
+            try:
+                result_call, task_id, worker_id, images, error = self._results.get(timeout=1)
+            except queue.Empty:
+                # Fail tasks lost with a dead worker only after a second
+                # quiet wait, in case its last result was still in flight
+                for task_id in lost & unfinished:
+                    self.logger.error(f"Worker running task {task_id} exited, its images are lost")
+                    unfinished.discard(task_id)
+                lost = self._lost_tasks(call_id) & unfinished
+                if self._current_call.value != call_id:
+                    # Workers skip the tasks of a call that was superseded
+                    self.logger.error("A newer call took over the generation workers")
+                    return
+                if unfinished and not any(process.is_alive() for process in self._workers):
+                    self.logger.error("All generation workers exited")
+                    return
+                continue
+            if result_call != call_id or task_id not in unfinished:
+                continue
+            unfinished.discard(task_id)
+            if error:
+                self.logger.error(f"Worker {worker_id} failed on task {task_id}: {error}")
+                continue
+            for i, image in images:
+                position = offsets[task_id] + i
+                yield position, seeds[position], image
+
+    def _lost_tasks(self, call_id):
+        """Tasks of this call that a worker took with it when it exited"""
+        with self._running.get_lock():
+            running = list(self._running)
+        return {
+            running[2 * worker_id + 1]
+            for worker_id, process in enumerate(self._workers)
+            if not process.is_alive() and running[2 * worker_id] == call_id
+        }
+
+    def generate_batch(self, prompt, seeds, style_params=None):
+        """Generate one image per seed across the workers, in seed order"""
+        images = [None] * len(seeds)
+        for i, _, image in self.iter_batch(prompt, seeds, style_params):
+            images[i] = image
+        return [image for image in images if image is not None]
+
+    def render_selected(self, prompt, seeds, style_params=None, previews=None):
+        images = [None] * len(seeds)
+        for i, _, image in self.iter_batch(prompt, seeds, style_params, previews):
+            images[i] = image
+        return [image for image in images if image is not None]
+
+    def iter_variations(self, prompt, num_variations=4, style_params=None):
+        """Stream variations as (index, seed, image) as workers finish them"""
+        seeds = AIArtGenerator.variation_seeds(num_variations, style_params)
+        for i, seed, image in self.iter_batch(prompt, seeds, style_params):
+            yield i + 1, seed, image
+
+    def generate_art(self, prompt, style_params=None):
+        seed = (style_params or {}).get('seed')
+        if seed is None:
+            seed = torch.randint(0, 2**32 - 1, (1,)).item()
+        images = self.generate_batch(prompt, [seed], style_params)
+        return images[0] if images else None
+
+    def generate_variations(self, prompt, num_variations=4, style_params=None):
+        """Generate multiple variations of the same prompt across the workers"""
+        seeds = AIArtGenerator.variation_seeds(num_variations, style_params)
+        return self.generate_batch(prompt, seeds, style_params)
+
+    def save_image(self, image, path):
+        """Save the generated image to a file"""
+        return self.encoder.save(image, path)
+
+    def save_image_async(self, image, path):
+        return self.encoder.save_async(image, path)
+
+    def close(self):
+        self.encoder.close()
+        if self.local is not None:
+            self.local.close()
+        for _ in self._workers:
+            self._tasks.put(None)
+        for process in self._workers:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+# The sources are flat modules under src/, and the stand-ins live in benchmarks/
+sys.path[:0] = [str(ROOT / "src"), str(ROOT)]
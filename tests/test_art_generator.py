@@ -0,0 +1,57 @@
+import numpy as np
+import torch
+
+from art_generator import AIArtGenerator
+from benchmarks.stub_servers import StubDiffusion
+
+STYLE = {'seed': 42, 'height': 64, 'width': 64, 'num_inference_steps': 5}
+
+
+def make_generator(batch_size):
+    return AIArtGenerator(
+        "stub",
+        device=torch.device("cpu"),
+        batch_size=batch_size,
+        model=StubDiffusion(),
+        embedding_cache_size=0
+    )
+
+
+def pixels(image):
+    return np.asarray(image)
+
+
+def test_batched_variations_match_sequential_generation():
+    generator = make_generator(batch_size=4)
+    batched = generator.generate_variations("a cat", num_variations=4, style_params=dict(STYLE))
+
+    sequential = make_generator(batch_size=1)
+    expected = [
+        sequential.generate_art("a cat", dict(STYLE, seed=seed))
+        for seed in AIArtGenerator.variation_seeds(4, STYLE)
+    ]
+
+    assert len(batched) == 4
+    for image, reference in zip(batched, expected):
+        assert np.array_equal(pixels(image), pixels(reference))
+
+
+def test_seed_gives_same_image_in_any_batch_position():
+    generator = make_generator(batch_size=4)
+    first = generator.generate_batch("a cat", [7, 8, 9, 10], dict(STYLE))
+    last = generator.generate_batch("a cat", [10, 9, 8, 7], dict(STYLE))
+
+    assert np.array_equal(pixels(first[0]), pixels(last[3]))
+    assert np.array_equal(pixels(first[3]), pixels(last[0]))
+    assert not np.array_equal(pixels(first[0]), pixels(first[3]))
+
+
+def test_close_waits_for_background_saves(tmp_path):
+    generator = make_generator(batch_size=2)
+    images = generator.generate_variations("a cat", num_variations=4, style_params=dict(STYLE))
+    saves = [generator.save_image_async(image, str(tmp_path / f"{i}.png")) for i, image in enumerate(images)]
+
+    generator.close()
+
+    assert all(save.done() and save.result() for save in saves)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["0.png", "1.png", "2.png", "3.png"]
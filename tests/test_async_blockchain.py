@@ -0,0 +1,70 @@
+import pytest
+
+from async_blockchain import AsyncBlockchainInterface, RPCError
+from utils.config_manager import ConfigManager
+from benchmarks.stub_servers import DEV_ADDRESS, DEV_CONTRACT, DEV_PRIVATE_KEY, StubRPC
+
+
+@pytest.fixture
+def rpc():
+    with StubRPC(latency=0.0, block_time=0.05) as rpc:
+        yield rpc
+
+
+@pytest.fixture
+def blockchain(rpc):
+    abi = ConfigManager().default_blockchain_config["contract_abi"]
+    blockchain = AsyncBlockchainInterface(rpc.url, DEV_CONTRACT, abi, poll_interval=0.02)
+    yield blockchain
+    blockchain.close()
+
+
+def record_broadcasts(blockchain, reject=()):
+    """Log the size of every eth_sendRawTransaction batch, rejecting the given positions overall"""
+    rpc_batch = blockchain._rpc_batch
+    sizes = []
+
+    async def recording_batch(calls):
+        results = await rpc_batch(calls)
+        if calls and calls[0][0] == "eth_sendRawTransaction":
+            offset = sum(sizes)
+            sizes.append(len(calls))
+            results = [
+                RPCError("insufficient funds") if offset + position in reject else result
+                for position, result in enumerate(results)
+            ]
+        return results
+
+    blockchain._rpc_batch = recording_batch
+    return sizes
+
+
+def test_mint_batch_broadcasts_max_batch_size_at_a_time(blockchain):
+    sizes = record_broadcasts(blockchain)
+    uris = [f"ipfs://token-{index}" for index in range(25)]
+
+    receipts = blockchain.mint_batch(DEV_ADDRESS, [DEV_ADDRESS] * 25, uris, DEV_PRIVATE_KEY, max_batch_size=10)
+
+    assert sizes == [10, 10, 5]
+    assert len(receipts) == 25
+    assert all(blockchain.succeeded(receipt) for receipt in receipts)
+
+
+def test_mint_batch_keeps_receipts_of_mints_that_succeeded(blockchain):
+    record_broadcasts(blockchain, reject={1})
+    uris = [f"ipfs://token-{index}" for index in range(4)]
+
+    receipts = blockchain.mint_batch(DEV_ADDRESS, [DEV_ADDRESS] * 4, uris, DEV_PRIVATE_KEY)
+
+    assert receipts[1] is None
+    assert all(blockchain.succeeded(receipts[position]) for position in (0, 2, 3))
+
+
+def test_resume_looks_up_earlier_transactions_in_one_round_trip(blockchain, rpc):
+    mined = blockchain.send_mint(DEV_ADDRESS, "ipfs://mined", DEV_PRIVATE_KEY)
+    mined.result(10)
+    round_trips = blockchain.round_trips
+
+    assert blockchain.succeeded(blockchain.resume_transaction(mined.tx_hash).result(0))
+    assert blockchain.resume_transaction("0x" + "ab" * 32) is None
+    assert blockchain.round_trips == round_trips + 2
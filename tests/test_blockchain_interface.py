@@ -0,0 +1,219 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from blockchain_interface import BlockchainInterface, FeeOracle
+from utils.config_manager import ConfigManager
+from benchmarks.stub_servers import DevChain
+
+
+@pytest.fixture
+def chain():
+    return DevChain()
+
+
+def connect(chain, **kwargs):
+    abi = ConfigManager().default_blockchain_config["contract_abi"]
+    return BlockchainInterface(None, chain.contract_address, abi, provider=chain.provider, **kwargs)
+
+
+def sent_transactions(chain):
+    """Mined transactions from the test account by nonce, contract deployment included"""
+    transactions = {}
+    for number in range(chain.w3.eth.block_number + 1):
+        block = chain.w3.eth.get_block(number, full_transactions=True)
+        transactions.update((tx["nonce"], tx) for tx in block.transactions if tx["from"] == chain.address)
+    return transactions
+
+
+def test_concurrent_mints_get_distinct_nonces(chain):
+    blockchain = connect(chain)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = list(pool.map(
+            lambda index: blockchain.send_mint(chain.address, f"ipfs://token-{index}", chain.private_key),
+            range(24)
+        ))
+
+    receipts = [future.result(10) for future in futures]
+    assert all(BlockchainInterface.succeeded(receipt) for receipt in receipts)
+    assert chain.minted() == 24
+    assert sorted(sent_transactions(chain)) == list(range(25))
+
+
+def test_resyncs_after_a_transaction_sent_by_another_tool(chain):
+    blockchain = connect(chain)
+    blockchain.mint_nft(chain.address, "ipfs://first", chain.private_key, timeout=10)
+    # Another tool uses the same wallet, so the cached nonce is now too low
+    chain.w3.eth.send_transaction({"from": chain.address, "to": chain.address, "value": 0})
+
+    receipt = blockchain.mint_nft(chain.address, "ipfs://second", chain.private_key, timeout=10)
+
+    assert BlockchainInterface.succeeded(receipt)
+    assert chain.minted() == 2
+
+
+def test_already_known_is_not_sent_again(chain):
+    blockchain = connect(chain)
+    send_raw_transaction = blockchain.w3.eth.send_raw_transaction
+
+    def send_then_report_known(raw_transaction):
+        # The node took the transaction but the reply looks like a rejection
+        send_raw_transaction(raw_transaction)
+        raise ValueError({"code": -32000, "message": "already known"})
+
+    blockchain.w3.eth.send_raw_transaction = send_then_report_known
+    receipt = blockchain.mint_nft(chain.address, "ipfs://token", chain.private_key, timeout=10)
+
+    assert BlockchainInterface.succeeded(receipt)
+    assert chain.minted() == 1
+
+
+def test_failed_send_behind_a_later_nonce_fills_the_gap(chain):
+    blockchain = connect(chain)
+    send_raw_transaction = blockchain.w3.eth.send_raw_transaction
+    later = []
+
+    def refuse_first(raw_transaction):
+        blockchain.w3.eth.send_raw_transaction = send_raw_transaction
+        # A second mint allocates and sends the next nonce before this
+        # one is refused, so the nonce cannot simply be handed back
+        later.append(blockchain.send_mint(chain.address, "ipfs://later", chain.private_key))
+        raise ValueError({"code": -32000, "message": "insufficient funds for gas * price + value"})
+
+    blockchain.w3.eth.send_raw_transaction = refuse_first
+    with pytest.raises(ValueError):
+        blockchain.send_mint(chain.address, "ipfs://refused", chain.private_key)
+
+    # The later mint is held back until the gap is filled with a self-transfer
+    assert BlockchainInterface.succeeded(later[0].result(10))
+    assert chain.minted() == 1
+    transactions = sent_transactions(chain)
+    assert sorted(transactions) == [0, 1, 2]
+    assert transactions[1]["to"] == chain.address and transactions[1]["value"] == 0
+
+
+def test_dropped_transaction_is_rebroadcast(chain):
+    blockchain = connect(chain, poll_interval=0.02, drop_timeout=0.2)
+    transaction = blockchain.contract.functions.mintNFT(chain.address, "ipfs://dropped").build_transaction({
+        "from": chain.address,
+        "chainId": blockchain.chain_id,
+        "nonce": chain.w3.eth.get_transaction_count(chain.address),
+        **blockchain.fee_oracle.fees()
+    })
+    signed = chain.w3.eth.account.sign_transaction(transaction, private_key=chain.private_key)
+
+    # Tracked but never seen by the node, as if evicted from its mempool
+    future = blockchain.receipt_tracker.track(signed.hash, raw_transaction=signed.rawTransaction)
+
+    assert BlockchainInterface.succeeded(future.result(10))
+    assert chain.minted() == 1
+
+
+def test_concurrent_mints_share_one_gas_estimate(chain):
+    blockchain = connect(chain)
+    estimate_gas = blockchain.w3.eth.estimate_gas
+    calls = []
+
+    def slow_estimate(*args, **kwargs):
+        calls.append(args)
+        time.sleep(0.2)
+        return estimate_gas(*args, **kwargs)
+
+    blockchain.w3.eth.estimate_gas = slow_estimate
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        limits = list(pool.map(
+            lambda index: blockchain.gas_limit("mintNFT", [chain.address, f"ipfs://token-{index}"], chain.address),
+            range(8)
+        ))
+
+    assert len(calls) == 1
+    assert len(set(limits)) == 1
+    # A longer URI is a different calldata shape
+    blockchain.gas_limit("mintNFT", [chain.address, "ipfs://" + "a-much-longer-token-uri" * 4], chain.address)
+    assert len(calls) == 2
+
+
+def test_failed_gas_estimate_is_not_cached(chain):
+    blockchain = connect(chain)
+    estimate_gas = blockchain.w3.eth.estimate_gas
+    outcomes = [ValueError("node unavailable")]
+
+    def flaky_estimate(*args, **kwargs):
+        if outcomes:
+            raise outcomes.pop()
+        return estimate_gas(*args, **kwargs)
+
+    blockchain.w3.eth.estimate_gas = flaky_estimate
+    with pytest.raises(ValueError):
+        blockchain.gas_limit("mintNFT", [chain.address, "ipfs://token"], chain.address)
+    assert blockchain.gas_limit("mintNFT", [chain.address, "ipfs://token"], chain.address) > 0
+
+
+class FakeEth:
+    """Just the fee endpoints FeeOracle reads, counting feeHistory calls"""
+
+    def __init__(self, base_fees, rewards):
+        self.history = {"baseFeePerGas": base_fees, "reward": [[reward] for reward in rewards]}
+        self.fee_history_calls = 0
+
+    def fee_history(self, block_count, newest_block, reward_percentiles):
+        self.fee_history_calls += 1
+        return self.history
+
+
+def test_fee_oracle_caps_from_fee_history():
+    eth = FakeEth(base_fees=[100, 110, 120], rewards=[3, 1, 2])
+    oracle = FeeOracle(SimpleNamespace(eth=eth), base_fee_multiplier=2)
+
+    # Next block's base fee doubled plus the median tip
+    assert oracle.fees() == {"maxFeePerGas": 2 * 120 + 2, "maxPriorityFeePerGas": 2}
+
+
+def test_fee_oracle_reuses_fees_within_ttl():
+    eth = FakeEth(base_fees=[100], rewards=[1])
+    oracle = FeeOracle(SimpleNamespace(eth=eth), ttl=0.2)
+
+    oracle.fees()
+    oracle.fees()
+    assert eth.fee_history_calls == 1
+    time.sleep(0.25)
+    oracle.fees()
+    assert eth.fee_history_calls == 2
+    oracle.invalidate()
+    oracle.fees()
+    assert eth.fee_history_calls == 3
+
+
+def test_fee_bump_never_goes_below_current_fees():
+    original = {"maxFeePerGas": 200, "maxPriorityFeePerGas": 10}
+
+    assert FeeOracle.bump(original, {"maxFeePerGas": 100, "maxPriorityFeePerGas": 2}) == {
+        "maxFeePerGas": 250, "maxPriorityFeePerGas": 12
+    }
+    assert FeeOracle.bump(original, {"maxFeePerGas": 400, "maxPriorityFeePerGas": 30}) == {
+        "maxFeePerGas": 400, "maxPriorityFeePerGas": 30
+    }
+    # A legacy original still bumps EIP-1559 fields
+    assert FeeOracle.bump({"gasPrice": 100}, {"maxFeePerGas": 50, "maxPriorityFeePerGas": 5}) == {
+        "maxFeePerGas": 125, "maxPriorityFeePerGas": 125
+    }
+
+
+def test_resume_does_not_wait_for_transactions_never_broadcast(chain):
+    blockchain = connect(chain, drop_timeout=60)
+    mined = blockchain.send_mint(chain.address, "ipfs://mined", chain.private_key)
+    mined.result(10)
+    transaction = blockchain.contract.functions.mintNFT(chain.address, "ipfs://presigned").build_transaction({
+        "from": chain.address,
+        "chainId": blockchain.chain_id,
+        "nonce": chain.w3.eth.get_transaction_count(chain.address),
+        **blockchain.fee_oracle.fees()
+    })
+    presigned = chain.w3.eth.account.sign_transaction(transaction, private_key=chain.private_key)
+
+    start = time.perf_counter()
+    assert BlockchainInterface.succeeded(blockchain.resume_transaction(mined.tx_hash).result(0))
+    assert blockchain.resume_transaction(presigned.hash) is None
+    assert time.perf_counter() - start < 5
@@ -0,0 +1,39 @@
+import hashlib
+import io
+
+from utils.cid import CHUNK_SIZE, compute_cid_v1, cid_to_string
+
+
+def cid(data, **kwargs):
+    return compute_cid_v1(io.BytesIO(data), **kwargs)
+
+
+def test_empty_file():
+    assert cid(b"") == "bafkreihdwdcefgh4dqkjv67uzcmw7ojee6xedzdetojuzjevtenxquvyku"
+
+
+def test_single_chunk_is_a_raw_leaf():
+    assert cid(b"hello world\n") == "bafkreifjjcie6lypi6ny7amxnfftagclbuxndqonfipmb64f2km2devei4"
+
+
+def test_multi_chunk_file_gets_a_dag_pb_root():
+    data = b"a" * CHUNK_SIZE + b"b" * 10
+    leaves = [
+        # CIDv1, raw codec, sha2-256 multihash
+        b"\x01\x55\x12\x20" + hashlib.sha256(chunk).digest()
+        for chunk in (data[:CHUNK_SIZE], data[CHUNK_SIZE:])
+    ]
+    # dag-pb PBNode written out by hand: the links (Hash, empty Name,
+    # Tsize) come first, then the UnixFS Data message (Type=File,
+    # filesize=262154, blocksizes 262144 and 10). Varints: 262144 is
+    # 80 80 10 and 262154 is 8a 80 10.
+    node = (
+        b"\x12\x2c" + b"\x0a\x24" + leaves[0] + b"\x12\x00" + b"\x18\x80\x80\x10"
+        + b"\x12\x2a" + b"\x0a\x24" + leaves[1] + b"\x12\x00" + b"\x18\x0a"
+        + b"\x0a\x0c" + b"\x08\x02" + b"\x18\x8a\x80\x10" + b"\x20\x80\x80\x10" + b"\x20\x0a"
+    )
+    root = b"\x01\x70\x12\x20" + hashlib.sha256(node).digest()
+
+    assert cid(data) == cid_to_string(root)
+    assert cid(data).startswith("bafybei")
+
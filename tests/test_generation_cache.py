@@ -0,0 +1,39 @@
+from PIL import Image
+
+from generation_cache import GenerationCache
+
+
+def noise(seed, size=64):
+    return Image.frombytes("RGB", (size, size), bytes((seed * 7 + i) % 256 for i in range(size * size * 3)))
+
+
+def disk_bytes(cache):
+    return sum(path.stat().st_size for path in cache.cache_dir.glob("*/*.png"))
+
+
+def test_overwriting_an_entry_does_not_inflate_the_byte_count(tmp_path):
+    cache = GenerationCache(tmp_path, "model")
+    key = cache.key("a cat", {}, 1)
+    for _ in range(5):
+        cache.put(key, noise(1))
+
+    assert cache.stats()["bytes"] == disk_bytes(cache)
+
+
+def test_eviction_counts_entries_written_by_other_processes(tmp_path):
+    probe = GenerationCache(tmp_path / "probe", "model")
+    probe.put(probe.key("a cat", {}, 0), noise(0))
+    entry_bytes = disk_bytes(probe)
+
+    cache = GenerationCache(tmp_path / "shared", "model", max_bytes=entry_bytes * 8)
+    # Another process fills the directory past the budget
+    other = GenerationCache(tmp_path / "shared", "model")
+    for seed in range(10):
+        other.put(other.key("a cat", {}, seed), noise(seed))
+    # Rewriting one entry never grows this process's own count
+    key = cache.key("a dog", {}, 0)
+    for _ in range(GenerationCache.RESCAN_PUTS):
+        cache.put(key, noise(0))
+
+    assert disk_bytes(cache) <= cache.max_bytes
+    assert cache.stats()["bytes"] == disk_bytes(cache)
@@ -0,0 +1,121 @@
+import pytest
+
+from ipfs_handler import IPFSHandler
+from benchmarks.stub_servers import StubPinata
+
+
+def write_files(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"{i}.bin"
+        path.write_bytes(f"token {i} ".encode() * (i + 1))
+        paths.append(path)
+    return paths
+
+
+def test_upload_many_keeps_input_order(tmp_path):
+    paths = write_files(tmp_path, 12)
+    with StubPinata(latency=0.01) as pinata:
+        ipfs = IPFSHandler("key", "secret", api_url=pinata.url, max_concurrency=4)
+        uris = ipfs.upload_many(paths)
+        ipfs.close()
+
+    assert len(uris) == len(paths)
+    for path, uri in zip(paths, uris):
+        assert path.read_bytes() in pinata.pinned[uri[len("ipfs://"):]]
+
+
+def test_rate_limits_and_server_errors_are_retried(tmp_path):
+    paths = write_files(tmp_path, 4)
+    failures = [429, 503, 500, 502]
+    with StubPinata(latency=0, fail_statuses=failures) as pinata:
+        ipfs = IPFSHandler("key", "secret", api_url=pinata.url, max_concurrency=2, backoff_factor=0.01)
+        uris = ipfs.upload_many(paths)
+        ipfs.close()
+
+    assert all(uris)
+    assert pinata.requests == len(paths) + len(failures)
+
+
+def test_one_session_is_reused(tmp_path):
+    paths = write_files(tmp_path, 8)
+    with StubPinata(latency=0.01) as pinata:
+        ipfs = IPFSHandler("key", "secret", api_url=pinata.url, max_concurrency=2)
+        session = ipfs.session
+        uris = ipfs.upload_many(paths)
+        assert ipfs.upload_file(paths[0])
+        ipfs.close()
+
+    assert all(uris)
+    assert ipfs.session is session
+    # Keep-alive connections from the pool, not one per upload
+    assert len(pinata.connections) <= 2
+
+
+def test_rebuilt_metadata_is_not_pinned_twice(tmp_path):
+    from nft_metadata import NFTMetadata
+
+    def build():
+        # Every build gets a fresh created_at
+        return NFTMetadata().create_metadata("Token #1", "A token", "ipfs://image", [], {"seed": 1})
+
+    with StubPinata(latency=0) as pinata:
+        ipfs = IPFSHandler("key", "secret", api_url=pinata.url, pin_index_path=str(tmp_path / "pins.sqlite3"))
+        first = ipfs.upload_metadata(build())
+        second = ipfs.upload_metadata(build())
+        ipfs.close()
+
+    assert first and first == second
+    assert pinata.requests == 1
+
+
+def test_pin_index_skips_files_pinned_by_an_earlier_run(tmp_path):
+    image = tmp_path / "image.png"
+    image.write_bytes(b"image bytes")
+    index_path = str(tmp_path / "pins.sqlite3")
+
+    with StubPinata(latency=0) as pinata:
+        uris = []
+        for _ in range(2):
+            # A new handler per run, sharing only the index file
+            ipfs = IPFSHandler("key", "secret", api_url=pinata.url, pin_index_path=index_path)
+            uris.append(ipfs.upload_file(image))
+            uris.append(ipfs.upload_bytes(b"image bytes"))
+            ipfs.close()
+        assert pinata.requests == 1
+
+        image.write_bytes(b"edited image bytes")
+        ipfs = IPFSHandler("key", "secret", api_url=pinata.url, pin_index_path=index_path)
+        edited = ipfs.upload_file(image)
+        ipfs.close()
+
+    assert uris[0] and len(set(uris)) == 1
+    assert edited and edited != uris[0]
+    assert pinata.requests == 2
+
+
+def test_upload_directory_streams_files_within_fd_limit(tmp_path):
+    resource = pytest.importorskip("resource")
+    directory = tmp_path / "images"
+    directory.mkdir()
+    for i in range(300):
+        (directory / f"{i}.png").write_bytes(f"image {i}".encode())
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    with StubPinata(latency=0, fail_statuses=[503]) as pinata:
+        ipfs = IPFSHandler("key", "secret", api_url=pinata.url, backoff_factor=0.01)
+        # Far fewer descriptors than files
+        resource.setrlimit(resource.RLIMIT_NOFILE, (128, hard))
+        try:
+            uri = ipfs.upload_directory(directory)
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+        ipfs.close()
+
+    assert uri
+    body = pinata.pinned[uri[len("ipfs://"):]]
+    # The retry after the 503 sent the whole body again
+    assert pinata.requests == 2
+    assert body.count(b'name="file"') == 300
+    assert b'filename="images/299.png"\r\nContent-Type: application/octet-stream\r\n\r\nimage 299\r\n' in body
+    assert body.rstrip().endswith(b"--")
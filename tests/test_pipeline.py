@@ -0,0 +1,27 @@
+from metrics import metrics
+from pipeline import SKIP, MintPipeline, Stage
+
+
+def test_skipped_items_are_not_counted_as_failures():
+    def dedup(item):
+        # Odd items stand in for rejected near duplicates
+        return SKIP if item["index"] % 2 else item
+
+    def upload(item):
+        return None if item["index"] == 4 else item
+
+    metrics.reset()
+    metrics.enable()
+    try:
+        stages = [Stage("dedup", dedup, workers=2), Stage("upload", upload)]
+        completed = MintPipeline(stages).run({"index": index} for index in range(10))
+        summary = metrics.summary()
+    finally:
+        metrics.enabled = False
+        metrics.reset()
+
+    assert sorted(item["index"] for item in completed) == [0, 2, 6, 8]
+    assert stages[0].stats["skipped"] == 5 and stages[0].stats["failed"] == 0
+    assert stages[1].stats["failed"] == 1
+    assert summary["skipped"] == {"dedup": 5}
+    assert summary["failures"] == {"upload": 1}
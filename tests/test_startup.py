@@ -0,0 +1,53 @@
+"""
+Import-time budget for the CLI
+
+Imports main and parses a light command in a fresh interpreter, as
+`python src/main.py setup-config` does, and fails if that takes longer
+than the budget or pulls in any of the heavy modules that only
+generation, pinning or minting need.
+"""
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+# Seconds on top of a bare interpreter, best of RUNS
+BUDGET = 0.5
+RUNS = 5
+
+# Only the commands that use these should import them
+HEAVY_MODULES = (
+    "torch", "diffusers", "stable_diffusion_pytorch", "web3", "requests", "aiohttp", "numpy", "PIL"
+)
+
+PROBE = f"""
+import sys
+sys.path.insert(0, {str(SRC)!r})
+import main
+from utils.cli_parser import parse_arguments
+parse_arguments(["setup-config"])
+print(",".join(name for name in {HEAVY_MODULES!r} if name in sys.modules))
+"""
+
+
+def timed_run(code):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert result.returncode == 0, f"Importing main failed:\n{result.stderr}"
+    return time.perf_counter() - start, result.stdout
+
+
+def test_light_commands_do_not_import_heavy_modules():
+    _, output = timed_run(PROBE)
+
+    assert [name for name in output.strip().split(",") if name] == []
+
+
+def test_startup_stays_within_budget():
+    # The interpreter itself is not ours to budget
+    baseline = min(timed_run("pass")[0] for _ in range(RUNS))
+    startup = min(timed_run(PROBE)[0] for _ in range(RUNS)) - baseline
+
+    assert startup <= BUDGET, f"CLI startup took {startup:.3f}s over the interpreter, budget {BUDGET}s"
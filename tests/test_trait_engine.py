@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from trait_engine import TraitEngine
+
+
+def tables(traits, values_per_trait, max_count=None):
+    return [
+        {
+            "name": f"Trait {trait}",
+            "values": [
+                {"value": f"{trait}-{value}", "weight": value + 1, "max_count": max_count}
+                for value in range(values_per_trait)
+            ]
+        }
+        for trait in range(traits)
+    ]
+
+
+@pytest.mark.parametrize("traits, values_per_trait", [(14, 30), (12, 40)])
+def test_draw_handles_trait_spaces_larger_than_int64(traits, values_per_trait):
+    assert values_per_trait ** traits > np.iinfo(np.int64).max
+    indices = TraitEngine(tables(traits, values_per_trait), seed=1).draw(5000)
+
+    assert indices.shape == (5000, traits)
+    assert len(np.unique(indices, axis=0)) == 5000
+
+
+def test_draw_is_unique_within_caps_and_repeatable():
+    engine = TraitEngine(tables(3, 4, max_count=20), seed=7)
+    indices = engine.draw(60)
+
+    assert len(np.unique(indices, axis=0)) == 60
+    for trait in range(3):
+        assert np.bincount(indices[:, trait], minlength=4).max() <= 20
+    assert np.array_equal(indices, TraitEngine(tables(3, 4, max_count=20), seed=7).draw(60))